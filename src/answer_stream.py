@@ -0,0 +1,154 @@
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, List
+
+import redis
+
+
+class AnswerScorer:
+    """Consumer group worker that folds the answer stream into player scores
+
+    /answer (write-behind mode) only appends to RedisGameState.ANSWER_STREAM_KEY.
+    Each scorer reads batches through XREADGROUP, sums the points per player,
+    applies them with one pipeline of HINCRBY and acknowledges the batch.
+    The stream itself stays as an append-only audit log (capped by MAXLEN).
+    """
+
+    GROUP_NAME = "scorers"
+
+    def __init__(self, game_state, consumer_name='scorer-1', batch_size=100, block_ms=50,
+                 latency_window=1000):
+        self.game_state = game_state
+        self.redis_client = game_state.redis_client
+        self.stream_key = game_state.ANSWER_STREAM_KEY
+        self.consumer_name = consumer_name
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.running = False
+        self._thread = None
+
+        # Stats
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self.processed = 0
+        self.skipped = 0
+        self.batches = 0
+
+        self._ensure_group()
+
+    def _ensure_group(self):
+        """Create the consumer group (and the stream) if needed"""
+        try:
+            self.redis_client.xgroup_create(self.stream_key, self.GROUP_NAME, id='0', mkstream=True)
+            print(f"🧮 Created consumer group '{self.GROUP_NAME}' on {self.stream_key}")
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    def start(self):
+        """Start (or resume after stop) the worker thread; a previous thread still finishing exits on its own"""
+        self.running = True
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        print(f"🧮 Answer scorer '{self.consumer_name}' started (batch: {self.batch_size})")
+
+    def stop(self, timeout=2.0):
+        self.running = False
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def backlog(self) -> int:
+        """Stream entries the group has not folded yet: undelivered plus delivered but unacknowledged"""
+        for group in self.redis_client.xinfo_groups(self.stream_key):
+            if group['name'] != self.GROUP_NAME:
+                continue
+            lag = group.get('lag')
+            if lag is None:  # Redis < 7, or lag unknown after MAXLEN trimming: compare the last ids
+                last_id = self.redis_client.xinfo_stream(self.stream_key)['last-generated-id']
+                lag = 0 if group['last-delivered-id'] == last_id else 1
+            return group['pending'] + lag
+        return 0
+
+    def run(self):
+        # Drain entries delivered to this consumer before a restart first
+        pending_id = '0'
+        while self.running and self._thread is threading.current_thread():
+            try:
+                read_id = pending_id or '>'
+                response = self.redis_client.xreadgroup(
+                    self.GROUP_NAME, self.consumer_name, {self.stream_key: read_id},
+                    count=self.batch_size, block=None if pending_id else self.block_ms
+                )
+                entries = response[0][1] if response else []
+                if pending_id and not entries:
+                    pending_id = None
+                    continue
+                if entries:
+                    self.process_batch(entries)
+                    if pending_id:
+                        pending_id = entries[-1][0]
+            except redis.ConnectionError as e:
+                print(f"⚠️ Answer scorer connection error: {e}")
+                time.sleep(1)
+            except Exception as e:
+                print(f"❌ Answer scorer error: {e}")
+                time.sleep(0.5)
+
+    def process_batch(self, entries: List):
+        """Aggregate one batch of stream entries into score deltas"""
+        now = time.time()
+        current_game = self.redis_client.hget(self.game_state.GAME_KEY, 'game_start_time')
+        deltas: Dict[str, int] = {}
+        entry_ids = []
+        latencies = []
+        skipped = 0
+
+        for entry_id, fields in entries:
+            entry_ids.append(entry_id)
+            # Answers from a game that has since been reset must not leak into the new one
+            if fields.get('game_start_time') != str(current_game):
+                skipped += 1
+                continue
+            if fields.get('correct') == '1':
+                points = int(float(fields.get('time_remaining', 0)) * 10)
+                if fields.get('first') == '1':
+                    points += 50
+                player_id = fields['player_id']
+                deltas[player_id] = deltas.get(player_id, 0) + points
+            latencies.append(now - float(fields.get('accepted_at', now)))
+
+        pipe = self.redis_client.pipeline()
+        for player_id, points in deltas.items():
+            if points:
+                pipe.hincrby(self.game_state.SCORES_KEY, player_id, points)
+        pipe.xack(self.stream_key, self.GROUP_NAME, *entry_ids)
+        pipe.execute()
+
+        with self._stats_lock:
+            self._latencies.extend(latencies)
+            self.processed += len(entries) - skipped
+            self.skipped += skipped
+            self.batches += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-answer accept → score latency and throughput counters"""
+        with self._stats_lock:
+            samples = sorted(self._latencies)
+            processed, skipped, batches = self.processed, self.skipped, self.batches
+
+        def percentile(p):
+            if not samples:
+                return 0
+            return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+
+        return {
+            'consumer': self.consumer_name,
+            'processed': processed,
+            'skipped': skipped,
+            'batches': batches,
+            'avg_batch_size': processed / batches if batches else 0,
+            'latency_ms_p50': percentile(0.50),
+            'latency_ms_p99': percentile(0.99),
+            'latency_ms_max': samples[-1] * 1000 if samples else 0
+        }
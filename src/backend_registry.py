@@ -0,0 +1,130 @@
+import time
+import errno
+import socket
+import logging
+import threading
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Sorted set: member "host:port", score = time the registration expires
+REGISTRY_KEY = 'stroopcolor:lb:backends'
+
+CONNECT_IN_PROGRESS = (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+
+def parse_backend(text, default_host='127.0.0.1') -> Dict:
+    """'host:port', 'port' or 'unix:/path' -> {'host', 'port'}
+
+    A Unix domain socket backend is {'host': 'unix', 'port': path}, so it
+    still prints and keys as unix:/path wherever host:port is used.
+    """
+    text = text.strip()
+    if text.startswith('unix:'):
+        return {'host': 'unix', 'port': text[len('unix:'):]}
+    host, sep, port = text.rpartition(':')
+    return {'host': host if sep else default_host, 'port': int(port)}
+
+
+def is_unix(server) -> bool:
+    return server['host'] == 'unix'
+
+
+def start_connect(server):
+    """Non-blocking connect to a backend -> (socket, None or the OSError it failed with)
+
+    A Unix domain socket connect completes (or fails) immediately; there
+    EAGAIN means the server's accept backlog is full, not "in progress".
+    """
+    if is_unix(server):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        err = sock.connect_ex(server['port'])
+        in_progress = err == 0
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        err = sock.connect_ex((server['host'], server['port']))
+        in_progress = err in CONNECT_IN_PROGRESS
+    return sock, None if in_progress else OSError(err, errno.errorcode.get(err, 'connect failed'))
+
+
+def connect_backend(server, timeout=None):
+    """Blocking connection to a backend over TCP or its Unix domain socket"""
+    if not is_unix(server):
+        return socket.create_connection((server['host'], server['port']), timeout=timeout)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(server['port'])
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def host_header(server) -> str:
+    return 'localhost' if is_unix(server) else f"{server['host']}:{server['port']}"
+
+
+def read_backends_file(path, default_host='127.0.0.1') -> List[Dict]:
+    """Backends from a file: host:port, a bare port or unix:/path per line or comma separated, # starts a comment"""
+    servers = []
+    with open(path) as f:
+        for line in f:
+            for item in line.split('#', 1)[0].split(','):
+                if item.strip():
+                    servers.append(parse_backend(item, default_host))
+    return servers
+
+
+def registered_backends(client) -> List[Dict]:
+    """Live registrations in Redis; expired ones are removed on the way"""
+    now = time.time()
+    client.zremrangebyscore(REGISTRY_KEY, '-inf', now)
+    return [parse_backend(member) for member in client.zrangebyscore(REGISTRY_KEY, now, '+inf')]
+
+
+class BackendRegistration:
+    """Keeps one game server listed in the load balancer registry
+
+    The entry is refreshed every ttl/3 seconds; a server that dies simply
+    expires after ttl, a server that stops cleanly removes itself.
+    """
+
+    def __init__(self, client, host, port, ttl=10.0):
+        self.client = client
+        self.member = f"{host}:{port}"
+        self.ttl = ttl
+        self.running = False
+        self._wakeup = threading.Event()
+        self._registered = False
+
+    def _refresh(self):
+        try:
+            self.client.zadd(REGISTRY_KEY, {self.member: time.time() + self.ttl})
+            if not self._registered:
+                logger.info(f"📝 Registered {self.member} with the load balancer registry")
+            self._registered = True
+        except Exception as e:
+            if self._registered:
+                logger.warning(f"⚠️ Registry refresh failed: {e}")
+            self._registered = False
+
+    def _run(self):
+        while self.running:
+            self._refresh()
+            self._wakeup.wait(self.ttl / 3)
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self._wakeup.set()
+        try:
+            self.client.zrem(REGISTRY_KEY, self.member)
+        except Exception:
+            pass
@@ -0,0 +1,1478 @@
+"""Benchmarks for the Stroop Color Game backend
+
+Usage: python benchmark.py <benchmark> [options]   (python benchmark.py -h for the list)
+Each benchmark prints a small table; nothing is written to disk.
+"""
+import argparse
+import contextlib
+import heapq
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import signal
+import socket
+import socketserver
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(c).ljust(w) for c, w in zip(row, widths)))
+
+
+def _spawn_redis(ports):
+    """Start throwaway redis-server processes (no persistence) on the given ports"""
+    if not shutil.which('redis-server'):
+        sys.exit("redis-server not found on PATH (start the instances yourself and drop --spawn)")
+    procs = [subprocess.Popen(['redis-server', '--port', str(p), '--save', '', '--appendonly', 'no'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for p in ports]
+    time.sleep(0.5)
+    return procs
+
+
+def _http_get(port, path, host='127.0.0.1', timeout=2.0):
+    """One-shot GET with the same raw-socket pattern as the client; returns (code, json or None)"""
+    with socket.create_connection((host, port), timeout=timeout) as s:
+        s.sendall(f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n\r\n".encode())
+        response = b""
+        while True:
+            part = s.recv(65536)
+            if not part:
+                break
+            response += part
+    head, _, body = response.partition(b"\r\n\r\n")
+    code = int(head.split()[1]) if head else 0
+    try:
+        return code, json.loads(body)
+    except ValueError:
+        return code, None
+
+
+def _wait_for_port(port, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def _percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0
+
+
+def _read_http_response(sock):
+    """Read exactly one response (headers + Content-Length body) from sock"""
+    data = b""
+    while b"\r\n\r\n" not in data:
+        part = sock.recv(65536)
+        if not part:
+            return data
+        data += part
+    head, _, body = data.partition(b"\r\n\r\n")
+    length = 0
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value.strip())
+    while len(body) < length:
+        part = sock.recv(65536)
+        if not part:
+            break
+        body += part
+    return head + b"\r\n\r\n" + body
+
+
+class _StubBackend(socketserver.ThreadingTCPServer):
+    """Game-server stand-in: answers every request with a status-sized JSON body"""
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+    def __init__(self, port, delay=0.0, body_size=300, capacity=0):
+        self.delay = delay
+        # capacity > 0: at most that many requests are worked on at once, the rest wait their turn
+        self.slots = threading.Semaphore(capacity) if capacity else contextlib.nullcontext()
+        body = json.dumps({'status': 'playing', 'pad': 'x' * max(0, body_size - 40)}).encode()
+        self.reply = (f"HTTP/1.0 200 OK\r\nConnection: close\r\nContent-Length: {len(body)}\r\n"
+                      f"Content-type: application/json\r\n\r\n").encode() + body
+        self.keep_alive_reply = self.reply.replace(b"Connection: close", b"Connection: keep-alive", 1)
+        self.active = 0  # requests being served, reported as load_score on /server-stats
+        self.served = 0
+        self.lock = threading.Lock()
+        self.open_sockets = set()
+        super().__init__(self._address(port), _StubHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def _address(self, port):
+        return ('127.0.0.1', port)
+
+    def kill(self):
+        """Stop like a crashed server: no listener and every open connection reset"""
+        self.shutdown()
+        self.server_close()
+        for sock in list(self.open_sockets):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class _StubHandler(socketserver.BaseRequestHandler):
+    """Same connection handling as server_thread_http: keep-alive only when asked for"""
+
+    def handle(self):
+        self.server.open_sockets.add(self.request)
+        try:
+            self._serve()
+        except ConnectionResetError:
+            pass  # the LB dropped a pooled connection (e.g. it was stopped)
+        finally:
+            self.server.open_sockets.discard(self.request)
+
+    def _serve(self):
+        data = b""
+        while True:
+            while b"\r\n\r\n" not in data:
+                part = self.request.recv(4096)
+                if not part:
+                    return
+                data += part
+            head, _, data = data.partition(b"\r\n\r\n")
+            server = self.server
+            if head.startswith(b"GET /server-stats"):
+                body = json.dumps({'load_score': server.active, 'active_connections': server.active}).encode()
+                self.request.sendall(b"HTTP/1.0 200 OK\r\nConnection: close\r\nContent-Length: "
+                                     + str(len(body)).encode() + b"\r\n\r\n" + body)
+                return
+            with server.slots:
+                with server.lock:
+                    server.active += 1
+                if server.delay:
+                    time.sleep(server.delay)
+                with server.lock:
+                    server.active -= 1
+                    server.served += 1
+            if b"connection: keep-alive" not in head.lower():
+                self.request.sendall(server.reply)
+                return
+            self.request.sendall(server.keep_alive_reply)
+
+
+class _UnixStubBackend(_StubBackend):
+    """The same stub on a Unix domain socket path (LB backend unix:PATH)"""
+    address_family = socket.AF_UNIX
+
+    def _address(self, path):
+        if os.path.exists(path):
+            os.unlink(path)
+        return path
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def _start_lb(port, backends, *extra):
+    proc = subprocess.Popen(
+        [sys.executable, 'load_balancer.py', '--port', str(port), '--backends', ','.join(map(str, backends)), *extra],
+        cwd=SRC_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    if not _wait_for_port(port):
+        proc.terminate()
+        sys.exit("load balancer did not start")
+    time.sleep(0.3)
+    return proc
+
+
+def _load(port, requests, concurrency, path='/status?player_id=heartbeat', keep_alive=False, method='GET'):
+    """Connect-per-request load like ClientInterface (or one kept-alive connection per worker)
+
+    Returns (latencies, errors, seconds).
+    """
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    counter = iter(range(requests))
+    connection = "keep-alive" if keep_alive else "close"
+    request = (f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nConnection: {connection}\r\n"
+               f"Content-Length: 0\r\n\r\n").encode()
+
+    def worker():
+        conn = None
+        for _ in counter:
+            start = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = socket.create_connection(('127.0.0.1', port), timeout=5)
+                conn.sendall(request)
+                status_line = _read_http_response(conn).split(b"\r\n", 1)[0]
+            except OSError:
+                status_line = b""
+            if not keep_alive or not status_line:
+                conn.close() if conn else None
+                conn = None
+            if b" 200 " not in status_line:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+        if conn:
+            conn.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors[0], time.perf_counter() - started
+
+
+# ---------------------------------------------------------------- lb-latency
+
+LB_ENGINES = {
+    'threaded': ['--engine', 'threaded'],
+    'event': ['--engine', 'event'],
+    'http': ['--engine', 'event', '--mode', 'http'],
+}
+
+
+def bench_lb_latency(args):
+    backend = _StubBackend(args.backend_port, delay=args.backend_delay)
+    rows = []
+    try:
+        for engine in args.engines.split(','):
+            lb = _start_lb(args.lb_port, [args.backend_port], *LB_ENGINES[engine])
+            idle = []
+            try:
+                for _ in range(args.idle):
+                    idle.append(socket.create_connection(('127.0.0.1', args.lb_port)))
+                latencies, errors, seconds = _load(args.lb_port, args.requests, args.concurrency,
+                                                   keep_alive=args.keep_alive)
+                rows.append((engine, args.idle, args.concurrency, f"{len(latencies) / seconds:,.0f}",
+                             f"{_percentile(latencies, 0.5) * 1000:.2f}", f"{_percentile(latencies, 0.99) * 1000:.2f}",
+                             f"{max(latencies, default=0) * 1000:.2f}", errors))
+            finally:
+                for s in idle:
+                    s.close()
+                lb.terminate()
+                lb.wait()
+    finally:
+        backend.shutdown()
+        backend.server_close()
+    _print_table(['engine', 'idle conns', 'concurrency', 'req/s', 'p50 ms', 'p99 ms', 'max ms', 'errors'], rows)
+
+
+# ---------------------------------------------------------------- lb-backend-down
+
+def bench_lb_backend_down(args):
+    """One of three backends dies mid-run; how many requests fail and how slow do they get"""
+    ports = [args.backend_port + i for i in range(3)]
+    backends = [_StubBackend(port) for port in ports]
+    rows = []
+    try:
+        for mode in args.modes.split(','):
+            lb = _start_lb(args.lb_port, ports, '--mode', mode, '--health-interval', str(args.health_interval))
+            try:
+                victim = backends[-1]
+                timer = threading.Timer(args.kill_after, victim.kill)
+                timer.start()
+                latencies, errors, seconds = _load(args.lb_port, args.requests, args.concurrency)
+                timer.join()
+                rows.append((mode, f"{len(latencies) / seconds:,.0f}", f"{_percentile(latencies, 0.99) * 1000:.2f}",
+                             f"{max(latencies, default=0) * 1000:.2f}", errors))
+            finally:
+                lb.terminate()
+                lb.wait()
+            backends[-1] = _StubBackend(ports[-1])
+    finally:
+        for backend in backends:
+            backend.shutdown()
+            backend.server_close()
+    print(f"Backend :{ports[-1]} stopped {args.kill_after}s into each run, health interval {args.health_interval}s")
+    _print_table(['mode', 'req/s', 'p99 ms', 'max ms', 'failed requests'], rows)
+
+
+# ---------------------------------------------------------------- lb-policies
+
+def _simulate_policy(name, delays, workers, rate, requests, stats_interval, seed=1):
+    """Discrete-event model of the LB in front of backends with `workers` slots each
+
+    Arrivals are Poisson at `rate`/s, service times exponential with the
+    backend's mean delay. Returns (latencies, share of requests per backend).
+    """
+    from lb_policies import create_policy, server_key
+    rng = random.Random(seed)
+    random.seed(seed)
+    policy = create_policy(name)
+    servers = [{'host': 'sim', 'port': i} for i in range(len(delays))]
+    outstanding, busy, queued = {}, [0] * len(servers), [[] for _ in servers]
+    sent = [0] * len(servers)
+    events = []  # (time, seq, kind, index, arrival time)
+    seq = 0
+
+    def push(when, kind, index=0, arrived=0.0):
+        nonlocal seq
+        seq += 1
+        heapq.heappush(events, (when, seq, kind, index, arrived))
+
+    def serve(now, index, arrived):
+        busy[index] += 1
+        push(now + rng.expovariate(1 / delays[index]), 'done', index, arrived)
+
+    push(rng.expovariate(rate), 'arrive')
+    push(0.0, 'scrape')
+    latencies, arrivals = [], 0
+    while len(latencies) < requests:
+        now, _, kind, index, arrived = heapq.heappop(events)
+        if kind == 'arrive':
+            arrivals += 1
+            if arrivals < requests:
+                push(now + rng.expovariate(rate), 'arrive')
+            server = policy.choose(servers, outstanding)
+            index = server['port']
+            outstanding[server_key(server)] = outstanding.get(server_key(server), 0) + 1
+            sent[index] += 1
+            if busy[index] < workers:
+                serve(now, index, now)
+            else:
+                queued[index].append(now)
+        elif kind == 'done':
+            latencies.append(now - arrived)
+            outstanding[server_key(servers[index])] -= 1
+            busy[index] -= 1
+            if queued[index]:
+                serve(now, index, queued[index].pop(0))
+        else:
+            for server in servers:
+                policy.update_stats(server_key(server), {'load_score': outstanding.get(server_key(server), 0)})
+            push(now + stats_interval, 'scrape')
+    return latencies, [n / max(1, sum(sent)) for n in sent]
+
+
+def bench_lb_policies(args):
+    delays = [float(d) for d in args.delays.split(',')]
+    rows = []
+    if args.simulate:
+        for name in args.policies.split(','):
+            latencies, share = _simulate_policy(name, delays, args.workers, args.rate, args.requests, args.stats_interval)
+            rows.append((name, f"{_percentile(latencies, 0.5) * 1000:.2f}", f"{_percentile(latencies, 0.99) * 1000:.2f}",
+                         f"{max(latencies) * 1000:.2f}", ' / '.join(f"{s:.0%}" for s in share)))
+        print(f"Simulation: {args.rate:.0f} req/s Poisson, {args.workers} workers per backend, mean delays {delays}")
+        _print_table(['policy', 'p50 ms', 'p99 ms', 'max ms', 'share per backend'], rows)
+        return
+
+    ports = [args.backend_port + i for i in range(len(delays))]
+    backends = [_StubBackend(port, delay=delay) for port, delay in zip(ports, delays)]
+    try:
+        for name in args.policies.split(','):
+            lb = _start_lb(args.lb_port, ports, '--mode', args.mode, '--policy', name,
+                           '--stats-interval', str(args.stats_interval))
+            try:
+                before = [b.served for b in backends]
+                latencies, errors, seconds = _load(args.lb_port, args.requests, args.concurrency)
+                served = [b.served - n for b, n in zip(backends, before)]
+                rows.append((name, f"{len(latencies) / seconds:,.0f}", f"{_percentile(latencies, 0.5) * 1000:.2f}",
+                             f"{_percentile(latencies, 0.99) * 1000:.2f}", f"{max(latencies, default=0) * 1000:.2f}",
+                             ' / '.join(f"{n / max(1, sum(served)):.0%}" for n in served), errors))
+            finally:
+                lb.terminate()
+                lb.wait()
+    finally:
+        for backend in backends:
+            backend.shutdown()
+            backend.server_close()
+    print(f"Backend delays {delays}s, {args.concurrency} concurrent clients, LB mode {args.mode}")
+    _print_table(['policy', 'req/s', 'p50 ms', 'p99 ms', 'max ms', 'share per backend', 'errors'], rows)
+
+
+# ---------------------------------------------------------------- lb-hash
+
+def bench_lb_hash(args):
+    from lb_policies import ConsistentHashPolicy
+    from hash_ring import ring_hash
+    keys = [f"player-{i}" for i in range(args.keys)]
+    servers = [{'host': '127.0.0.1', 'port': 8889 + i} for i in range(args.backends)]
+
+    def ring(pool, key):
+        return ring_policy.choose(pool, {}, key)['port']
+
+    def modulo(pool, key):
+        return pool[ring_hash(key) % len(pool)]['port']
+
+    def placement(pool, key_of):
+        return {key: key_of(pool, key) for key in keys}
+
+    rows = []
+    ring_policy = ConsistentHashPolicy(balance=args.balance)
+    for label, key_of in (('consistent_hash', ring), ('hash % N', modulo)):
+        base = placement(servers, key_of)
+        removed = placement(servers[:-1], key_of)
+        added = placement(servers + [{'host': '127.0.0.1', 'port': 8889 + args.backends}], key_of)
+        moved_remove = sum(base[k] != removed[k] for k in keys) / len(keys)
+        moved_add = sum(base[k] != added[k] for k in keys) / len(keys)
+        rows.append((label, f"{moved_remove:.1%}", f"{moved_add:.1%}"))
+    print(f"{args.keys} players over {args.backends} backends (ideal: {1 / args.backends:.1%} removed, "
+          f"{1 / (args.backends + 1):.1%} added)")
+    _print_table(['placement', 'remapped on remove', 'remapped on add'], rows)
+
+    # Skewed traffic: a few hot players against the load bound
+    rng = random.Random(1)
+    weights = [1 / (i + 1) ** args.zipf for i in range(len(keys))]
+    rows = []
+    for balance in (None, args.balance):
+        policy = ConsistentHashPolicy(balance=1e9 if balance is None else balance)
+        outstanding, served = {}, {}
+        in_flight = []
+        for key in rng.choices(keys, weights, k=args.requests):
+            server = policy.choose(servers, outstanding, key)
+            k = (server['host'], server['port'])
+            outstanding[k] = outstanding.get(k, 0) + 1
+            served[k] = served.get(k, 0) + 1
+            in_flight.append(k)
+            if len(in_flight) > args.in_flight:
+                outstanding[in_flight.pop(0)] -= 1
+        peak = max(served.values()) / (args.requests / len(servers))
+        rows.append(('unbounded' if balance is None else f"bounded ({balance})", f"{peak:.2f}x",
+                     f"{policy.spilled / args.requests:.1%}"))
+    print(f"\n{args.requests} requests, zipf({args.zipf}) player popularity, {args.in_flight} in flight")
+    _print_table(['load bound', 'busiest backend vs average', 'requests spilled off home'], rows)
+
+
+# ---------------------------------------------------------------- lb-throughput
+
+class _BulkHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data = b""
+        while b"\r\n\r\n" not in data:
+            part = self.request.recv(4096)
+            if not part:
+                return
+            data += part
+        self.request.sendall(self.server.head)
+        self.request.sendall(self.server.payload)
+
+
+def _cpu_seconds(pid):
+    """utime + stime of a process from /proc, in seconds"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def _download(port, streams, buffer_size=1 << 20):
+    """Fetch the bulk body over parallel connections; returns bytes received"""
+    total = [0]
+    lock = threading.Lock()
+
+    def worker():
+        buf = bytearray(buffer_size)
+        received = 0
+        with socket.create_connection(('127.0.0.1', port)) as s:
+            s.sendall(b"GET /bulk HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n")
+            while True:
+                n = s.recv_into(buf)
+                if not n:
+                    break
+                received += n
+        with lock:
+            total[0] += received
+
+    threads = [threading.Thread(target=worker) for _ in range(streams)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return total[0]
+
+
+def bench_lb_throughput(args):
+    backend = socketserver.ThreadingTCPServer(('127.0.0.1', args.backend_port), _BulkHandler, bind_and_activate=False)
+    backend.daemon_threads = True
+    backend.allow_reuse_address = True
+    backend.server_bind()
+    backend.server_activate()
+    backend.payload = os.urandom(1 << 20) * args.size_mb
+    backend.head = (f"HTTP/1.0 200 OK\r\nConnection: close\r\n"
+                    f"Content-Length: {len(backend.payload)}\r\n\r\n").encode()
+    threading.Thread(target=backend.serve_forever, daemon=True).start()
+
+    rows = []
+    try:
+        for mode in args.modes.split(','):
+            lb = _start_lb(args.lb_port, [args.backend_port], '--engine', 'event', '--forwarding', mode)
+            try:
+                best = None
+                for _ in range(args.rounds):
+                    cpu_before, started = _cpu_seconds(lb.pid), time.perf_counter()
+                    received = _download(args.lb_port, args.streams)
+                    seconds, cpu = time.perf_counter() - started, _cpu_seconds(lb.pid) - cpu_before
+                    if best is None or seconds < best[1]:
+                        best = (received, seconds, cpu)
+                received, seconds, cpu = best
+                gb = received / (1 << 30)
+                rows.append((mode, args.streams, f"{received / (1 << 20):,.0f}", f"{received / (1 << 20) / seconds:,.0f}",
+                             f"{cpu:.2f}", f"{cpu / gb:.2f}" if gb else "-"))
+            finally:
+                lb.terminate()
+                lb.wait()
+    finally:
+        backend.shutdown()
+        backend.server_close()
+    _print_table(['forwarding', 'streams', 'MB moved', 'MB/s', 'LB cpu s', 'LB cpu s/GB'], rows)
+
+
+# ---------------------------------------------------------------- lb-cache
+
+def bench_lb_cache(args):
+    """Identical polls through the HTTP mode LB, without and with --micro-cache"""
+    backend = _StubBackend(args.backend_port, delay=args.backend_delay)
+    rows = []
+    try:
+        for ttl in [0.0] + [float(t) for t in args.ttls.split(',')]:
+            extra = ['--micro-cache', f"/question={ttl}"] if ttl else []
+            lb = _start_lb(args.lb_port, [args.backend_port], '--mode', 'http', *extra)
+            try:
+                served_before = backend.served
+                latencies, errors, seconds = _load(args.lb_port, args.requests, args.concurrency, path='/question',
+                                                   keep_alive=True)
+                served = backend.served - served_before
+                rows.append((f"{ttl * 1000:.0f} ms" if ttl else "off", f"{len(latencies) / seconds:,.0f}",
+                             f"{_percentile(latencies, 0.5) * 1000:.2f}", f"{_percentile(latencies, 0.99) * 1000:.2f}",
+                             served, f"{served / max(1, len(latencies)):.1%}", errors))
+            finally:
+                lb.terminate()
+                lb.wait()
+    finally:
+        backend.shutdown()
+        backend.server_close()
+    print(f"{args.concurrency} clients polling GET /question, backend think time {args.backend_delay * 1000:.0f} ms")
+    _print_table(['cache ttl', 'req/s', 'p50 ms', 'p99 ms', 'backend requests', 'reached backend', 'errors'], rows)
+
+
+# ---------------------------------------------------------------- lb-limits
+
+def bench_lb_limits(args):
+    """One slow and one fast backend, without and with --max-in-flight (queue + spill-over)"""
+    slow = _StubBackend(args.backend_port, delay=args.slow_delay)
+    fast = _StubBackend(args.backend_port + 1, delay=args.fast_delay)
+    peak = [0]
+
+    def watch():
+        while True:
+            peak[0] = max(peak[0], slow.active)
+            time.sleep(0.001)
+
+    threading.Thread(target=watch, daemon=True).start()
+    rows = []
+    try:
+        for limit in [0] + [int(l) for l in args.limits.split(',')]:
+            extra = ['--max-in-flight', str(limit), '--queue-size', str(args.queue_size)] if limit else []
+            lb = _start_lb(args.lb_port, [slow.server_address[1], fast.server_address[1]], '--mode', args.mode, *extra)
+            peak[0] = 0
+            try:
+                served = slow.served
+                latencies, errors, seconds = _load(args.lb_port, args.requests, args.concurrency)
+                rows.append((limit or "off", f"{len(latencies) / seconds:,.0f}", f"{_percentile(latencies, 0.5) * 1000:.1f}",
+                             f"{_percentile(latencies, 0.99) * 1000:.1f}", slow.served - served, peak[0], errors))
+            finally:
+                lb.terminate()
+                lb.wait()
+    finally:
+        for backend in (slow, fast):
+            backend.shutdown()
+            backend.server_close()
+    print(f"Backends: {args.slow_delay * 1000:.0f} ms and {args.fast_delay * 1000:.0f} ms, {args.concurrency} clients, "
+          f"queue {args.queue_size}, mode {args.mode}")
+    _print_table(['max in flight', 'req/s', 'p50 ms', 'p99 ms', 'slow backend reqs', 'slow peak active', '503/errors'], rows)
+
+
+# ---------------------------------------------------------------- lb-workers
+
+def _stub_backend_process(port, delay=0.0, capacity=0):
+    _StubBackend(port, delay=delay, capacity=capacity)
+    threading.Event().wait()
+
+
+def _load_process(job):
+    port, requests, concurrency = job
+    return _load(port, requests, concurrency)
+
+
+def bench_lb_workers(args):
+    """Connection rate through the LB as --workers grows (backends and clients in their own processes)"""
+    ports = [args.backend_port + i for i in range(args.backends)]
+    backends = [multiprocessing.Process(target=_stub_backend_process, args=(port,), daemon=True) for port in ports]
+    for backend in backends:
+        backend.start()
+    for port in ports:
+        _wait_for_port(port)
+    rows = []
+    try:
+        for workers in [int(w) for w in args.workers.split(',')]:
+            lb = _start_lb(args.lb_port, ports, '--workers', str(workers), '--backlog', str(args.backlog))
+            time.sleep(0.5 + 0.2 * workers)  # let every worker bind and finish its first health check
+            try:
+                jobs = [(args.lb_port, args.requests // args.clients, args.concurrency) for _ in range(args.clients)]
+                with multiprocessing.Pool(args.clients) as pool:
+                    results = pool.map(_load_process, jobs)
+                latencies = [l for result in results for l in result[0]]
+                errors = sum(result[1] for result in results)
+                seconds = max(result[2] for result in results)
+                rows.append((workers, f"{len(latencies) / seconds:,.0f}", f"{_percentile(latencies, 0.5) * 1000:.2f}",
+                             f"{_percentile(latencies, 0.99) * 1000:.2f}", errors))
+            finally:
+                lb.terminate()
+                lb.wait()
+    finally:
+        for backend in backends:
+            backend.terminate()
+    print(f"{os.cpu_count()} CPUs, {args.backends} stub backends, {args.clients} client processes x "
+          f"{args.concurrency} threads, new connection per request")
+    _print_table(['LB workers', 'conn/s', 'p50 ms', 'p99 ms', 'errors'], rows)
+
+
+# ---------------------------------------------------------------- lb-routes
+
+def _flood_process(port, concurrency):
+    _load(port, 1 << 30, concurrency, keep_alive=True)
+
+
+def bench_lb_routes(args):
+    """POST /answer latency while /status polls flood the LB: shared backends vs a --route'd writes pool
+
+    Each stub backend works on --capacity requests at a time, so a flood
+    queues on the backends themselves. Shared: every request round-robins
+    over all backends. Routed: the last backend is a "writes" pool that
+    only gets POST /answer.
+    """
+    ports = [args.backend_port + i for i in range(args.backends)]
+    backends = [multiprocessing.Process(target=_stub_backend_process, args=(port, args.backend_delay, args.capacity),
+                                        daemon=True) for port in ports]
+    for backend in backends:
+        backend.start()
+    for port in ports:
+        _wait_for_port(port)
+    setups = {
+        'shared': (ports, []),
+        'routed': (ports[:-1], ['--pool', f"writes={ports[-1]}", '--route', 'POST /answer=writes']),
+    }
+    rows = []
+    try:
+        for setup, (default_ports, extra) in setups.items():
+            lb = _start_lb(args.lb_port, default_ports, '--mode', 'http', *extra)
+            try:
+                for flood in [0] + [int(f) for f in args.floods.split(',')]:
+                    flooders = [multiprocessing.Process(target=_flood_process, args=(args.lb_port, flood), daemon=True)
+                                for _ in range(1 if flood else 0)]
+                    for p in flooders:
+                        p.start()
+                    time.sleep(1.0 if flood else 0)
+                    latencies, errors, seconds = _load(args.lb_port, args.answers, args.concurrency, path='/answer',
+                                                       method='POST')
+                    for p in flooders:
+                        p.terminate()
+                        p.join()
+                    rows.append((setup, flood, f"{_percentile(latencies, 0.5) * 1000:.1f}",
+                                 f"{_percentile(latencies, 0.99) * 1000:.1f}", f"{max(latencies, default=0) * 1000:.1f}",
+                                 errors))
+            finally:
+                lb.terminate()
+                lb.wait()
+    finally:
+        for backend in backends:
+            backend.terminate()
+    print(f"{args.backends} backends ({args.backend_delay * 1000:.0f} ms per request, {args.capacity} at a time), "
+          f"mode http; {args.concurrency} answer clients")
+    _print_table(['backends', '/status pollers', 'answer p50 ms', 'answer p99 ms', 'answer max ms', 'errors'], rows)
+
+
+# ---------------------------------------------------------------- lb-tls
+
+KEY_TYPES = {
+    'ec': ['-newkey', 'ec', '-pkeyopt', 'ec_paramgen_curve:prime256v1'],
+    'rsa': ['-newkey', 'rsa:2048'],
+}
+
+
+def _make_certificate(directory, key_type='ec'):
+    """Self-signed localhost certificate via the openssl CLI; returns (cert, key) paths"""
+    cert, key = os.path.join(directory, 'lb-cert.pem'), os.path.join(directory, 'lb-key.pem')
+    subprocess.run(['openssl', 'req', '-x509', *KEY_TYPES[key_type], '-nodes', '-days', '1', '-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost',
+                    '-keyout', key, '-out', cert], check=True, capture_output=True)
+    return cert, key
+
+
+def _tls_load(port, requests, concurrency, cafile, reuse, version):
+    """TLS clients: a new connection per request with a 'full' or 'resumed' handshake, or 'keep-alive'
+
+    Returns (latencies, resumed handshakes, errors, seconds).
+    """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.load_verify_locations(cafile)
+    context.maximum_version = version
+    context.set_alpn_protocols(['http/1.1'])
+    latencies, counts = [], {'resumed': 0, 'errors': 0}
+    lock = threading.Lock()
+    counter = iter(range(requests))
+    connection = "keep-alive" if reuse == 'keep-alive' else "close"
+    request = (f"GET /status?player_id=heartbeat HTTP/1.1\r\nHost: localhost:{port}\r\n"
+               f"Connection: {connection}\r\n\r\n").encode()
+
+    def worker():
+        conn, session = None, None
+        for _ in counter:
+            start = time.perf_counter()
+            try:
+                if conn is None:
+                    raw = socket.create_connection(('127.0.0.1', port), timeout=5)
+                    raw.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    conn = context.wrap_socket(raw, server_hostname='localhost',
+                                               session=session if reuse == 'resumed' else None)
+                    if conn.session_reused:
+                        with lock:
+                            counts['resumed'] += 1
+                conn.sendall(request)
+                status_line = _read_http_response(conn).split(b"\r\n", 1)[0]
+                # TLS 1.3 tickets arrive after the handshake, so take the session once a response was read
+                session = conn.session
+            except OSError:
+                status_line = b""
+            if reuse != 'keep-alive' or not status_line:
+                conn.close() if conn else None
+                conn = None
+            if b" 200 " not in status_line:
+                with lock:
+                    counts['errors'] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+        if conn:
+            conn.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, counts['resumed'], counts['errors'], time.perf_counter() - started
+
+
+def bench_lb_tls(args):
+    """Cost of TLS at the LB per request: full vs resumed handshakes vs keep-alive, against plain TCP"""
+    if not shutil.which('openssl'):
+        sys.exit("openssl not found (needed to generate the test certificate)")
+    backend = multiprocessing.Process(target=_stub_backend_process, args=(args.backend_port,), daemon=True)
+    backend.start()
+    _wait_for_port(args.backend_port)
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        cert, key = _make_certificate(directory, args.key_type)
+        try:
+            lb = _start_lb(args.lb_port, [args.backend_port], '--mode', args.mode)
+            try:
+                cpu_before = _cpu_seconds(lb.pid)
+                latencies, errors, seconds = _load(args.lb_port, args.requests, args.concurrency)
+                cpu = _cpu_seconds(lb.pid) - cpu_before
+                rows.append(('plain TCP', '-', f"{len(latencies) / seconds:,.0f}", f"{_percentile(latencies, 0.5) * 1000:.2f}",
+                             f"{_percentile(latencies, 0.99) * 1000:.2f}", f"{cpu / max(1, len(latencies)) * 1e6:.0f}",
+                             '-', errors))
+            finally:
+                lb.terminate()
+                lb.wait()
+            lb = _start_lb(args.lb_port, [args.backend_port], '--mode', args.mode, '--tls-cert', cert, '--tls-key', key)
+            try:
+                for version in args.versions.split(','):
+                    tls_version = {'1.2': ssl.TLSVersion.TLSv1_2, '1.3': ssl.TLSVersion.TLSv1_3}[version]
+                    for reuse in ('full', 'resumed', 'keep-alive'):
+                        cpu_before = _cpu_seconds(lb.pid)
+                        latencies, resumed, errors, seconds = _tls_load(args.lb_port, args.requests, args.concurrency,
+                                                                        cert, reuse, tls_version)
+                        cpu = _cpu_seconds(lb.pid) - cpu_before
+                        handshakes = args.concurrency if reuse == 'keep-alive' else args.requests
+                        rows.append((f"TLS {reuse}", version, f"{len(latencies) / seconds:,.0f}",
+                                     f"{_percentile(latencies, 0.5) * 1000:.2f}", f"{_percentile(latencies, 0.99) * 1000:.2f}",
+                                     f"{cpu / max(1, len(latencies)) * 1e6:.0f}", f"{resumed / handshakes:.0%}", errors))
+            finally:
+                lb.terminate()
+                lb.wait()
+        finally:
+            backend.terminate()
+    print(f"{args.concurrency} clients, LB mode {args.mode}, {args.key_type} certificate; 'full' and 'resumed' open a "
+          f"connection per request like ClientInterface")
+    _print_table(['client', 'TLS', 'req/s', 'p50 ms', 'p99 ms', 'LB cpu us/req', 'resumed', 'errors'], rows)
+
+
+# ---------------------------------------------------------------- lb-unix
+
+def _unix_stub_process(port, path):
+    _StubBackend(port)
+    _UnixStubBackend(path)
+    threading.Event().wait()
+
+
+def bench_lb_unix(args):
+    """LB -> backend hop over loopback TCP vs a Unix domain socket, same stub backend behind both
+
+    The stubs run in their own process and the two LBs take turns per
+    round, so neither transport gets the quieter half of the run.
+    """
+    path = os.path.join(args.socket_dir, f"stroop-bench-{os.getpid()}.sock")
+    backends = multiprocessing.Process(target=_unix_stub_process, args=(args.backend_port, path), daemon=True)
+    backends.start()
+    _wait_for_port(args.backend_port)
+    targets = {'tcp': args.backend_port, 'unix': f"unix:{path}"}
+    rows = []
+    try:
+        for mode in args.modes.split(','):
+            lbs = {transport: _start_lb(args.lb_port + i, [target], '--mode', mode)
+                   for i, (transport, target) in enumerate(targets.items())}
+            best = {}
+            try:
+                for _ in range(args.rounds):
+                    for i, (transport, lb) in enumerate(lbs.items()):
+                        cpu_before = _cpu_seconds(lb.pid)
+                        latencies, errors, seconds = _load(args.lb_port + i, args.requests, args.concurrency,
+                                                           keep_alive=args.keep_alive)
+                        cpu = _cpu_seconds(lb.pid) - cpu_before
+                        if transport not in best or seconds < best[transport][2]:
+                            best[transport] = (latencies, errors, seconds, cpu)
+            finally:
+                for lb in lbs.values():
+                    lb.terminate()
+                    lb.wait()
+            for transport, (latencies, errors, seconds, cpu) in best.items():
+                rows.append((mode, transport, f"{len(latencies) / seconds:,.0f}",
+                             f"{_percentile(latencies, 0.5) * 1000:.2f}", f"{_percentile(latencies, 0.99) * 1000:.2f}",
+                             f"{cpu / max(1, len(latencies)) * 1e6:.0f}", errors))
+    finally:
+        backends.terminate()
+        backends.join()
+        if os.path.exists(path):
+            os.unlink(path)
+    print(f"{args.concurrency} clients over TCP to the LB, {'keep-alive' if args.keep_alive else 'new connection per request'}; "
+          f"only the LB -> backend hop changes")
+    _print_table(['mode', 'backend hop', 'req/s', 'p50 ms', 'p99 ms', 'LB cpu us/req', 'errors'], rows)
+
+
+# ---------------------------------------------------------------- lb-rolling
+
+def _start_game_server(port, notice):
+    """Real server_thread_http.py on the in-memory fallback (no Redis), draining notice seconds on SIGTERM"""
+    return subprocess.Popen(
+        [sys.executable, 'server_thread_http.py', '--port', str(port), '--no-redis-reconnect',
+         '--redis-port', '1', '--drain-notice', str(notice)],
+        cwd=SRC_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def _wait_healthy_count(admin_port, count, timeout=30.0):
+    """Wait until the LB admin /health lists exactly count healthy backends"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            _, health = _http_get(admin_port, '/health')
+            if health and sum(h['healthy'] for h in health) == count:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.1)
+    return False
+
+
+def _load_until(port, stop, concurrency, keep_alive=False):
+    """Like _load, but runs until stop is set; returns (latencies, errors)"""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    request = (f"GET /status?player_id=heartbeat HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n"
+               f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode()
+
+    def worker():
+        conn = None
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = socket.create_connection(('127.0.0.1', port), timeout=5)
+                conn.sendall(request)
+                response = _read_http_response(conn)
+            except OSError:
+                response = b""
+            status_line = response.split(b"\r\n", 1)[0]
+            if not keep_alive or not status_line or b"connection: close" in response.lower():
+                conn.close() if conn else None
+                conn = None
+            with lock:
+                if b" 200 " in status_line:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors[0] += 1
+        if conn:
+            conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    return threads, latencies, errors
+
+
+def bench_lb_rolling(args):
+    """Restart the three game servers one after another under load and count the requests that fail
+
+    'kill' is a crash (SIGKILL); a number is SIGTERM with that --drain-notice,
+    i.e. how long the server keeps accepting while the LB takes it out.
+    """
+    ports = [args.backend_port + i for i in range(3)]
+    admin_port = args.lb_port + 1000
+    rows = []
+    for mode in args.modes.split(','):
+        for stop_kind in args.stops.split(','):
+            notice = 0 if stop_kind == 'kill' else float(stop_kind)
+            servers = [_start_game_server(port, notice) for port in ports]
+            lb = None
+            try:
+                for port in ports:
+                    _wait_for_port(port, timeout=30)
+                lb = _start_lb(args.lb_port, ports, '--mode', mode, '--health-interval', str(args.health_interval),
+                               '--admin-port', str(admin_port))
+                _wait_healthy_count(admin_port, len(ports))
+                stop = threading.Event()
+                threads, latencies, errors = _load_until(args.lb_port, stop, args.concurrency, args.keep_alive)
+                started = time.perf_counter()
+                time.sleep(1.0)
+                for i, port in enumerate(ports):
+                    if stop_kind == 'kill':
+                        servers[i].kill()
+                    else:
+                        servers[i].send_signal(signal.SIGTERM)
+                    servers[i].wait()
+                    _wait_healthy_count(admin_port, len(ports) - 1)  # the LB noticed it is gone
+                    servers[i] = _start_game_server(port, notice)
+                    _wait_healthy_count(admin_port, len(ports))
+                time.sleep(1.0)
+                stop.set()
+                for t in threads:
+                    t.join()
+                seconds = time.perf_counter() - started
+                label = 'SIGKILL' if stop_kind == 'kill' else f"SIGTERM, notice {notice:g}s"
+                rows.append((mode, label, f"{seconds:.1f}", len(latencies) + errors[0],
+                             f"{_percentile(latencies, 0.99) * 1000:.2f}", f"{max(latencies, default=0) * 1000:.1f}",
+                             errors[0]))
+            finally:
+                if lb:
+                    lb.terminate()
+                    lb.wait()
+                for server in servers:
+                    server.kill()
+                    server.wait()
+    print(f"{args.concurrency} clients, {'keep-alive' if args.keep_alive else 'new connection per request'}; "
+          f"LB health interval {args.health_interval}s")
+    _print_table(['mode', 'server stop', 'seconds', 'requests', 'p99 ms', 'max ms', 'failed'], rows)
+
+
+# ---------------------------------------------------------------- client-keepalive
+
+def bench_client_keepalive(args):
+    """Time per ClientInterface request on the game loop: new connection per call vs the persistent one
+
+    Runs the real client headless (SDL dummy driver) against a real game
+    server, directly and through the LB in tcp and http mode.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    from client import ClientInterface
+    server = _start_game_server(args.backend_port, 0)
+    rows = []
+    try:
+        _wait_for_port(args.backend_port, timeout=30)
+        targets = [('direct', args.backend_port, None)] + [(f"LB {mode}", args.lb_port, mode) for mode in args.modes.split(',')]
+        for name, port, mode in targets:
+            lb = _start_lb(args.lb_port, [args.backend_port], '--mode', mode) if mode else None
+            try:
+                client = ClientInterface('bench', [port], use_load_balancer=False)
+                for reconnect in (True, False):
+                    samples = []
+                    for _ in range(args.requests):
+                        if reconnect:
+                            client.close()  # what every call used to pay
+                        started = time.perf_counter()
+                        client.get_question()
+                        samples.append(time.perf_counter() - started)
+                    rows.append((name, 'new per request' if reconnect else 'keep-alive',
+                                 f"{_percentile(samples, 0.5) * 1000:.3f}", f"{_percentile(samples, 0.99) * 1000:.3f}",
+                                 f"{sum(samples) / len(samples) * 1000 / (1000 / 60) * 100:.1f}%"))
+                client.close()
+            finally:
+                if lb:
+                    lb.terminate()
+                    lb.wait()
+    finally:
+        server.terminate()
+        server.wait()
+    print(f"{args.requests} sequential GET /question per case, one client")
+    _print_table(['target', 'connection', 'p50 ms', 'p99 ms', 'of a 60 FPS frame'], rows)
+
+
+# ---------------------------------------------------------------- client-frames
+
+def bench_client_frames(args):
+    """Frame times of the game loop with a slow server: polling inside the loop vs the NetworkWorker
+
+    Runs the real render_game_ui headless (SDL dummy driver) at the game's
+    30 FPS cap against a stub server that takes --delays seconds per request.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    import pygame
+    from client import ClientInterface, NetworkWorker, render_game_ui
+    rows = []
+    for delay in [float(d) for d in args.delays.split(',')]:
+        backend = _StubBackend(args.backend_port, delay=delay)
+        try:
+            for worker in (False, True):
+                client = ClientInterface('bench', [args.backend_port], use_load_balancer=False)
+                network = NetworkWorker(client) if worker else None
+                if network:
+                    network.start()
+                    network.wait_first_status()
+                clock, frames = pygame.time.Clock(), []
+                deadline = time.time() + args.seconds
+                while time.time() < deadline:
+                    started = time.perf_counter()
+                    if network:
+                        status, question, _ = network.latest
+                    else:
+                        status, question = client.get_game_status() or {}, client.get_question()
+                    render_game_ui(status, 0, question)
+                    pygame.event.pump()
+                    pygame.display.flip()
+                    frames.append(time.perf_counter() - started)
+                    clock.tick(30)
+                if network:
+                    network.stop()
+                    network.join()
+                client.close()
+                rows.append((f"{delay * 1000:.0f}", 'worker' if worker else 'in loop',
+                             f"{len(frames) / args.seconds:.1f}", f"{_percentile(frames, 0.5) * 1000:.2f}",
+                             f"{_percentile(frames, 0.99) * 1000:.2f}", f"{max(frames) * 1000:.1f}"))
+        finally:
+            backend.kill()
+    print(f"{args.seconds:.0f} s of game loop per case, capped at 30 FPS")
+    _print_table(['server ms', 'polling', 'FPS', 'p50 frame ms', 'p99 frame ms', 'max ms'], rows)
+
+
+# ---------------------------------------------------------------- client-assets
+
+def bench_client_assets(args):
+    """Frame time of the client screens with assets loaded on every call vs the preloaded AssetManager
+
+    The per-call case overrides AssetManager to forget everything before each
+    lookup, which is what load_font and the pygame.image.load calls used to do.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    import pygame
+    import client
+
+    class PerCallAssets(client.AssetManager):
+        def font(self, name, size):
+            self.fonts.clear()
+            return super().font(name, size)
+
+        def image(self, name, size=None):
+            self.images.clear()
+            return super().image(name, size)
+
+    status = {'status': 'playing', 'current_question_number': 3, 'max_questions': 10, 'question_time_remaining': 7.4,
+              'scores': {f"player{i}": i * 120 for i in range(args.players)}}
+    question = {'question_id': 3, 'text': 'GREEN', 'text_color': 'RED',
+                'options': ['RED', 'GREEN', 'BLUE', 'YELLOW', 'PURPLE']}
+
+    def game_frame():
+        client.render_game_ui(status, 240, question)
+
+    def special_frame():  # show_special_screen entry: background image plus the game UI under it
+        client.render_game_ui(status, 240, question)
+        client.screen.blit(client.assets.image('timesup.png', (client.WIDTH, client.HEIGHT)), (0, 0))
+        client.draw_scores(status['scores'], 'player1')
+
+    def popup_frame():  # show_popup_with_image / draw_popup_overlay
+        client.render_game_ui(status, 240, question)
+        client.draw_popup_overlay('correct')
+
+    rows = []
+    for name, frame in (('game', game_frame), ('special screen, first frame', special_frame),
+                        ('answer popup, first frame', popup_frame)):
+        for label, manager in (('per call', PerCallAssets()), ('preloaded', client.AssetManager())):
+            client.assets = manager
+            if label == 'preloaded':
+                manager.preload()
+            samples = []
+            for _ in range(args.frames):
+                started = time.perf_counter()
+                frame()
+                pygame.display.flip()
+                samples.append(time.perf_counter() - started)
+            rows.append((name, label, f"{_percentile(samples, 0.5) * 1000:.3f}", f"{_percentile(samples, 0.99) * 1000:.3f}",
+                         f"{sum(samples) / len(samples) * 1000 / (1000 / 60) * 100:.1f}%"))
+    print(f"{args.frames} frames per case, {args.players} players on the scoreboard")
+    _print_table(['frame', 'assets', 'p50 ms', 'p99 ms', 'of a 60 FPS frame'], rows)
+
+
+# ---------------------------------------------------------------- client-text
+
+def bench_client_text(args):
+    """Game frame time with text rendered every frame vs the TextCache, and its size over a long session
+
+    The session part plays --questions random questions of 11 frames each
+    (timer 10..0) with changing scores and reports the cache size at
+    checkpoints.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    import random
+    import pygame
+    import client
+
+    class PerFrameText(client.TextCache):
+        def render(self, font, text, color):
+            self.entries.clear()
+            return super().render(font, text, color)
+
+    rng = random.Random(1)
+    colours = list(client.COLOR_MAP)
+    players = [f"player{i}" for i in range(args.players)]
+
+    def question(number):
+        return {'question_id': number, 'text': rng.choice(colours), 'text_color': rng.choice(colours),
+                'options': rng.sample(colours, 5)}
+
+    def status(number, scores, remaining):
+        return {'status': 'playing', 'current_question_number': number % 10 + 1, 'max_questions': 10,
+                'question_time_remaining': remaining, 'scores': scores}
+
+    rows = []
+    scores = {p: rng.randrange(1000) for p in players}
+    q = question(1)
+    for label, cache in (('every frame', PerFrameText()), ('TextCache', client.TextCache())):
+        client.text_cache = cache
+        samples = []
+        for i in range(args.frames):
+            started = time.perf_counter()
+            client.render_game_ui(status(1, scores, 10 - i / 30), 240, q)
+            pygame.display.flip()
+            samples.append(time.perf_counter() - started)
+        rows.append((label, f"{_percentile(samples, 0.5) * 1000:.3f}", f"{_percentile(samples, 0.99) * 1000:.3f}",
+                     f"{sum(samples) / len(samples) * 1000 / (1000 / 60) * 100:.1f}%"))
+    print(f"{args.frames} frames of one question (30 FPS timer), {args.players} players on the scoreboard")
+    _print_table(['text', 'p50 ms', 'p99 ms', 'of a 60 FPS frame'], rows)
+
+    cache = client.text_cache = client.TextCache(args.max_entries)
+    checkpoints = {c for c in (10, 100, 500, 1000, 5000, 10000) if c < args.questions} | {args.questions}
+    rows = []
+    for number in range(1, args.questions + 1):
+        q = question(number)
+        for player in players:
+            scores[player] += rng.randrange(0, 150)
+        for remaining in range(10, -1, -1):
+            client.render_game_ui(status(number, scores, remaining), scores[players[0]], q)
+        if number in checkpoints:
+            stats = cache.get_stats()
+            size = sum(surface.get_width() * surface.get_height() * surface.get_bytesize() for surface in cache.entries.values())
+            rows.append((number, stats['entries'], f"{size / 1e6:.2f}", stats['evictions'],
+                         f"{stats['hits'] / max(1, stats['hits'] + stats['misses']) * 100:.1f}%"))
+    print(f"\nLong session, max_entries={args.max_entries}")
+    _print_table(['questions', 'entries', 'surfaces MB', 'evictions', 'hit rate'], rows)
+
+
+# ---------------------------------------------------------------- redis-failover
+
+def bench_redis_failover(args):
+    redis_proc = _spawn_redis([args.redis_port])[0]
+    server = subprocess.Popen(
+        [sys.executable, 'server_thread_http.py', '--port', str(args.server_port), '--redis-port', str(args.redis_port),
+         '--server-id', 'bench', '--redis-check-interval', str(args.check_interval),
+         '--redis-retry-max', '1'],
+        cwd=SRC_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    timeline = []  # (phase, ok)
+    try:
+        if not _wait_for_port(args.server_port):
+            sys.exit("game server did not start")
+
+        def poll(phase, seconds):
+            deadline = time.time() + seconds
+            while time.time() < deadline:
+                try:
+                    code, body = _http_get(args.server_port, '/status?player_id=heartbeat')
+                    ok = code == 200 and body is not None and body.get('status') != 'error' and 'message' not in body
+                except OSError:
+                    ok = False
+                timeline.append((phase, ok))
+                time.sleep(args.poll_interval)
+
+        poll('before', args.phase)
+        redis_proc.terminate()
+        redis_proc.wait()
+        poll('outage', args.phase)
+        redis_proc = _spawn_redis([args.redis_port])[0]
+        poll('recovered', args.phase)
+        _, stats = _http_get(args.server_port, '/server-stats')
+    finally:
+        server.terminate()
+        redis_proc.terminate()
+
+    rows = []
+    for phase in ('before', 'outage', 'recovered'):
+        results = [ok for p, ok in timeline if p == phase]
+        rows.append((phase, len(results), results.count(False)))
+    _print_table(['phase', 'polls', 'failed'], rows)
+    supervisor = (stats or {}).get('redis_supervisor') or {}
+    print(f"failover: {supervisor.get('last_failover_seconds')}s  "
+          f"reconcile: {supervisor.get('last_recovery_seconds')}s  "
+          f"outage: {supervisor.get('last_outage_seconds')}s  mode: {supervisor.get('mode')}")
+
+
+# ---------------------------------------------------------------- redis-shards
+
+def _shard_worker(args):
+    shards, rooms, duration, seed = args
+    from game_state import RedisGameState
+    rng = random.Random(seed)
+    states = [RedisGameState(room=room, shards=shards) for room in rooms]
+    ops, deadline = 0, time.time() + duration
+    while time.time() < deadline:
+        gs = rng.choice(states)
+        # One status poll worth of reads plus a heartbeat write
+        gs.get_game_state_field('game_started')
+        gs.get_game_state_field('countdown_started')
+        gs.get_connected_players()
+        gs.get_player_scores()
+        gs.update_heartbeat(f"player-{rng.randint(1, 8)}")
+        ops += 5
+    return ops
+
+
+def bench_redis_shards(args):
+    from redis_shards import parse_redis_nodes, room_keyspace, create_redis_client
+    nodes = parse_redis_nodes(args.shards)
+    procs = _spawn_redis([p for _, p in nodes]) if args.spawn else []
+    rows = []
+    try:
+        for count in range(1, len(nodes) + 1):
+            shards = nodes[:count]
+            rooms = [f"bench-{i}" for i in range(args.rooms)]
+            jobs = [(shards, rooms, args.duration, seed) for seed in range(args.workers)]
+            with multiprocessing.Pool(args.workers) as pool:
+                total_ops = sum(pool.map(_shard_worker, jobs))
+            rows.append((count, args.rooms, args.workers, f"{total_ops / args.duration:,.0f}"))
+            for room in rooms:
+                client, _ = create_redis_client(room=room, shards=shards)
+                keys = list(client.scan_iter(room_keyspace(room) + '*'))
+                if keys:
+                    client.delete(*keys)
+    finally:
+        for p in procs:
+            p.terminate()
+    _print_table(['shards', 'rooms', 'workers', 'ops/s'], rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stroop Color Game benchmarks')
+    sub = parser.add_subparsers(dest='benchmark', required=True)
+
+    p = sub.add_parser('lb-latency', help='Request latency through the load balancer, per engine/mode')
+    p.add_argument('--engines', default='threaded,event,http',
+                   help='Engines to compare: threaded, event (tcp relay), http (L7) (default: all three)')
+    p.add_argument('--keep-alive', action='store_true', help='Clients reuse one connection (default: connect per request)')
+    p.add_argument('--lb-port', type=int, default=9888, help='Load balancer port (default: 9888)')
+    p.add_argument('--backend-port', type=int, default=9889, help='Stub backend port (default: 9889)')
+    p.add_argument('--backend-delay', type=float, default=0.0, help='Stub backend think time in seconds (default: 0)')
+    p.add_argument('--requests', type=int, default=2000, help='Requests per engine (default: 2000)')
+    p.add_argument('--concurrency', type=int, default=16, help='Concurrent client threads (default: 16)')
+    p.add_argument('--idle', type=int, default=0, help='Idle connections held open during the run (default: 0)')
+    p.set_defaults(func=bench_lb_latency)
+
+    p = sub.add_parser('lb-backend-down', help='Failed requests and stalls while a backend goes down')
+    p.add_argument('--modes', default='tcp,http', help='LB modes to run (default: tcp,http)')
+    p.add_argument('--lb-port', type=int, default=9888, help='Load balancer port (default: 9888)')
+    p.add_argument('--backend-port', type=int, default=9889, help='First stub backend port (default: 9889)')
+    p.add_argument('--requests', type=int, default=20000, help='Requests per run (default: 20000)')
+    p.add_argument('--concurrency', type=int, default=16, help='Concurrent client threads (default: 16)')
+    p.add_argument('--kill-after', type=float, default=1.0, help='Seconds before the backend is stopped (default: 1)')
+    p.add_argument('--health-interval', type=float, default=2.0, help='LB --health-interval (default: 2)')
+    p.set_defaults(func=bench_lb_backend_down)
+
+    p = sub.add_parser('lb-policies', help='Tail latency per balancing policy with skewed backend speeds')
+    p.add_argument('--policies', default='round_robin,least_outstanding,p2c,weighted',
+                   help='Policies to compare (default: all)')
+    p.add_argument('--delays', default='0.002,0.002,0.02', help='Mean service time per backend in seconds (default: 0.002,0.002,0.02)')
+    p.add_argument('--simulate', action='store_true', help='Run the discrete-event model instead of real sockets')
+    p.add_argument('--rate', type=float, default=2500, help='Simulation: arrivals per second (default: 2500)')
+    p.add_argument('--workers', type=int, default=4, help='Simulation: parallel slots per backend (default: 4)')
+    p.add_argument('--mode', choices=['tcp', 'http'], default='http', help='LB mode for the live run (default: http)')
+    p.add_argument('--lb-port', type=int, default=9888, help='Load balancer port (default: 9888)')
+    p.add_argument('--backend-port', type=int, default=9889, help='First stub backend port (default: 9889)')
+    p.add_argument('--requests', type=int, default=3000, help='Requests per policy (default: 3000)')
+    p.add_argument('--concurrency', type=int, default=24, help='Concurrent client threads (default: 24)')
+    p.add_argument('--stats-interval', type=float, default=0.5, help='LB /server-stats scrape interval (default: 0.5)')
+    p.set_defaults(func=bench_lb_policies)
+
+    p = sub.add_parser('lb-hash', help='consistent_hash remapping on backend add/remove and bounded-load spill')
+    p.add_argument('--keys', type=int, default=20000, help='Distinct players (default: 20000)')
+    p.add_argument('--backends', type=int, default=4, help='Backends before add/remove (default: 4)')
+    p.add_argument('--balance', type=float, default=0.25, help='Load bound factor (default: 0.25)')
+    p.add_argument('--requests', type=int, default=100000, help='Requests in the skewed-traffic run (default: 100000)')
+    p.add_argument('--zipf', type=float, default=1.1, help='Player popularity skew (default: 1.1)')
+    p.add_argument('--in-flight', type=int, default=64, help='Concurrent requests in the skewed run (default: 64)')
+    p.set_defaults(func=bench_lb_hash)
+
+    p = sub.add_parser('lb-throughput', help='Bulk throughput and LB CPU per GB, splice vs buffered forwarding')
+    p.add_argument('--modes', default='buffer,splice', help='Forwarding modes to compare (default: buffer,splice)')
+    p.add_argument('--lb-port', type=int, default=9888, help='Load balancer port (default: 9888)')
+    p.add_argument('--backend-port', type=int, default=9889, help='Bulk backend port (default: 9889)')
+    p.add_argument('--size-mb', type=int, default=256, help='Response body size per stream in MB (default: 256)')
+    p.add_argument('--streams', type=int, default=4, help='Parallel downloads (default: 4)')
+    p.add_argument('--rounds', type=int, default=3, help='Runs per mode, best one is reported (default: 3)')
+    p.set_defaults(func=bench_lb_throughput)
+
+    p = sub.add_parser('lb-cache', help='Backend load and latency of identical polls with the LB micro-cache')
+    p.add_argument('--ttls', default='0.05,0.25', help='Micro-cache TTLs in seconds to compare with no cache (default: 0.05,0.25)')
+    p.add_argument('--lb-port', type=int, default=9888, help='Load balancer port (default: 9888)')
+    p.add_argument('--backend-port', type=int, default=9889, help='Stub backend port (default: 9889)')
+    p.add_argument('--backend-delay', type=float, default=0.005, help='Stub backend think time in seconds (default: 0.005)')
+    p.add_argument('--requests', type=int, default=5000, help='Requests per run (default: 5000)')
+    p.add_argument('--concurrency', type=int, default=32, help='Concurrent client threads (default: 32)')
+    p.set_defaults(func=bench_lb_cache)
+
+    p = sub.add_parser('lb-limits', help='Per-backend max-in-flight with a slow backend: spill-over, queueing, 503s')
+    p.add_argument('--limits', default='4', help='--max-in-flight values to compare with no limit (default: 4)')
+    p.add_argument('--queue-size', type=int, default=16, help='LB --queue-size (default: 16)')
+    p.add_argument('--slow-delay', type=float, default=0.2, help='Slow backend think time in seconds (default: 0.2)')
+    p.add_argument('--fast-delay', type=float, default=0.002, help='Fast backend think time in seconds (default: 0.002)')
+    p.add_argument('--mode', choices=['tcp', 'http'], default='tcp', help='LB mode (default: tcp)')
+    p.add_argument('--requests', type=int, default=3000, help='Requests per run (default: 3000)')
+    p.add_argument('--concurrency', type=int, default=20, help='Concurrent client threads (default: 20)')
+    p.add_argument('--lb-port', type=int, default=9888, help='Load balancer port (default: 9888)')
+    p.add_argument('--backend-port', type=int, default=9889, help='Slow backend port; the fast one uses the next (default: 9889)')
+    p.set_defaults(func=bench_lb_limits)
+
+    p = sub.add_parser('lb-workers', help='Connection rate scaling with LB --workers (SO_REUSEPORT)')
+    p.add_argument('--workers', default='1,2,4', help='LB worker counts to compare (default: 1,2,4)')
+    p.add_argument('--backends', type=int, default=3, help='Stub backend processes (default: 3)')
+    p.add_argument('--clients', type=int, default=4, help='Load generator processes (default: 4)')
+    p.add_argument('--concurrency', type=int, default=16, help='Threads per load generator process (default: 16)')
+    p.add_argument('--requests', type=int, default=20000, help='Requests per run (default: 20000)')
+    p.add_argument('--backlog', type=int, default=1024, help='LB --backlog (default: 1024)')
+    p.add_argument('--lb-port', type=int, default=9888, help='Load balancer port (default: 9888)')
+    p.add_argument('--backend-port', type=int, default=9889, help='First stub backend port (default: 9889)')
+    p.set_defaults(func=bench_lb_workers)
+
+    p = sub.add_parser('lb-routes', help='POST /answer latency under a /status flood, shared vs a routed writes pool')
+    p.add_argument('--floods', default='32,128', help='Keep-alive /status pollers to compare with none (default: 32,128)')
+    p.add_argument('--backends', type=int, default=4, help='Stub backend processes; routed keeps the last for writes (default: 4)')
+    p.add_argument('--backend-delay', type=float, default=0.005, help='Stub backend time per request in seconds (default: 0.005)')
+    p.add_argument('--capacity', type=int, default=4, help='Requests a stub backend works on at once (default: 4)')
+    p.add_argument('--answers', type=int, default=300, help='POST /answer requests per run (default: 300)')
+    p.add_argument('--concurrency', type=int, default=2, help='Concurrent answer clients (default: 2)')
+    p.add_argument('--lb-port', type=int, default=9888, help='Load balancer port (default: 9888)')
+    p.add_argument('--backend-port', type=int, default=9889, help='First stub backend port (default: 9889)')
+    p.set_defaults(func=bench_lb_routes)
+
+    p = sub.add_parser('lb-tls', help='TLS termination cost: full vs resumed handshakes vs keep-alive, against plain TCP')
+    p.add_argument('--versions', default='1.2,1.3', help='TLS versions to compare (default: 1.2,1.3)')
+    p.add_argument('--key-type', choices=list(KEY_TYPES), default='rsa',
+                   help='Certificate key: rsa (2048) or ec (P-256) (default: rsa)')
+    p.add_argument('--mode', choices=['tcp', 'http'], default='http', help='LB mode (default: http)')
+    p.add_argument('--requests', type=int, default=2000, help='Requests per run (default: 2000)')
+    p.add_argument('--concurrency', type=int, default=8, help='Concurrent client threads (default: 8)')
+    p.add_argument('--lb-port', type=int, default=9888, help='Load balancer port (default: 9888)')
+    p.add_argument('--backend-port', type=int, default=9889, help='Stub backend port (default: 9889)')
+    p.set_defaults(func=bench_lb_tls)
+
+    p = sub.add_parser('lb-unix', help='LB -> backend over loopback TCP vs a Unix domain socket')
+    p.add_argument('--modes', default='tcp,http', help='LB modes to run (default: tcp,http)')
+    p.add_argument('--keep-alive', action='store_true', help='Clients reuse one connection (default: connect per request)')
+    p.add_argument('--requests', type=int, default=5000, help='Requests per run (default: 5000)')
+    p.add_argument('--concurrency', type=int, default=16, help='Concurrent client threads (default: 16)')
+    p.add_argument('--rounds', type=int, default=5, help='Runs per case, best one is reported (default: 5)')
+    p.add_argument('--socket-dir', default='/tmp', help='Directory for the stub backend socket (default: /tmp)')
+    p.add_argument('--lb-port', type=int, default=9887, help='First load balancer port; the UDS one uses the next (default: 9887)')
+    p.add_argument('--backend-port', type=int, default=9889, help='TCP stub backend port (default: 9889)')
+    p.set_defaults(func=bench_lb_unix)
+
+    p = sub.add_parser('lb-rolling', help='Failed requests during a rolling restart of three game servers')
+    p.add_argument('--stops', default='kill,0,3',
+                   help='How servers stop: kill (SIGKILL) or a SIGTERM --drain-notice in seconds (default: kill,0,3)')
+    p.add_argument('--modes', default='tcp,http', help='LB modes to run (default: tcp,http)')
+    p.add_argument('--keep-alive', action='store_true', help='Clients reuse one connection (default: connect per request)')
+    p.add_argument('--concurrency', type=int, default=16, help='Concurrent client threads (default: 16)')
+    p.add_argument('--health-interval', type=float, default=2.0, help='LB --health-interval (default: 2)')
+    p.add_argument('--lb-port', type=int, default=9888, help='Load balancer port; admin uses +1000 (default: 9888)')
+    p.add_argument('--backend-port', type=int, default=9889, help='First game server port (default: 9889)')
+    p.set_defaults(func=bench_lb_rolling)
+
+    p = sub.add_parser('client-keepalive', help='ClientInterface request time: new connection per call vs keep-alive')
+    p.add_argument('--modes', default='tcp,http', help='LB modes to include besides direct (default: tcp,http)')
+    p.add_argument('--requests', type=int, default=2000, help='Requests per case (default: 2000)')
+    p.add_argument('--lb-port', type=int, default=9888, help='Load balancer port (default: 9888)')
+    p.add_argument('--backend-port', type=int, default=9889, help='Game server port (default: 9889)')
+    p.set_defaults(func=bench_client_keepalive)
+
+    p = sub.add_parser('client-frames', help='Game loop frame times with a slow server, polling in the loop vs NetworkWorker')
+    p.add_argument('--delays', default='0,0.05,0.2', help='Server time per request in seconds, comma-separated')
+    p.add_argument('--seconds', type=float, default=3.0)
+    p.add_argument('--backend-port', type=int, default=9301)
+    p.set_defaults(func=bench_client_frames)
+
+    p = sub.add_parser('client-assets', help='Client frame time with fonts/images loaded per call vs preloaded AssetManager')
+    p.add_argument('--frames', type=int, default=300)
+    p.add_argument('--players', type=int, default=4)
+    p.set_defaults(func=bench_client_assets)
+
+    p = sub.add_parser('client-text', help='Client frame time with text rendered every frame vs TextCache, and its size')
+    p.add_argument('--frames', type=int, default=300)
+    p.add_argument('--players', type=int, default=4)
+    p.add_argument('--questions', type=int, default=2000)
+    p.add_argument('--max-entries', type=int, default=256)
+    p.set_defaults(func=bench_client_text)
+
+    p = sub.add_parser('redis-failover', help='Failover/recovery time of one server when Redis restarts')
+    p.add_argument('--redis-port', type=int, default=7100, help='Port for the throwaway redis-server (default: 7100)')
+    p.add_argument('--server-port', type=int, default=8989, help='Port for the game server under test (default: 8989)')
+    p.add_argument('--check-interval', type=float, default=0.25, help='Server --redis-check-interval (default: 0.25)')
+    p.add_argument('--phase', type=float, default=3.0, help='Seconds before, during and after the outage (default: 3)')
+    p.add_argument('--poll-interval', type=float, default=0.02, help='Seconds between status polls (default: 0.02)')
+    p.set_defaults(func=bench_redis_failover)
+
+    p = sub.add_parser('redis-shards', help='RedisGameState throughput as standalone shards are added')
+    p.add_argument('--shards', default='7001,7002,7003,7004', help='Redis instances host:port,... (default: 7001-7004)')
+    p.add_argument('--spawn', action='store_true', help='Start redis-server on the shard ports for the run')
+    p.add_argument('--rooms', type=int, default=64, help='Rooms spread over the shards (default: 64)')
+    p.add_argument('--workers', type=int, default=8, help='Load generator processes (default: 8)')
+    p.add_argument('--duration', type=float, default=5.0, help='Seconds per step (default: 5)')
+    p.set_defaults(func=bench_redis_shards)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
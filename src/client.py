@@ -1,7 +1,10 @@
 import pygame, sys, os, socket, json, logging
+from urllib.parse import quote
 import time  # Import time module for optimized polling
 import random
+import queue
 import threading
+from collections import OrderedDict
 
 # Setup minimal logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%H:%M:%S')
@@ -21,12 +24,112 @@ COLOR_MAP = {
     'BROWN': (139, 69, 19),
 }
 
+ASSETS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets'))
+
+class AssetManager:
+    """Fonts and converted images from assets/, loaded once and memoized
+
+    preload() builds every font at the sizes the screens use and converts
+    every PNG (full-screen ones also scaled to the window) at startup, so
+    the render loops only do dict lookups. A missing image keeps raising
+    pygame.error, which the screens already fall back on.
+    """
+    FONT_SIZES = {
+        'LuckiestGuy-Regular.ttf': (28, 30, 36, 38, 40, 48, 60, 80, 120),
+        'BalsamiqSans-Regular.ttf': (24, 25, 26, 30),
+    }
+    POPUP_IMAGES = ('correct.png', 'wrong.png')  # drawn at their own size, the rest fill the window
+
+    def __init__(self, directory=ASSETS_DIR):
+        self.directory = directory
+        self.fonts = {}
+        self.images = {}
+        self.missing = set()
+
+    def font(self, name, size):
+        key = (name, size)
+        font = self.fonts.get(key)
+        if font is None:
+            try:
+                font = pygame.font.Font(os.path.join(self.directory, name), size)
+            except Exception:
+                font = pygame.font.SysFont(None, size)
+            self.fonts[key] = font
+        return font
+
+    def image(self, name, size=None):
+        """assets/name converted for the display, smoothscaled to size when given"""
+        key = (name, size)
+        surface = self.images.get(key)
+        if surface is not None:
+            return surface
+        if name in self.missing:
+            raise pygame.error(f"missing asset {name}")
+        surface = self.images.get((name, None))
+        if surface is None:
+            try:
+                surface = pygame.image.load(os.path.join(self.directory, name)).convert_alpha()
+            except (pygame.error, FileNotFoundError) as e:
+                self.missing.add(name)
+                raise pygame.error(str(e))
+        if size:
+            surface = pygame.transform.smoothscale(surface, size)
+        self.images[key] = surface
+        return surface
+
+    def preload(self):
+        started = time.time()
+        for name, sizes in self.FONT_SIZES.items():
+            for size in sizes:
+                self.font(name, size)
+        for name in sorted(os.listdir(self.directory)) if os.path.isdir(self.directory) else []:
+            if name.endswith('.png'):
+                try:
+                    self.image(name, None if name in self.POPUP_IMAGES else (WIDTH, HEIGHT))
+                except pygame.error as e:
+                    logger.warning(f"🖼️ Asset {name} not loaded: {e}")
+        logger.info(f"🖼️ Preloaded {len(self.fonts)} fonts and {len(self.images)} images in {(time.time() - started) * 1000:.0f} ms")
+
+assets = AssetManager()
+assets.preload()
+
 def load_font(name, size):
-    path = os.path.abspath(os.path.join(os.path.dirname(__file__), f'../assets/{name}'))
-    try:
-        return pygame.font.Font(path, size)
-    except Exception:
-        return pygame.font.SysFont(None, size)
+    return assets.font(name, size)
+
+class TextCache:
+    """Rendered text surfaces keyed by font, text and colour, least recently used evicted first
+
+    The question, options, progress, timer and scoreboard rows change at
+    most once per second or per question, so nearly every frame is a hit;
+    max_entries keeps memory flat over long sessions.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = self.entries[key] = font.render(text, True, color)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def get_stats(self):
+        return {'entries': len(self.entries), 'max_entries': self.max_entries, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions}
+
+text_cache = TextCache()
 
 def show_popup(message, color=(0, 0, 0)):
     popup_rect = pygame.Rect((WIDTH-320)//2, (HEIGHT-120)//2, 320, 120)
@@ -40,8 +143,7 @@ def show_popup(message, color=(0, 0, 0)):
 
 def show_popup_with_image(message, image_filename, display_time=800):
     try:
-        img_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets', image_filename))
-        popup_img = pygame.image.load(img_path).convert_alpha()
+        popup_img = assets.image(image_filename)
         popup_rect = popup_img.get_rect(center=(WIDTH//2, HEIGHT//2))
         screen_backup = screen.copy()
         overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
@@ -62,8 +164,8 @@ def show_popup_with_image(message, image_filename, display_time=800):
 def display_color_question(question_text, color_name_for_rgb):
     font = load_font('LuckiestGuy-Regular.ttf', 80)
     color_rgb = COLOR_MAP.get(color_name_for_rgb, (0, 0, 0))
-    label = font.render(question_text, True, color_rgb)
-    outline = font.render(question_text, True, (0, 0, 0))
+    label = text_cache.render(font, question_text, color_rgb)
+    outline = text_cache.render(font, question_text, (0, 0, 0))
     label_rect = label.get_rect(center=(WIDTH // 2 + 70, 190))
     screen.blit(outline, label_rect.move(2, 2))
     screen.blit(label, label_rect)
@@ -79,7 +181,7 @@ def draw_name_options(option_names):
         rect = pygame.Rect(x - 200, y - 22, 400, 44)
         pygame.draw.rect(screen, (250, 250, 241), rect, border_radius=15)
         pygame.draw.rect(screen, (163, 102, 71), rect, 3, border_radius=15)
-        label = font.render(name, True, (70, 39, 24))
+        label = text_cache.render(font, name, (70, 39, 24))
         screen.blit(label, label.get_rect(center=(x, y)))
         positions.append(rect)
     return positions
@@ -96,7 +198,7 @@ def draw_scores(scores, highlight_name=None):
     y_offset = 90
     for nomor, (player, player_score) in enumerate(sorted(scores.items(), key=lambda x: -x[1]), 1):
         score_text = f"{nomor}. {player}: {player_score}"
-        label = font_other.render(score_text, True, (70, 39, 24))
+        label = text_cache.render(font_other, score_text, (70, 39, 24))
         label_rect = label.get_rect(topleft=(38, y_offset + 6))
         bg_rect = pygame.Rect(30, y_offset, 150, 36)
         if player == highlight_name:
@@ -108,8 +210,7 @@ def draw_scores(scores, highlight_name=None):
 def draw_popup_overlay(popup_type):
     if popup_type in ["correct", "wrong"]:
         try:
-            img_path = os.path.abspath(os.path.join(os.path.dirname(__file__), f'../assets/{popup_type}.png'))
-            popup_img = pygame.image.load(img_path).convert_alpha()
+            popup_img = assets.image(f'{popup_type}.png')
             popup_rect = popup_img.get_rect(center=(WIDTH//2, HEIGHT//2))
             overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
             overlay.fill((0, 0, 0, 128))
@@ -160,8 +261,7 @@ def show_you_win_or_lose(client, final_scores):
     if client.player_username == winner_name:
         # Tampilkan halaman YOU WIN
         try:
-            win_img = pygame.image.load(os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets/winner.png'))).convert_alpha()
-            screen.blit(pygame.transform.smoothscale(win_img, (WIDTH, HEIGHT)), (0, 0))
+            screen.blit(assets.image('winner.png', (WIDTH, HEIGHT)), (0, 0))
         except pygame.error:
             screen.fill((255, 255, 255))
             font = load_font('LuckiestGuy-Regular.ttf', 80)
@@ -175,8 +275,7 @@ def show_you_win_or_lose(client, final_scores):
 
 def show_final_score_page_with_buttons(final_scores, client):
     try:
-        final_img = pygame.image.load(os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets/final_score.png'))).convert_alpha()
-        screen.blit(pygame.transform.smoothscale(final_img, (WIDTH, HEIGHT)), (0, 0))
+        screen.blit(assets.image('final_score.png', (WIDTH, HEIGHT)), (0, 0))
     except pygame.error:
         screen.fill((255, 255, 255))
 
@@ -226,12 +325,12 @@ def render_game_ui(status, score, current_question):
     progress_render = None  # Initialize variable
     if status.get('current_question_number') and status.get('max_questions'):
         font_progress = load_font('BalsamiqSans-Regular.ttf', 25)
-        progress_render = font_progress.render(f"{status['current_question_number']}/{status['max_questions']}", True, (0, 0, 0))
+        progress_render = text_cache.render(font_progress, f"{status['current_question_number']}/{status['max_questions']}", (0, 0, 0))
         screen.blit(progress_render, (WIDTH // 2 - progress_render.get_width() // 2 - 95, 68))
     else:
         # Show default progress if no question data
         font_progress = load_font('BalsamiqSans-Regular.ttf', 25)
-        progress_render = font_progress.render("0/0", True, (0, 0, 0))
+        progress_render = text_cache.render(font_progress, "0/0", (0, 0, 0))
         screen.blit(progress_render, (WIDTH // 2 - progress_render.get_width() // 2 - 95, 68))
     
     # Question & options
@@ -246,12 +345,12 @@ def render_game_ui(status, score, current_question):
     remaining = max(0, int(time_remaining))
     font_timer = load_font('BalsamiqSans-Regular.ttf', 25)
     timer_color = (200, 0, 0) if remaining <= 3 else (0, 0, 0)
-    timer_render = font_timer.render(f"{remaining}s", True, timer_color)
+    timer_render = text_cache.render(font_timer, f"{remaining}s", timer_color)
     screen.blit(timer_render, (WIDTH - timer_render.get_width() - 100, 68))
     
     # Score - Fix: Make sure progress_render exists before using it
     font_score = load_font('BalsamiqSans-Regular.ttf', 30)
-    score_render = font_score.render(f"{score}", True, (0, 0, 0))
+    score_render = text_cache.render(font_score, f"{score}", (0, 0, 0))
     if progress_render:  # Check if progress_render exists
         score_x = WIDTH // 2 + progress_render.get_width() // 2 - score_render.get_width() + 50
     else:
@@ -271,8 +370,9 @@ class ClientInterface:
     _round_robin_index = 0
     _round_robin_lock = threading.Lock()
     
-    def __init__(self, player_username, server_ports=None, use_load_balancer=True):
+    def __init__(self, player_username, server_ports=None, use_load_balancer=True, room='default'):
         self.player_username = player_username
+        self.room = room  # Only a routing key: load_balancer.py --policy consistent_hash --hash-key room
         self.server_host = '127.0.0.1'
         self.use_load_balancer = use_load_balancer
         
@@ -292,6 +392,10 @@ class ClientInterface:
         self.server_port = None
         self._last_status = None
         
+        # One persistent HTTP/1.1 connection, reopened when the server closes it
+        self._conn = None
+        self._conn_lock = threading.Lock()
+        
         # Add polling optimization
         self._status_cache = None
         self._last_status_time = 0
@@ -365,59 +469,127 @@ class ClientInterface:
         except (socket.error, socket.timeout, ConnectionRefusedError):
             return False
 
+    def _try_next_server_round_robin(self):
+        """Fail over to the next server port (round robin); False when there is nowhere else to go"""
+        port = self._get_next_round_robin_port(self.server_ports)
+        if port is None:
+            return False
+        if port == self.server_port and len(self.server_ports) > 1:
+            port = self._get_next_round_robin_port(self.server_ports)
+        logger.info(f"🔁 Switching server {self.server_port} → {port}")
+        self.server_port = port
+        self.current_port_index = self.server_ports.index(port)
+        return True
+
+    def _open_connection(self):
+        conn = socket.create_connection((self.server_host, self.server_port), timeout=5.0)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conn
+
+    def close(self):
+        """Close the persistent connection (the next request reconnects)"""
+        if self._conn:
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+            self._conn = None
+
+    def _read_response(self, conn):
+        """Read one response; the body is framed by Content-Length. Returns (body, keep_alive)"""
+        data = b""
+        while b"\r\n\r\n" not in data:
+            part = conn.recv(4096)
+            if not part:
+                if data:
+                    raise ConnectionError("connection closed in the middle of the response headers")
+                raise ConnectionResetError("server closed the connection")
+            data += part
+        head, _, body = data.partition(b"\r\n\r\n")
+        length, keep_alive = None, head.startswith(b"HTTP/1.1")
+        for line in head.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            if name == b"content-length":
+                length = int(value.strip())
+            elif name == b"connection":
+                keep_alive = b"keep-alive" in value.lower()
+        if length is None:
+            # No Content-Length: the body ends when the server closes the connection
+            while True:
+                part = conn.recv(4096)
+                if not part:
+                    return body, False
+                body += part
+        while len(body) < length:
+            part = conn.recv(max(4096, length - len(body)))
+            if not part:
+                raise ConnectionError("connection closed in the middle of the response body")
+            body += part
+        return body[:length], keep_alive
+
+    def _keyed(self, path, player=True):
+        """path with the sticky routing keys in the query string
+
+        The load balancer's tcp mode only peeks at the request line, so POST
+        bodies alone would leave /join and /answer unkeyed.
+        """
+        params = f"room={quote(self.room)}"
+        if player:
+            params = f"player_id={quote(self.player_username)}&{params}"
+        return f"{path}{'&' if '?' in path else '?'}{params}"
+
+    def _build_request(self, method, path, data=None):
+        body = json.dumps(data) if data is not None else ""
+        headers = f"{method} {path} HTTP/1.1\r\nHost: {self.server_host}:{self.server_port}\r\nConnection: keep-alive\r\n"
+        if data is not None or method == 'POST':
+            headers += f"Content-Type: application/json\r\nContent-Length: {len(body.encode())}\r\n"
+        return headers + "\r\n" + body
+
     def send_http_request(self, request_text, retry=True):
-        """Enhanced HTTP request with round robin failover"""
-        import socket
-        
+        """HTTP request over the persistent keep-alive connection, with round robin failover
+
+        A kept-alive connection the server closed while idle is reopened once
+        without counting as a failure, but only when replaying cannot repeat
+        the request: a GET, or a send that failed outright. A reset after a
+        POST went out may follow a handled request, so it counts as a failure.
+        A failing server is swapped for the next one in self.server_ports.
+        """
         max_retries = 2
-        for attempt in range(max_retries):
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.settimeout(5.0)
-                    s.connect((self.server_host, self.server_port))
-                    s.sendall(request_text.encode())
-                    
-                    response = b""
-                    start_time = time.time()
-                    while time.time() - start_time < 5.0:
-                        try:
-                            part = s.recv(4096)
-                            if not part:
-                                break
-                            response += part
-                            if b'\r\n\r\n' in response:
-                                break
-                        except socket.timeout:
-                            break
-                    
-                    if b'\r\n\r\n' in response:
-                        body = response.split(b'\r\n\r\n', 1)[1]
-                    else:
-                        body = response
-                    
+        failures = 0
+        idempotent = request_text.startswith('GET ')
+        with self._conn_lock:
+            while True:
+                reused = self._conn is not None
+                sent = False
+                try:
+                    if self._conn is None:
+                        self._conn = self._open_connection()
+                    self._conn.sendall(request_text.encode())
+                    sent = True
+                    body, keep_alive = self._read_response(self._conn)
+                    if not keep_alive:
+                        self.close()
                     return json.loads(body.decode())
                     
-            except (socket.error, socket.timeout, ConnectionRefusedError) as e:
-                logger.warning(f"🔄 Server {self.server_port} failed (attempt {attempt+1}): {e}")
-                
-                if retry and attempt < max_retries - 1:
-                    if self._try_next_server_round_robin():
-                        continue
-                    else:
-                        break
-                else:
-                    break
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON decode error: {e}")
-                return None
-            except Exception as e:
-                logger.error(f"Request error: {e}")
-                return None
-        
-        return None
+                except (socket.error, socket.timeout, ConnectionError) as e:
+                    self.close()
+                    if reused and isinstance(e, (ConnectionResetError, BrokenPipeError)) and (idempotent or not sent):
+                        continue  # closed by the server while idle, safe to send again on a fresh one
+                    failures += 1
+                    logger.warning(f"🔄 Server {self.server_port} failed (attempt {failures}): {e}")
+                    if not (retry and failures < max_retries and self._try_next_server_round_robin()):
+                        return None
+                except json.JSONDecodeError as e:
+                    logger.error(f"JSON decode error: {e}")
+                    return None
+                except Exception as e:
+                    self.close()
+                    logger.error(f"Request error: {e}")
+                    return None
 
     def join_game(self):
-        request = f"""POST /join HTTP/1.1\r\nHost: {self.server_host}:{self.server_port}\r\nContent-Type: application/json\r\nContent-Length: {len(json.dumps({"player_username": self.player_username}))}\r\n\r\n{json.dumps({"player_username": self.player_username})}"""
+        request = self._build_request('POST', self._keyed('/join'), {"player_username": self.player_username, "room": self.room})
         
         response = self.send_http_request(request)
         if response:
@@ -436,7 +608,7 @@ class ClientInterface:
             now - self._last_status_time < self._status_cache_timeout):
             return self._status_cache
         
-        request = f"GET /status?player_id={self.player_username} HTTP/1.1\r\nHost: {self.server_host}:{self.server_port}\r\n\r\n"
+        request = self._build_request('GET', self._keyed(f"/status?player_id={quote(self.player_username)}", player=False))
         
         status = self.send_http_request(request)
         
@@ -454,26 +626,98 @@ class ClientInterface:
         return status
 
     def get_question(self):
-        request = f"GET /question HTTP/1.1\r\nHost: {self.server_host}:{self.server_port}\r\n\r\n"
+        # No player_id: the LB micro-cache keys on the whole target and /question is the same for everyone
+        request = self._build_request('GET', self._keyed('/question', player=False))
         return self.send_http_request(request)
 
     def send_answer(self, question_id, answer):
-        data = {"player_username": self.player_username, "question_id": question_id, "answer": answer}
-        request = f"""POST /answer HTTP/1.1\r\nHost: {self.server_host}:{self.server_port}\r\nContent-Type: application/json\r\nContent-Length: {len(json.dumps(data))}\r\n\r\n{json.dumps(data)}"""
+        data = {"player_username": self.player_username, "question_id": question_id, "answer": answer, "room": self.room}
+        request = self._build_request('POST', self._keyed('/answer'), data)
         return self.send_http_request(request)
 
     def restart_game(self):
-        req = "POST /reset HTTP/1.0\r\n\r\n"
+        req = self._build_request('POST', '/reset')
         result = self.send_http_request(req)
         if result and result.get("success"):
             logger.info("🔄 Game restart requested successfully")
         else:
             logger.error("🚫 Failed to restart game")
 
+class NetworkWorker(threading.Thread):
+    """Polls the server in the background so the render loop never waits on the network
+
+    Every poll publishes a new (status, question, received_at) tuple in
+    self.latest, swapped as a whole, so screens read it without a lock.
+    Answers go out through self.answers and their results come back
+    through self.results, tagged with the question_id they answer; the
+    question is only fetched when its number changes.
+    """
+
+    def __init__(self, client, poll_interval=0.1, lost_after=5.0):
+        super().__init__(daemon=True)
+        self.client = client
+        self.poll_interval = poll_interval
+        self.lost_after = lost_after
+        self.latest = (None, None, time.time())
+        self.answers = queue.Queue()
+        self.results = queue.Queue()
+        self.running = True
+
+    @property
+    def lost(self):
+        """No successful poll for lost_after seconds"""
+        return time.time() - self.latest[2] > self.lost_after
+
+    def wait_first_status(self, timeout=5.0):
+        deadline = time.time() + timeout
+        while self.latest[0] is None and time.time() < deadline:
+            time.sleep(0.01)
+        return self.latest[0]
+
+    def submit_answer(self, question_id, answer):
+        self.answers.put((question_id, answer))
+
+    def poll_result(self):
+        """The next answer result, or None when nothing came back yet"""
+        try:
+            return self.results.get_nowait()
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        while self.running:
+            started = time.time()
+            try:
+                self._poll()
+            except Exception as e:
+                logger.error(f"Network worker error: {e}")
+            try:
+                question_id, answer = self.answers.get(timeout=max(0.0, self.poll_interval - (time.time() - started)))
+            except queue.Empty:
+                continue
+            result = self.client.send_answer(question_id, answer)
+            self.results.put(dict(result or {'no_response': True}, question_id=question_id))
+
+    def _poll(self):
+        status = self.client.get_game_status()
+        if not status:
+            return  # keep the last snapshot, it goes stale after lost_after
+        question = self.latest[1]
+        if status.get('status') == 'finished':
+            question = None
+        elif status.get('status') == 'playing' and (
+                not question or question.get('question_number') != status.get('current_question_number')):
+            fetched = self.client.get_question()
+            if fetched and fetched.get('question_id'):
+                question = fetched
+        self.latest = (status, question, time.time())
+
 def show_instructions_modal():
     try:
-        instr_img_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets/instructions.png'))
-        instr_img = pygame.transform.smoothscale(pygame.image.load(instr_img_path).convert_alpha(), (WIDTH, HEIGHT))
+        instr_img = assets.image('instructions.png', (WIDTH, HEIGHT))
     except pygame.error:
         # Fallback: show text popup instead
         show_popup("Instructions: Match the color name with the text color!", color=(0, 0, 200))
@@ -509,9 +753,9 @@ def show_instructions_modal():
         pygame.display.flip()
         clock.tick(60)
 
-def show_lobby_screen(client):
+def show_lobby_screen(network):
     try:
-        lobby_img = pygame.transform.smoothscale(pygame.image.load(os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets/waiting_lobby.png'))).convert_alpha(), (WIDTH, HEIGHT))
+        lobby_img = assets.image('waiting_lobby.png', (WIDTH, HEIGHT))
     except pygame.error:
         lobby_img = pygame.Surface((WIDTH, HEIGHT))
         lobby_img.fill((50, 50, 100))
@@ -523,8 +767,8 @@ def show_lobby_screen(client):
     # join_result = client.join_game()  # ❌ Remove this line
     
     while True:
-        status = client.get_game_status()
-        if not status:
+        status = network.latest[0]
+        if network.lost:
             logger.error("🚫 Lost connection!")
             show_popup("Lost connection to server!", color=(255, 0, 0))
             pygame.quit(); sys.exit()
@@ -560,14 +804,14 @@ def show_lobby_screen(client):
         pygame.display.flip()
         clock.tick(10)
 
-def show_countdown_screen(client):
+def show_countdown_screen(network):
     font_countdown = load_font('LuckiestGuy-Regular.ttf', 120)
     font_message = load_font('LuckiestGuy-Regular.ttf', 60)
     font_info = load_font('LuckiestGuy-Regular.ttf', 30)
     
     while True:
-        status = client.get_game_status()
-        if not status:
+        status = network.latest[0]
+        if network.lost:
             show_popup("Lost connection to server!", color=(255, 0, 0))
             pygame.quit(); sys.exit()
         if status.get('status') == 'countdown':
@@ -595,7 +839,7 @@ def show_countdown_screen(client):
 
 def get_synchronized_question():
     global current_question, answered, last_question_id, time_up_shown
-    new_question = client.get_question()
+    new_question = network.latest[1]
     qid = new_question.get('question_id') if new_question else None
     if qid and qid != last_question_id:
         current_question, answered, last_question_id, time_up_shown = new_question, False, qid, False
@@ -604,8 +848,7 @@ def get_synchronized_question():
 
 # Load main background
 try:
-    main_bg_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets/main.png'))
-    main_bg = pygame.transform.smoothscale(pygame.image.load(main_bg_path).convert_alpha(), (WIDTH, HEIGHT))
+    main_bg = assets.image('main.png', (WIDTH, HEIGHT))
 except pygame.error:
     main_bg = pygame.Surface((WIDTH, HEIGHT))
     for y in range(HEIGHT):
@@ -614,7 +857,7 @@ except pygame.error:
 
 def get_username_screen():
     try:
-        bg_img = pygame.transform.smoothscale(pygame.image.load(os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets/username.png'))).convert_alpha(), (WIDTH, HEIGHT))
+        bg_img = assets.image('username.png', (WIDTH, HEIGHT))
     except pygame.error:
         bg_img = pygame.Surface((WIDTH, HEIGHT))
         bg_img.fill((100, 150, 200))
@@ -703,17 +946,17 @@ def get_username_screen():
         clock.tick(30)
     return username.strip()
 
-def show_special_screen(client, status_name, image_name, message):
+def show_special_screen(network, status_name, image_name, message):
     font_message = load_font('LuckiestGuy-Regular.ttf', 60 if status_name == 'timesup' else 40)
     try:
-        img = pygame.transform.smoothscale(pygame.image.load(os.path.abspath(os.path.join(os.path.dirname(__file__), f'../assets/{image_name}.png'))).convert_alpha(), (WIDTH, HEIGHT))
+        img = assets.image(f'{image_name}.png', (WIDTH, HEIGHT))
         use_image = True
     except pygame.error:
         use_image = False
     
     while True:
-        status = client.get_game_status()
-        if not status:
+        status = network.latest[0]
+        if network.lost:
             show_popup("Lost connection to server!", color=(255, 0, 0))
             pygame.quit(); sys.exit()
         if status.get('status') == status_name:
@@ -726,7 +969,7 @@ def show_special_screen(client, status_name, image_name, message):
             else:
                 msg = font_message.render(message, True, (255, 255, 255))
                 screen.blit(msg, (WIDTH // 2 - msg.get_width() // 2, HEIGHT // 2 - 50))
-            draw_scores(status.get('scores', {}), client.player_username)
+            draw_scores(status.get('scores', {}), network.client.player_username)
         elif status.get('status') in ('playing', 'finished') or status.get('game_started'):
             break
         else:
@@ -749,6 +992,8 @@ def parse_client_arguments():
                        help='Use load balancer (default: True)')
     parser.add_argument('--direct-connection', action='store_true', 
                        help='Use direct connection instead of load balancer')
+    parser.add_argument('--room', default='default',
+                       help='Game room, sent as the sticky routing key for load_balancer.py --hash-key room (default: default)')
     return parser.parse_args()
 
 # Main execution
@@ -784,7 +1029,7 @@ if __name__ == "__main__":
         logger.info(f"👤 Player: {username}")
 
         # Create client with appropriate connection mode
-        client = ClientInterface(username, server_ports, use_load_balancer)
+        client = ClientInterface(username, server_ports, use_load_balancer, room=args.room)
             
         # Join game ONCE
         join_result = client.join_game()
@@ -793,8 +1038,13 @@ if __name__ == "__main__":
             pygame.quit()
             sys.exit()
 
-        # Wait a moment for server to update
-        time.sleep(0.5)
+        # Status and questions are polled off the render loop from here on
+        network = NetworkWorker(client)
+        network.start()
+        if not network.wait_first_status():
+            show_popup("Lost connection to server!", color=(255, 0, 0))
+            pygame.quit()
+            sys.exit()
 
         # Initialize game variables
         score, answered, current_question = 0, False, {}
@@ -803,15 +1053,15 @@ if __name__ == "__main__":
 
         # Show screens
         show_instructions_modal()
-        show_lobby_screen(client)  # This should now show correct numbers
-        show_countdown_screen(client)
+        show_lobby_screen(network)  # This should now show correct numbers
+        show_countdown_screen(network)
 
         # Main game loop
         logger.info("🎮 Starting main game...")
         
         while True:
-            status = client.get_game_status()
-            if not status:
+            status, new_question, _ = network.latest
+            if network.lost:
                 logger.error("🚫 Lost connection!")
                 show_popup("Lost connection to server!", color=(255, 0, 0))
                 break
@@ -820,6 +1070,7 @@ if __name__ == "__main__":
             
             # Handle game end
             if current_status == 'finished':
+                network.stop()
                 final_scores = status.get('final_scores', {})
                 for i, (player, player_score) in enumerate(sorted(final_scores.items(), key=lambda x: -x[1]), 1):
                     logger.info(f"🏆 {i}. {player}: {player_score} points")
@@ -829,28 +1080,27 @@ if __name__ == "__main__":
             
             # Handle special screens (blocking)
             if current_status == 'timesup':
-                show_special_screen(client, 'timesup', 'timesup', "TIME'S UP!")
+                show_special_screen(network, 'timesup', 'timesup', "TIME'S UP!")
                 answered = False
                 popup_shown = False
                 continue
 
             if current_status == 'roundcompleted_waiting':
                 if status.get('current_question_number', 0) < status.get('max_questions', 10):
-                    show_special_screen(client, 'roundcompleted_waiting', 'roundcompleted', "ROUND COMPLETED!")
+                    show_special_screen(network, 'roundcompleted_waiting', 'roundcompleted', "ROUND COMPLETED!")
                 answered = False
                 popup_shown = False
                 continue
 
             if current_status == 'roundcompleted_all':
                 if status.get('current_question_number', 0) < status.get('max_questions', 10):
-                    show_special_screen(client, 'roundcompleted_all', 'roundcompleted', "ROUND COMPLETED!")
+                    show_special_screen(network, 'roundcompleted_all', 'roundcompleted', "ROUND COMPLETED!")
                 answered = False
                 popup_shown = False
                 continue
 
             # Handle playing state
             if current_status == 'playing':
-                new_question = client.get_question()
                 qid = new_question.get('question_id') if new_question else None
                 
                 if qid and qid != last_question_id:
@@ -879,20 +1129,28 @@ if __name__ == "__main__":
                         answered = True
                         logger.info(f"👆 Answered: {chosen_name}")
                         
-                        result = client.send_answer(current_question.get('question_id'), chosen_name)
-                        
-                        if not popup_shown:
-                            popup_shown = True
-                            if result and result.get('correct'):
-                                score = result.get('new_score', score)
-                                show_popup_with_image("", "correct.png", display_time=1000)
-                            elif result:
-                                show_popup_with_image("", "wrong.png", display_time=1000)
-                            else:
-                                show_popup("No Response", color=(100, 100, 100))
-                        
+                        network.submit_answer(current_question.get('question_id'), chosen_name)
                         pygame.event.clear()
             
+            # The worker hands back answer results once the server replied
+            result = network.poll_result()
+            if result is not None and (result['question_id'] != last_question_id or not answered):
+                # Late reply for a question that was closed (time's up, round completed) or replaced
+                logger.info(f"⌛ Dropped late answer result for question {result['question_id']}")
+                result = None
+            if result is not None:
+                if result.get('correct'):
+                    # Write-behind servers only report the points, the score is applied later
+                    score = result['new_score'] if 'new_score' in result else score + result.get('points_earned', 0)
+                if not popup_shown:
+                    popup_shown = True
+                    if result.get('correct'):
+                        show_popup_with_image("", "correct.png", display_time=1000)
+                    elif result.get('no_response'):
+                        show_popup("No Response", color=(100, 100, 100))
+                    else:
+                        show_popup_with_image("", "wrong.png", display_time=1000)
+            
             pygame.display.flip()
             clock.tick(30)
 
@@ -907,4 +1165,4 @@ if __name__ == "__main__":
         traceback.print_exc()
     finally:
         pygame.quit()
-        sys.exit()
\ No newline at end of file
+        sys.exit()
\ No newline at end of file
@@ -1,39 +1,159 @@
-import redis
 import json
 import time
 import threading
 from typing import Dict, Any, Optional
+from redis_shards import create_redis_client, room_keyspace, LEGACY_KEYSPACE
+from redis_replicas import ReplicaRouter
+
+# Validates an answer, marks the player as answered, claims the first-correct
+# slot and appends the event to the answer stream in a single round trip.
+# Game state values are JSON encoded, so strings are compared in JSON form.
+# The answer log (for the results archive) is only written when ARGV[7] is '1'.
+ACCEPT_ANSWER_LUA = """
+local game_key, answered_key, stream_key, log_key = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local player_id, question_id, answer_json = ARGV[1], ARGV[2], ARGV[3]
+local now, duration, maxlen = tonumber(ARGV[4]), tonumber(ARGV[5]), tonumber(ARGV[6])
+local log_answers = ARGV[7] == '1'
+
+local state = redis.call('HMGET', game_key, 'game_started', 'game_finished', 'question_id_counter',
+    'question_start_time', 'current_correct_answer', 'first_correct_answer', 'game_start_time')
+if state[1] ~= 'true' or state[2] == 'true' then
+    return {'game_not_active'}
+end
+if tonumber(state[3]) ~= tonumber(question_id) then
+    return {'question_expired'}
+end
+if redis.call('SADD', answered_key, player_id) == 0 then
+    return {'already_answered'}
+end
+
+local started = tonumber(state[4]) or now
+local time_remaining = math.max(0, duration - (now - started))
+local correct = (answer_json == state[5]) and 1 or 0
+local first = 0
+if correct == 1 and (state[6] == false or state[6] == 'null') then
+    redis.call('HSET', game_key, 'first_correct_answer', cjson.encode(player_id))
+    first = 1
+end
+
+local entry_id = redis.call('XADD', stream_key, 'MAXLEN', '~', maxlen, '*',
+    'player_id', player_id, 'question_id', question_id, 'answer', answer_json,
+    'correct', correct, 'first', first, 'time_remaining', tostring(time_remaining),
+    'accepted_at', tostring(now), 'game_start_time', tostring(state[7]))
+if log_answers then
+    redis.call('RPUSH', log_key, cjson.encode({player_id = player_id, question_id = tonumber(question_id),
+        answer = cjson.decode(answer_json), correct = correct == 1, first_correct = first == 1,
+        time_remaining = time_remaining, answered_at = now}))
+end
+return {'accepted', tostring(correct), tostring(first), tostring(time_remaining), entry_id}
+"""
 
 class RedisGameState:
-    def __init__(self, host='127.0.0.1', port=6379, db=0, required_players=None):
-        self.redis_client = redis.Redis(host=host, port=port, db=db, decode_responses=True)
+    def __init__(self, host='127.0.0.1', port=6379, db=0, required_players=None,
+                 room='default', cluster=False, shards=None, replicas=None, max_replica_lag=0.5):
+        # Standalone, Redis Cluster, or one of several standalone shards picked by room
+        self.redis_client, self.redis_node = create_redis_client(host, port, db, room, cluster, shards)
+        self.room = room
         self.COLOR_NAMES = ["RED", "GREEN", "BLUE", "YELLOW", "PURPLE", "BLACK", "GRAY", "ORANGE", "PINK", "BROWN"]
         self.game_lock = threading.Lock()
-        
-        # Add connection pool for better performance
-        self.redis_client.connection_pool.connection_kwargs['socket_keepalive'] = True
-        self.redis_client.connection_pool.connection_kwargs['socket_keepalive_options'] = {}
+        self.monitor_enabled = True  # Paused by RedisSupervisor while serving local state
         
         # Cache frequently accessed data
         self._config_cache = {}
         self._last_cache_time = 0
         self._cache_timeout = 5  # Cache config for 5 seconds
         
-        # Redis keys
-        self.GAME_KEY = "stroopcolor:game_state"
-        self.PLAYERS_KEY = "stroopcolor:players"
-        self.SCORES_KEY = "stroopcolor:scores"
-        self.HEARTBEAT_KEY = "stroopcolor:heartbeat"
-        self.CONFIG_KEY = "stroopcolor:config"
+        # Redis keys, hash-tagged by room so they share one cluster slot
+        # (multi-key scripts and pipelines stay single-slot)
+        prefix = room_keyspace(room)
+        self.GAME_KEY = prefix + "game_state"
+        self.PLAYERS_KEY = prefix + "players"
+        self.SCORES_KEY = prefix + "scores"
+        self.HEARTBEAT_KEY = prefix + "heartbeat"
+        self.CONFIG_KEY = prefix + "config"
+        self.ANSWERED_KEY = prefix + "answered_players"
+        self.ANSWER_STREAM_KEY = prefix + "answer_stream"
+        self.ANSWER_LOG_KEY = prefix + "game_answers"
+        self.QUESTION_LOG_KEY = prefix + "game_questions"
+        self.REPLICA_PROBE_KEY = prefix + "replica_probe"
         
-        # Initialize game configuration first
-        self._init_game_config(required_players)
-        
-        # Initialize game state if not exists
-        self._init_game_state()
-        
-        # Start heartbeat monitor with longer intervals
-        threading.Thread(target=self.heartbeat_monitor, daemon=True).start()
+        self.replica_router = None
+        try:
+            # Carry over a game stored under the keys used before rooms existed
+            if room == 'default':
+                self._migrate_legacy_keys()
+            
+            # Initialize game configuration first
+            self._init_game_config(required_players)
+            
+            # Initialize game state if not exists
+            self._init_game_state()
+            
+            # Atomic answer accept for write-behind mode (see accept_answer)
+            self._accept_answer_script = self.redis_client.register_script(ACCEPT_ANSWER_LUA)
+            
+            # Pure reads may be served by replicas (standalone primary only); its probe
+            # thread only starts once the primary has answered
+            if replicas and not cluster:
+                self.replica_router = ReplicaRouter(self.redis_client, replicas, self.REPLICA_PROBE_KEY,
+                                                    db=db, max_lag=max_replica_lag)
+                print(f"📖 Read replicas: {[f'{h}:{p}' for h, p in replicas]} (max lag {max_replica_lag}s)")
+            elif replicas:
+                print("⚠️ Read replicas are ignored in Redis Cluster mode")
+            
+            # Start heartbeat monitor with longer intervals
+            threading.Thread(target=self.heartbeat_monitor, daemon=True).start()
+        except Exception:
+            # A failed (re)connect attempt must not leave threads or connections behind
+            self.cleanup()
+            raise
+
+    def _reader(self, read_only=False):
+        """Primary, or a fresh replica for read_only (display-only) reads
+
+        Game decisions (answers, advancing, countdown, joins) must see writes
+        made by every server behind the load balancer, so they always read
+        the primary; only response bodies assembled after those decisions
+        may pass read_only=True.
+        """
+        if read_only and self.replica_router:
+            return self.replica_router.read_client()
+        return self.redis_client
+
+    def _mark_write(self):
+        """Keep this server's reads on the primary right after its own writes"""
+        if self.replica_router:
+            self.replica_router.mark_write()
+
+    def ping(self):
+        return self.redis_client.ping()
+
+    def get_replica_stats(self) -> Optional[Dict[str, Any]]:
+        return self.replica_router.get_stats() if self.replica_router else None
+
+    def _migrate_legacy_keys(self):
+        """One-shot move of the pre-room stroopcolor:* keys into the default room's keyspace
+
+        Only runs while the room keyspace is still empty. DUMP/RESTORE keeps
+        the value types (and the stream's consumer group) and also works
+        across cluster slots, where RENAME would not.
+        """
+        new_keys = [self.GAME_KEY, self.PLAYERS_KEY, self.SCORES_KEY, self.HEARTBEAT_KEY, self.CONFIG_KEY,
+                    self.ANSWERED_KEY, self.ANSWER_STREAM_KEY, self.ANSWER_LOG_KEY, self.QUESTION_LOG_KEY]
+        if self.redis_client.exists(self.CONFIG_KEY) or self.redis_client.exists(self.GAME_KEY):
+            return
+        prefix = room_keyspace(self.room)
+        moved = 0
+        for new_key in new_keys:
+            old_key = LEGACY_KEYSPACE + new_key[len(prefix):]
+            data = self.redis_client.dump(old_key)
+            if data is None:
+                continue
+            self.redis_client.restore(new_key, 0, data, replace=True)
+            self.redis_client.delete(old_key)
+            moved += 1
+        if moved:
+            print(f"🚚 Migrated {moved} legacy stroopcolor:* key(s) into room '{self.room}'")
 
     def _init_game_config(self, required_players=None):
         """Initialize game configuration in Redis"""
@@ -84,6 +204,7 @@ class RedisGameState:
 
     def set_config_field(self, field: str, value: Any):
         """Set a specific field in configuration"""
+        self._mark_write()
         self.redis_client.hset(self.CONFIG_KEY, field, json.dumps(value))
 
     def get_required_players(self) -> int:
@@ -109,7 +230,8 @@ class RedisGameState:
                 'timesup_start_time': None,
                 'round_completed_state': False,
                 'round_completed_start_time': None,
-                'advancing_question': False
+                'advancing_question': False,
+                'final_scores': None
             }
             self.redis_client.hset(self.GAME_KEY, mapping={k: json.dumps(v) for k, v in initial_state.items()})
             print("🔄 Redis game state initialized")
@@ -127,11 +249,12 @@ class RedisGameState:
 
     def set_game_state_field(self, field: str, value: Any):
         """Set a specific field in game state"""
+        self._mark_write()
         self.redis_client.hset(self.GAME_KEY, field, json.dumps(value))
 
-    def get_game_state(self) -> Dict[str, Any]:
-        """Get entire game state"""
-        state = self.redis_client.hgetall(self.GAME_KEY)
+    def get_game_state(self, read_only=False) -> Dict[str, Any]:
+        """Get entire game state (read_only: may come from a replica, for display only)"""
+        state = self._reader(read_only).hgetall(self.GAME_KEY)
         return {k: json.loads(v) for k, v in state.items()}
 
     def update_game_state(self, updates: Dict[str, Any]):
@@ -139,37 +262,40 @@ class RedisGameState:
         try:
             # Convert all values to JSON strings
             json_updates = {k: json.dumps(v) for k, v in updates.items()}
+            self._mark_write()
             self.redis_client.hset(self.GAME_KEY, mapping=json_updates)
             print(f"✅ Updated game state: {list(updates.keys())}")
         except Exception as e:
             print(f"❌ Error updating game state: {e}")
             raise
 
-    def get_connected_players(self) -> set:
+    def get_connected_players(self, read_only=False) -> set:
         """Get set of connected players"""
         try:
-            return set(self.redis_client.smembers(self.PLAYERS_KEY))
+            return set(self._reader(read_only).smembers(self.PLAYERS_KEY))
         except Exception as e:
             print(f"❌ Error getting connected players: {e}")
             return set()
 
     def add_player(self, player_id: str):
         """Add player to connected players set"""
+        self._mark_write()
         self.redis_client.sadd(self.PLAYERS_KEY, player_id)
         self.redis_client.hset(self.SCORES_KEY, player_id, 0)
         self.redis_client.hset(self.HEARTBEAT_KEY, player_id, time.time())
 
     def remove_player(self, player_id: str):
         """Remove player from all sets"""
+        self._mark_write()
         self.redis_client.srem(self.PLAYERS_KEY, player_id)
         self.redis_client.hdel(self.SCORES_KEY, player_id)
         self.redis_client.hdel(self.HEARTBEAT_KEY, player_id)
-        self.redis_client.srem("stroopcolor:answered_players", player_id)
+        self.redis_client.srem(self.ANSWERED_KEY, player_id)
 
-    def get_player_scores(self) -> Dict[str, int]:
-        """Get all player scores"""
+    def get_player_scores(self, read_only=False) -> Dict[str, int]:
+        """Get all player scores (read_only: may come from a replica, for display only)"""
         try:
-            scores = self.redis_client.hgetall(self.SCORES_KEY)
+            scores = self._reader(read_only).hgetall(self.SCORES_KEY)
             return {k: int(v) for k, v in scores.items()} if scores else {}
         except Exception as e:
             print(f"❌ Error getting player scores: {e}")
@@ -177,23 +303,106 @@ class RedisGameState:
 
     def update_player_score(self, player_id: str, score: int):
         """Update player score"""
+        self._mark_write()
         self.redis_client.hset(self.SCORES_KEY, player_id, score)
 
     def get_answered_players(self) -> set:
         """Get set of players who answered current question"""
         try:
-            return set(self.redis_client.smembers("stroopcolor:answered_players"))
+            return set(self.redis_client.smembers(self.ANSWERED_KEY))
         except Exception as e:
             print(f"❌ Error getting answered players: {e}")
             return set()
 
     def add_answered_player(self, player_id: str):
         """Add player to answered players set"""
-        self.redis_client.sadd("stroopcolor:answered_players", player_id)
+        self._mark_write()
+        self.redis_client.sadd(self.ANSWERED_KEY, player_id)
 
     def clear_answered_players(self):
         """Clear answered players set"""
-        self.redis_client.delete("stroopcolor:answered_players")
+        self._mark_write()
+        self.redis_client.delete(self.ANSWERED_KEY)
+
+    def accept_answer(self, player_id: str, question_id, answer, question_duration=10,
+                      stream_maxlen=100000, log=False) -> Dict[str, Any]:
+        """Atomically accept an answer into the answer stream (write-behind mode)
+
+        Scores are not touched here; AnswerScorer folds the stream into
+        SCORES_KEY in batches. log=True also appends it to ANSWER_LOG_KEY
+        for the results archive. The returned dict mirrors the status values
+        of the synchronous path ('game_not_active', 'question_expired', ...).
+        """
+        now = time.time()
+        self._mark_write()
+        result = self._accept_answer_script(
+            keys=[self.GAME_KEY, self.ANSWERED_KEY, self.ANSWER_STREAM_KEY, self.ANSWER_LOG_KEY],
+            args=[player_id, json.dumps(question_id), json.dumps(answer), now, question_duration, stream_maxlen,
+                  '1' if log else '0']
+        )
+        if result[0] != 'accepted':
+            return {'status': result[0]}
+        return {
+            'status': 'accepted',
+            'correct': result[1] == '1',
+            'first_correct': result[2] == '1',
+            'time_remaining': float(result[3]),
+            'entry_id': result[4]
+        }
+
+    def log_answer(self, answer: Dict[str, Any]):
+        """Append an answer to the current game's log (for the results archive)"""
+        self.redis_client.rpush(self.ANSWER_LOG_KEY, json.dumps(answer))
+
+    def log_question(self, question: Dict[str, Any]):
+        """Append a finished question with its timings to the current game's log"""
+        self.redis_client.rpush(self.QUESTION_LOG_KEY, json.dumps(question))
+
+    def get_game_log(self) -> Dict[str, list]:
+        """Get question and answer logs of the current game"""
+        pipe = self.redis_client.pipeline()
+        pipe.lrange(self.QUESTION_LOG_KEY, 0, -1)
+        pipe.lrange(self.ANSWER_LOG_KEY, 0, -1)
+        questions, answers = pipe.execute()
+        return {'questions': [json.loads(q) for q in questions], 'answers': [json.loads(a) for a in answers]}
+
+    def clear_game_log(self):
+        """Clear question and answer logs"""
+        self.redis_client.delete(self.QUESTION_LOG_KEY, self.ANSWER_LOG_KEY)
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """Game state, players, scores and answered set in one round trip"""
+        pipe = self.redis_client.pipeline()
+        pipe.hgetall(self.GAME_KEY)
+        pipe.smembers(self.PLAYERS_KEY)
+        pipe.hgetall(self.SCORES_KEY)
+        pipe.smembers(self.ANSWERED_KEY)
+        pipe.hgetall(self.CONFIG_KEY)
+        game, players, scores, answered, config = pipe.execute()
+        return {
+            'game': {k: json.loads(v) for k, v in game.items()},
+            'players': set(players),
+            'scores': {k: int(v) for k, v in scores.items()},
+            'answered': set(answered),
+            'config': {k: json.loads(v) for k, v in config.items()}
+        }
+
+    def load_snapshot(self, game: Dict[str, Any], players: set, scores: Dict[str, int], answered: set):
+        """Replace game state, players, scores and answered set (used to promote local state)"""
+        now = time.time()
+        self._mark_write()
+        pipe = self.redis_client.pipeline()
+        pipe.hset(self.GAME_KEY, mapping={k: json.dumps(v) for k, v in game.items()})
+        pipe.hdel(self.GAME_KEY, 'final_scores')  # replaced scores: /status reads them directly
+        pipe.delete(self.PLAYERS_KEY, self.SCORES_KEY, self.ANSWERED_KEY, self.HEARTBEAT_KEY)
+        if players:
+            pipe.sadd(self.PLAYERS_KEY, *players)
+            pipe.hset(self.HEARTBEAT_KEY, mapping={p: now for p in players})
+        if scores:
+            pipe.hset(self.SCORES_KEY, mapping=scores)
+        if answered:
+            pipe.sadd(self.ANSWERED_KEY, *answered)
+        pipe.execute()
 
     def update_heartbeat(self, player_id: str):
         """Update player heartbeat timestamp"""
@@ -203,6 +412,8 @@ class RedisGameState:
         """Monitor player heartbeats with longer intervals"""
         while True:
             time.sleep(10)  # Reduced frequency from 5 to 10 seconds
+            if not self.monitor_enabled:
+                continue
             try:
                 with self.game_lock:
                     self.check_disconnected_players()
@@ -228,12 +439,13 @@ class RedisGameState:
             
             # Batch remove disconnected players
             if disconnected:
+                self._mark_write()
                 pipe = self.redis_client.pipeline()
                 for player_id in disconnected:
                     pipe.srem(self.PLAYERS_KEY, player_id)
                     pipe.hdel(self.SCORES_KEY, player_id)
                     pipe.hdel(self.HEARTBEAT_KEY, player_id)
-                    pipe.srem("stroopcolor:answered_players", player_id)
+                    pipe.srem(self.ANSWERED_KEY, player_id)
                     print(f"Player {player_id} disconnected (timeout)")
                 pipe.execute()
             
@@ -274,7 +486,8 @@ class RedisGameState:
             'timesup_start_time': None,
             'round_completed_state': False,
             'round_completed_start_time': None,
-            'advancing_question': False
+            'advancing_question': False,
+            'final_scores': None
         }
         self.update_game_state(reset_state)
         
@@ -283,8 +496,9 @@ class RedisGameState:
             self.redis_client.hset(self.SCORES_KEY, player_id, 0)
             self.redis_client.hset(self.HEARTBEAT_KEY, player_id, now)
         
-        # Clear answered players
+        # Clear answered players and the previous game's logs
         self.clear_answered_players()
+        self.clear_game_log()
         
         print(f"🔄 Game reset - ready for {len(players)} players!")
 
@@ -325,6 +539,8 @@ class RedisGameState:
 
     def cleanup(self):
         """Clean up Redis connections"""
+        if self.replica_router:
+            self.replica_router.stop()
         try:
             self.redis_client.close()
             print("Redis connection closed")
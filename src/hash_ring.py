@@ -0,0 +1,57 @@
+import bisect
+import hashlib
+from typing import Hashable, Iterator, List, Optional
+
+
+def ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hash ring of (host, port) nodes
+
+    Every node is placed on the ring vnodes times (md5 of "host:port#i"),
+    so adding or removing one node only remaps about 1/N of the keys.
+    Used for Redis room sharding and the load balancer's consistent_hash policy.
+    """
+
+    def __init__(self, nodes=(), vnodes=160):
+        self.vnodes = vnodes
+        self.nodes: List[Hashable] = []
+        self._ring = []     # sorted (hash, node)
+        self._hashes = []
+        for node in nodes:
+            if node not in self.nodes:
+                self.nodes.append(node)
+        self._rebuild()
+
+    def _rebuild(self):
+        self._ring = sorted((ring_hash(f"{node[0]}:{node[1]}#{i}"), node)
+                            for node in self.nodes for i in range(self.vnodes))
+        self._hashes = [h for h, _ in self._ring]
+
+    def add_node(self, node):
+        if node not in self.nodes:
+            self.nodes.append(node)
+            self._rebuild()
+
+    def remove_node(self, node):
+        if node in self.nodes:
+            self.nodes.remove(node)
+            self._rebuild()
+
+    def walk(self, key: str) -> Iterator:
+        """Distinct nodes in ring order, starting at the key's home node"""
+        start = bisect.bisect(self._hashes, ring_hash(key))
+        seen = set()
+        for i in range(len(self._ring)):
+            node = self._ring[(start + i) % len(self._ring)][1]
+            if node in seen:
+                continue
+            seen.add(node)
+            yield node
+            if len(seen) == len(self.nodes):
+                return
+
+    def get_node(self, key: str) -> Optional[Hashable]:
+        return next(self.walk(key), None)
@@ -1,33 +1,95 @@
-import sys, os, threading, time, random, json
+import sys, os, threading, time, random, json, uuid
+from urllib.parse import urlsplit, parse_qs
 from glob import glob
 from datetime import datetime
 from game_state import RedisGameState
+from answer_stream import AnswerScorer
+from results_archive import ResultsArchiver
 
 class HttpServer:
-    def __init__(self, redis_host='127.0.0.1', redis_port=6379, required_players=None):
+    def __init__(self, redis_host='127.0.0.1', redis_port=6379, required_players=None,
+                 answer_stream=False, scorer_workers=1, scorer_batch=100, server_id='server1',
+                 archive_db=None, room='default', redis_cluster=False, redis_shards=None,
+                 redis_replicas=None, max_replica_lag=0.5):
         self.types = {'.pdf': 'application/pdf', '.jpg': 'image/jpeg', '.txt': 'text/plain', '.html': 'text/html'}
         self.question_lock = threading.Lock()
+        self.answer_stream = False
+        self.scorers = []
+        self.server_id = server_id
+        # Finished games are archived to local SQLite off the request path
+        self.archiver = ResultsArchiver(archive_db) if archive_db else None
+        # Kept so RedisSupervisor can (re)connect after an outage
+        self.redis_config = {
+            'host': redis_host, 'port': redis_port,
+            'required_players': required_players,  # Only for initial setup
+            'room': room, 'cluster': redis_cluster, 'shards': redis_shards,
+            'replicas': redis_replicas, 'max_replica_lag': max_replica_lag
+        }
+        self.scorer_config = {'workers': scorer_workers, 'batch_size': scorer_batch} if answer_stream else None
+        self.supervisor = None
+        # Set when the server shuts down: responses carry X-Draining so load balancers stop routing here
+        self.draining = False
         
         # Initialize Redis game state
         try:
-            self.game_state = RedisGameState(
-                host=redis_host, 
-                port=redis_port, 
-                required_players=required_players  # Only for initial setup
-            )
+            self.game_state = RedisGameState(**self.redis_config)
             # Get required players from Redis (single source of truth)
             self.REQUIRED_PLAYERS = self.game_state.get_required_players()
-            print(f"🔗 Connected to Redis at {redis_host}:{redis_port}")
+            print(f"🔗 Connected to Redis at {self.game_state.redis_node}")
             print(f"🎯 Required players (from Redis): {self.REQUIRED_PLAYERS}")
+            if self.scorer_config:
+                self._start_answer_scorers()
         except Exception as e:
             print(f"❌ Failed to connect to Redis: {e}")
             print("🔄 Falling back to in-memory state...")
             self._init_fallback_state(required_players or 2)
 
+    def _start_answer_scorers(self):
+        """Enable write-behind answers: /answer appends to a stream, scorers fold it"""
+        self.scorers = [
+            AnswerScorer(self.game_state, consumer_name=f"{self.server_id}-scorer-{i + 1}",
+                         batch_size=self.scorer_config['batch_size'])
+            for i in range(max(1, self.scorer_config['workers']))
+        ]
+        for scorer in self.scorers:
+            scorer.start()
+        self.answer_stream = True
+        print(f"🧮 Write-behind answers enabled ({len(self.scorers)} scorer worker(s))")
+
+    def stop_answer_scorers(self):
+        """Stop and join the scorer threads, before the Redis connection is closed"""
+        for scorer in self.scorers:
+            scorer.running = False
+        for scorer in self.scorers:
+            scorer.stop()
+
+    def wait_for_scorers(self, timeout=2.0):
+        """Block until the answer stream is fully folded into the scores (write-behind mode)"""
+        if not self.answer_stream or not self.scorers:
+            return True
+        deadline = time.time() + timeout
+        while True:
+            try:
+                backlog = self.scorers[0].backlog()
+            except Exception as e:
+                print(f"⚠️ Could not read answer stream backlog: {e}")
+                return False
+            if backlog == 0:
+                return True
+            if time.time() >= deadline:
+                print(f"⚠️ Scorers still {backlog} answer(s) behind after {timeout}s, final scores may miss them")
+                return False
+            time.sleep(0.01)
+
     def _init_fallback_state(self, required_players):
         """Fallback to original in-memory state if Redis fails"""
         self.REQUIRED_PLAYERS = required_players
-        self.game_state = {
+        self.game_state = self.new_fallback_state()
+        self._use_redis = False
+
+    def new_fallback_state(self):
+        """Empty in-memory game state"""
+        return {
             'question_id_counter': 0, 'current_question': None, 'current_correct_answer': None,
             'player_scores': {}, 'connected_players': set(), 'game_started': False,
             'countdown_started': False, 'countdown_start_time': None, 'countdown_duration': 3,
@@ -37,20 +99,22 @@ class HttpServer:
             'last_heartbeat': {}, 'heartbeat_timeout': 30, 'timesup_state': False,
             'timesup_start_time': None, 'timesup_duration': 3, 'round_completed_state': False,
             'round_completed_start_time': None, 'round_completed_duration': 2.0, 'advancing_question': False,
+            'question_log': [], 'answer_log': [],
         }
-        self._use_redis = False
 
     def get_question(self):
         if hasattr(self.game_state, 'get_game_state_field'):  # Redis mode
-            game_started = self.game_state.get_game_state_field('game_started')
-            current_question = self.game_state.get_game_state_field('current_question')
+            # Display only, nothing is decided here: one read, a replica may serve it
+            gs = self.game_state.get_game_state(read_only=True)
+            game_started = gs.get('game_started')
+            current_question = gs.get('current_question')
             if not game_started or not current_question:
                 return {'error': 'Game not started' if not game_started else 'No current question'}, 400
             
-            question_start_time = self.game_state.get_game_state_field('question_start_time')
-            question_duration = self.game_state.get_game_state_field('question_duration') or 10
-            current_question_number = self.game_state.get_game_state_field('current_question_number') or 0
-            max_questions = self.game_state.get_game_state_field('max_questions') or 10
+            question_start_time = gs.get('question_start_time')
+            question_duration = gs.get('question_duration') or 10
+            current_question_number = gs.get('current_question_number') or 0
+            max_questions = gs.get('max_questions') or 10
         else:  # Fallback mode
             gs = self.game_state
             if not gs['game_started'] or not gs['current_question']:
@@ -74,10 +138,41 @@ class HttpServer:
         tanggal = datetime.now().strftime('%c')
         resp = [f"HTTP/1.0 {kode} {message}\r\n", f"Date: {tanggal}\r\n", "Connection: close\r\n",
                 "Server: myserver/1.0\r\n", f"Content-Length: {len(messagebody)}\r\n"] + \
+               (["X-Draining: 1\r\n"] if self.draining else []) + \
                [f"{k}:{headers[k]}\r\n" for k in headers] + ["\r\n"]
         messagebody = messagebody.encode() if not isinstance(messagebody, bytes) else messagebody
         return ''.join(resp).encode() + messagebody
 
+    def split_request(self, buffer):
+        """Split one complete request (headers + Content-Length body) off buffer: (request or None, rest)"""
+        end = buffer.find(b"\r\n\r\n")
+        if end < 0:
+            return None, buffer
+        length = 0
+        for line in buffer[:end].split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value.strip() or 0)
+        total = end + 4 + length
+        if len(buffer) < total:
+            return None, buffer
+        return buffer[:total], buffer[total:]
+
+    def wants_keep_alive(self, request):
+        """Connections stay open only when the request asks for it (the load balancer's HTTP mode does)"""
+        for line in request.split("\r\n")[1:]:
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            if name.strip().lower() == 'connection':
+                return 'keep-alive' in value.lower()
+        return False
+
+    def keep_alive_response(self, resp):
+        """Rewrite the Connection: close header of a response built by response()"""
+        head, sep, body = resp.partition(b"\r\n\r\n")
+        return head.replace(b"Connection: close", b"Connection: keep-alive", 1) + sep + body
+
     def proses(self, data):
         try:
             lines = data.split("\r\n")
@@ -91,13 +186,13 @@ class HttpServer:
         except Exception:
             return self.response(400, 'Bad Request', '', {})
 
+    def parse_query(self, object_address):
+        """Query string of a request path as a flat dict (last value wins)"""
+        return {k: v[-1] for k, v in parse_qs(urlsplit(object_address).query).items()}
+
     def http_get(self, object_address, headers):
         if object_address.startswith('/status'):
-            player_id = 'heartbeat'
-            if '?' in object_address:
-                for param in object_address.split('?', 1)[1].split('&'):
-                    if param.startswith('player_id='):
-                        player_id = param.split('=', 1)[1]
+            player_id = self.parse_query(object_address).get('player_id', 'heartbeat')
             result = self.get_game_status(player_id)
             return self.response(200, 'OK', json.dumps(result), {'Content-type': 'application/json'})
         
@@ -106,11 +201,33 @@ class HttpServer:
             stats = self.get_server_stats()
             return self.response(200, 'OK', json.dumps(stats), {'Content-type': 'application/json'})
         
-        if object_address == '/question':
+        if object_address.startswith('/history'):
+            if not self.archiver:
+                return self.response(404, 'Not Found', json.dumps({'error': 'Results archive disabled'}), {'Content-type': 'application/json'})
+            query = self.parse_query(object_address)
+            try:
+                limit = max(1, min(int(query.get('limit', 20)), 200))
+            except ValueError:
+                limit = 20
+            history = self.archiver.get_history(limit, query.get('player_id'))
+            return self.response(200, 'OK', json.dumps({'games': history}), {'Content-type': 'application/json'})
+        
+        if object_address.startswith('/player-stats'):
+            if not self.archiver:
+                return self.response(404, 'Not Found', json.dumps({'error': 'Results archive disabled'}), {'Content-type': 'application/json'})
+            query = self.parse_query(object_address)
+            if 'player_id' not in query:
+                return self.response(400, 'Bad Request', json.dumps({'error': 'player_id is required'}), {'Content-type': 'application/json'})
+            stats = self.archiver.get_player_stats(query['player_id'])
+            return self.response(200, 'OK', json.dumps(stats), {'Content-type': 'application/json'})
+        
+        if urlsplit(object_address).path == '/question':
             result, code = self.get_question()
             return self.response(code, 'OK' if code == 200 else 'Bad Request', json.dumps(result), {'Content-type': 'application/json'})
         
-        if object_address == '/': return self.response(200, 'OK', 'Ini Adalah web Server percobaan', {})
+        if object_address == '/':
+            if self.draining: return self.response(503, 'Service Unavailable', 'draining', {})
+            return self.response(200, 'OK', 'Ini Adalah web Server percobaan', {})
         if object_address == '/video': return self.response(302, 'Found', '', {'location': 'https://youtu.be/katoxpnTf04'})
         if object_address == '/santai': return self.response(200, 'OK', 'santai saja', {})
         
@@ -124,6 +241,7 @@ class HttpServer:
         return self.response(200, 'OK', isi, {'Content-type': content_type})
 
     def http_post(self, object_address, headers, body):
+        object_address = urlsplit(object_address).path  # Query only carries load balancer routing keys
         if object_address == '/join':
             data = json.loads(body) if body else {}
             result = self.join_game(data)
@@ -153,6 +271,7 @@ class HttpServer:
     def start_game(self):
         now = time.time()
         if hasattr(self.game_state, 'update_game_state'):  # Redis mode
+            self.game_state.clear_game_log()
             new_question = self.game_state.generate_new_question()
             self.game_state.update_game_state({
                 'game_started': True,
@@ -164,6 +283,7 @@ class HttpServer:
             print("🎮 Game started! First question generated.")
         else:  # Fallback mode
             gs = self.game_state
+            gs['question_log'], gs['answer_log'] = [], []
             gs.update({
                 'game_started': True, 'countdown_started': False, 'game_start_time': now,
                 'current_question_number': 1, 'current_question': self.generate_new_question_fallback(),
@@ -240,9 +360,11 @@ class HttpServer:
         
         # Test Redis connection first
         try:
-            self.game_state.redis_client.ping()
+            self.game_state.ping()
         except Exception as e:
             print(f"❌ Redis connection failed: {e}")
+            if self.supervisor:
+                self.supervisor.report_failure()
             return {'status': 'error', 'message': f'Redis connection failed: {str(e)}'}
         
         # Batch get common fields with FIXED pipeline handling
@@ -285,7 +407,10 @@ class HttpServer:
         # Early returns for non-game states
         if game_finished:
             try:
-                final_scores = self.game_state.get_player_scores()
+                # Stored once by the server that finished the game, after its scorers caught up
+                final_scores = self.game_state.get_game_state_field('final_scores')
+                if final_scores is None:
+                    final_scores = self.game_state.get_player_scores()
                 return {'status': 'finished', 'game_started': True, 'final_scores': final_scores}
             except Exception as e:
                 print(f"❌ Error getting final scores: {e}")
@@ -337,7 +462,8 @@ class HttpServer:
             timesup_state = self.game_state.get_game_state_field('timesup_state') or False
             round_completed_state = self.game_state.get_game_state_field('round_completed_state') or False
             answered_players = self.game_state.get_answered_players()
-            player_scores = self.game_state.get_player_scores()
+            # Only echoed in the response bodies below
+            player_scores = self.game_state.get_player_scores(read_only=True)
             
         except Exception as e:
             print(f"❌ Redis game state error: {e}")
@@ -432,10 +558,22 @@ class HttpServer:
             
             print(f"🔄 Advancing question from {current_question_number} (reason: {reason})")
             
+            if self.archiver:
+                self.game_state.log_question(self._question_log_entry(
+                    self.game_state.get_game_state_field('current_question'), current_question_number,
+                    self.game_state.get_game_state_field('question_start_time'), now, reason))
+            
             if current_question_number >= max_questions:
                 print(f"🏁 Game finished after {max_questions} questions!")
-                player_scores = self.game_state.get_player_scores()
+                # Finishing closes the answer stream; write-behind scores are final once the scorers caught up
                 self.game_state.set_game_state_field('game_finished', True)
+                self.wait_for_scorers()
+                player_scores = self.game_state.get_player_scores()
+                self.game_state.set_game_state_field('final_scores', player_scores)
+                if self.archiver:
+                    game_log = self.game_state.get_game_log()
+                    self._archive_finished_game(player_scores, self.game_state.get_game_state_field('game_start_time'),
+                                                now, game_log['questions'], game_log['answers'])
                 return {'status': 'finished', 'game_started': True, 'final_scores': player_scores}
             
             # Generate new question and update state
@@ -464,6 +602,8 @@ class HttpServer:
             self.game_state.set_game_state_field('advancing_question', False)
 
     def post_answer(self, data):
+        if self.answer_stream:  # Write-behind mode, atomic in Redis
+            return self._post_answer_stream(data)
         with self.question_lock:
             if hasattr(self.game_state, 'get_game_state_field'):  # Redis mode
                 return self._post_answer_redis(data)
@@ -504,12 +644,22 @@ class HttpServer:
         
         current_correct_answer = self.game_state.get_game_state_field('current_correct_answer')
         is_correct = user_answer == current_correct_answer
+        is_first = False
         
         if is_correct:
             first_correct_answer = self.game_state.get_game_state_field('first_correct_answer')
             is_first = first_correct_answer is None
             if is_first:
                 self.game_state.set_game_state_field('first_correct_answer', player_id)
+        
+        if self.archiver:
+            self.game_state.log_answer({
+                'player_id': player_id, 'question_id': question_id, 'answer': user_answer,
+                'correct': is_correct, 'first_correct': is_first,
+                'time_remaining': time_remaining, 'answered_at': now
+            })
+        
+        if is_correct:
             
             bonus = 50 if is_first else 0
             total = time_points + bonus
@@ -533,6 +683,38 @@ class HttpServer:
             'points_earned': 0, 'time_remaining': time_remaining
         }
 
+    def _post_answer_stream(self, data):
+        """Accept answer into the Redis answer stream; scores are applied by AnswerScorer"""
+        player_id = data.get('player_username', data.get('player_id', 'anonymous'))
+        question_id = data.get('question_id')
+        user_answer = data.get('answer')
+        
+        question_duration = self.game_state.get_config_field('question_duration') or 10
+        result = self.game_state.accept_answer(player_id, question_id, user_answer, question_duration,
+                                               log=self.archiver is not None)
+        if result['status'] != 'accepted':
+            print(f"❌ Answer from {player_id} rejected: {result['status']}")
+            return result
+        
+        time_points = int(result['time_remaining'] * 10) if result['correct'] else 0
+        bonus = 50 if result['first_correct'] else 0
+        return {
+            'status': 'correct' if result['correct'] else 'incorrect', 'correct': result['correct'],
+            'accepted': True, 'points_earned': time_points + bonus, 'time_points': time_points,
+            'bonus_points': bonus, 'first_correct': result['first_correct'],
+            'time_remaining': result['time_remaining']
+        }
+
+    def get_scorer_stats(self):
+        """Answer stream stats (write-behind mode only)"""
+        if not self.answer_stream:
+            return None
+        try:
+            stream_length = self.game_state.redis_client.xlen(self.game_state.ANSWER_STREAM_KEY)
+        except Exception:
+            stream_length = None
+        return {'stream_length': stream_length, 'workers': [s.get_stats() for s in self.scorers]}
+
     def reset_game(self):
         with self.question_lock:
             if hasattr(self.game_state, 'reset_game_internal'):  # Redis mode
@@ -693,9 +875,15 @@ class HttpServer:
         try:
             print(f"🔄 Advancing question from {gs['current_question_number']} (reason: {reason})")
             
+            gs['question_log'].append(self._question_log_entry(
+                gs['current_question'], gs['current_question_number'], gs['question_start_time'], now, reason))
+            
             if gs['current_question_number'] >= gs['max_questions']:
                 print(f"🏁 Game finished after {gs['max_questions']} questions!")
                 gs['game_finished'] = True
+                if self.archiver:
+                    self._archive_finished_game(dict(gs['player_scores']), gs['game_start_time'], now,
+                                                gs['question_log'], gs['answer_log'])
                 return {'status': 'finished', 'game_started': True, 'final_scores': gs['player_scores']}
             
             # Generate new question and update state
@@ -753,11 +941,17 @@ class HttpServer:
         gs['answered_players'].add(player_id)
         
         is_correct = user_answer == gs['current_correct_answer']
+        is_first = is_correct and gs['first_correct_answer'] is None
+        if is_first:
+            gs['first_correct_answer'] = player_id
+        
+        gs['answer_log'].append({
+            'player_id': player_id, 'question_id': question_id, 'answer': user_answer,
+            'correct': is_correct, 'first_correct': is_first,
+            'time_remaining': time_remaining, 'answered_at': now
+        })
         
         if is_correct:
-            is_first = gs['first_correct_answer'] is None
-            if is_first:
-                gs['first_correct_answer'] = player_id
             
             bonus = 50 if is_first else 0
             total = time_points + bonus
@@ -784,6 +978,22 @@ class HttpServer:
             'time_remaining': time_remaining
         }
 
+    def _question_log_entry(self, question, question_number, started_at, ended_at, reason):
+        question = question or {}
+        return {
+            'question_number': question_number, 'question_id': question.get('question_id'),
+            'text': question.get('text'), 'text_color': question.get('text_color'),
+            'started_at': started_at, 'ended_at': ended_at, 'reason': reason
+        }
+
+    def _archive_finished_game(self, final_scores, started_at, finished_at, questions, answers):
+        """Hand a finished game to the results archiver (buffered, no disk I/O here)"""
+        self.archiver.submit({
+            'game_id': uuid.uuid4().hex, 'server_id': self.server_id,
+            'started_at': started_at, 'finished_at': finished_at,
+            'final_scores': final_scores, 'questions': list(questions), 'answers': list(answers)
+        })
+
     def generate_new_question_fallback(self):
         """Generate new question for fallback mode"""
         import random
@@ -835,7 +1045,9 @@ class HttpServer:
             'timesup_start_time': None,
             'round_completed_state': False,
             'round_completed_start_time': None,
-            'advancing_question': False
+            'advancing_question': False,
+            'question_log': [],
+            'answer_log': []
         })
         
         # Reset scores and heartbeats
@@ -854,13 +1066,13 @@ class HttpServer:
             
             # Get game state info
             if hasattr(self.game_state, 'get_connected_players'):  # Redis mode
-                connected_players = self.game_state.get_connected_players()
+                connected_players = self.game_state.get_connected_players(read_only=True)
                 player_count = len(connected_players)
                 game_started = self.game_state.get_game_state_field('game_started') or False
                 required_players = self.game_state.get_required_players()
             else:  # Fallback mode
-                player_count = len(self.scores)
-                game_started = self.game_started
+                player_count = len(self.game_state['connected_players'])
+                game_started = self.game_state['game_started']
                 required_players = self.REQUIRED_PLAYERS
             
             # Calculate load score (higher = more loaded)
@@ -872,7 +1084,12 @@ class HttpServer:
                 'required_players': required_players,
                 'game_started': game_started,
                 'load_score': load_score,
-                'server_healthy': True,
+                'server_healthy': not self.draining,
+                'draining': self.draining,
+                'answer_stream': self.get_scorer_stats(),
+                'results_archive': self.archiver.get_stats() if self.archiver else None,
+                'redis_replicas': self.game_state.get_replica_stats() if hasattr(self.game_state, 'get_replica_stats') else None,
+                'redis_supervisor': self.supervisor.get_stats() if self.supervisor else None,
                 'timestamp': time.time()
             }
         except Exception as e:
@@ -893,4 +1110,4 @@ if __name__=="__main__":
     d = httpserver.proses('GET testing.txt HTTP/1.0')
     print(d)
     d = httpserver.proses('GET donalbebek.jpg HTTP/1.0')
-    print(d)
\ No newline at end of file
+    print(d)
\ No newline at end of file
@@ -0,0 +1,105 @@
+import time
+from typing import Dict, Any, Optional, Tuple
+
+MAX_CACHED_BODY = 256 * 1024
+MAX_ENTRIES = 4096
+
+
+def parse_cache_routes(text) -> Dict[str, float]:
+    """'/question=0.25,/status?player_id=heartbeat=0.1' -> {target prefix: ttl seconds}"""
+    routes = {}
+    for item in text.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        prefix, sep, ttl = item.rpartition('=')
+        if not sep or not prefix.startswith('/'):
+            raise ValueError(f"Bad micro-cache route '{item}' (expected /path=seconds)")
+        routes[prefix] = float(ttl)
+    return routes
+
+
+class MicroCache:
+    """Short-lived cache of GET responses in HTTP mode, with request coalescing
+
+    Requests whose target starts with a configured prefix are served from
+    memory for that route's TTL (tens to hundreds of ms). On a miss the
+    first request fetches from a backend and identical requests arriving
+    meanwhile wait for its response instead of each hitting a backend.
+    Only 200 responses with a Content-Length are stored. Used from the
+    event loop thread only.
+    """
+
+    def __init__(self, routes: Dict[str, float], max_entries=MAX_ENTRIES):
+        # Longest prefix wins
+        self.routes = sorted(((p.encode(), ttl) for p, ttl in routes.items()), key=lambda r: -len(r[0]))
+        self.max_entries = max_entries
+        self.entries = {}   # target -> (expires, (head prefix, body))
+        self.fetching = {}  # target -> [waiting relays]
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stored = 0
+
+    def key_for(self, method, start_line) -> Optional[bytes]:
+        """The cache key (request target) when this request is cacheable, else None"""
+        if method != b'GET':
+            return None
+        parts = start_line.split(b" ")
+        if len(parts) < 2:
+            return None
+        for prefix, _ in self.routes:
+            if parts[1].startswith(prefix):
+                return parts[1]
+        return None
+
+    def _ttl(self, key):
+        for prefix, ttl in self.routes:
+            if key.startswith(prefix):
+                return ttl
+        return 0.0
+
+    def get(self, key) -> Optional[Tuple[bytes, bytes]]:
+        cached = self.entries.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                self.hits += 1
+                return cached[1]
+            del self.entries[key]
+        return None
+
+    def begin_fetch(self, key, relay) -> bool:
+        """True when relay should fetch key itself; False when it was queued behind a fetch in flight"""
+        waiters = self.fetching.get(key)
+        if waiters is not None:
+            waiters.append(relay)
+            return False
+        self.misses += 1
+        self.fetching[key] = []
+        return True
+
+    def end_fetch(self, key, entry):
+        """Store entry (None when the fetch failed or is not cacheable) and return the waiting relays"""
+        waiters = self.fetching.pop(key, [])
+        if entry is not None:
+            if len(self.entries) >= self.max_entries:
+                now = time.monotonic()
+                for stale in [k for k, (expires, _) in self.entries.items() if expires <= now]:
+                    del self.entries[stale]
+                while len(self.entries) >= self.max_entries:
+                    del self.entries[next(iter(self.entries))]
+            self.entries[key] = (time.monotonic() + self._ttl(key), entry)
+            self.stored += 1
+            self.coalesced += len(waiters)
+        return waiters
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'stored': self.stored,
+            'entries': len(self.entries),
+            'hit_ratio': (self.hits + self.coalesced) / lookups if lookups else None
+        }
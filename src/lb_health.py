@@ -0,0 +1,253 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+from lb_policies import server_key
+from backend_registry import connect_backend, host_header
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Per-backend breaker fed by proxy errors
+
+    closed → open after failure_threshold consecutive failures; open keeps
+    the backend out of rotation for open_seconds, then half_open until the
+    next active probe decides: success closes it, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=3, open_seconds=10.0):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+
+    def record_failure(self) -> bool:
+        """Returns True when this failure opened the breaker"""
+        self.failures += 1
+        if self.state == 'closed' and self.failures >= self.failure_threshold:
+            self.state = 'open'
+            self.opened_at = time.time()
+            self.times_opened += 1
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+
+    def allows_traffic(self, now) -> bool:
+        if self.state == 'open' and now - self.opened_at >= self.open_seconds:
+            self.state = 'half_open'
+        return self.state == 'closed'
+
+    def probe_result(self, ok):
+        if self.state == 'half_open':
+            if ok:
+                self.state, self.failures = 'closed', 0
+            else:
+                self.state, self.opened_at = 'open', time.time()
+
+
+class RetryBudget:
+    """Token bucket that bounds retries to a fraction of recent traffic
+
+    Every request deposits `ratio` tokens and the bucket also refills at
+    min_per_second, so a quiet LB can still retry. A retry costs one token;
+    when an outage makes everything fail, retries stop at about
+    ratio x the request rate instead of doubling the load.
+    """
+
+    def __init__(self, ratio=0.1, min_per_second=10.0, max_tokens=100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.retries = 0
+        self.denied = 0
+
+    def deposit(self):
+        with self.lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.max_tokens, self.tokens + (now - self.updated) * self.min_per_second)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.retries += 1
+                return True
+            self.denied += 1
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'retries': self.retries, 'denied': self.denied, 'tokens': round(self.tokens, 1)}
+
+
+class HealthChecker:
+    """Active HTTP probes in parallel plus passive failure detection, off the request path
+
+    A background thread probes every backend each interval. A backend turns
+    unhealthy after `fall` failed probes and healthy again after `rise`
+    good ones; one that announces it is draining (X-Draining) leaves at
+    once. Proxy errors feed a circuit breaker per backend. The request
+    path only reads the immutable tuples lb.set_healthy() replaces as a whole.
+    """
+
+    def __init__(self, lb, interval=2.0, timeout=1.0, rise=2, fall=2, path='/',
+                 breaker_failures=3, breaker_open=10.0):
+        self.lb = lb
+        self.interval = interval
+        self.timeout = timeout
+        self.rise = rise
+        self.fall = fall
+        self.path = path
+        self.breaker_failures = breaker_failures
+        self.breaker_open = breaker_open
+        self.lock = threading.Lock()
+        self.backends = {}
+        for server in lb.backend_servers:
+            self._add_entry(server)
+        for pool in lb.pools.values():
+            for server in pool.servers:
+                self._add_entry(server)
+        self.executor = ThreadPoolExecutor(max_workers=max(8, len(self.backends)), thread_name_prefix='health')
+        self.running = False
+
+    def _add_entry(self, server):
+        self.backends[server_key(server)] = {
+            'server': server, 'healthy': False, 'streak': 0, 'last_probe_ms': None, 'draining': False,
+            'breaker': CircuitBreaker(self.breaker_failures, self.breaker_open)
+        }
+
+    def probe(self, server) -> bool:
+        """One HTTP probe: connect, GET path, expect a 2xx/3xx status line (and note X-Draining)"""
+        started = time.perf_counter()
+        draining = False
+        try:
+            with connect_backend(server, timeout=self.timeout) as s:
+                s.sendall(f"GET {self.path} HTTP/1.1\r\nHost: {host_header(server)}\r\n"
+                          f"Connection: close\r\n\r\n".encode())
+                head = s.recv(1024)
+            status_line = head.split(b"\r\n", 1)[0].split()
+            ok = len(status_line) >= 2 and status_line[1][:1] in (b'2', b'3')
+            draining = b"\r\nx-draining:" in head.lower()
+        except OSError:
+            ok = False
+        backend = self.backends.get(server_key(server))
+        if backend:
+            backend['last_probe_ms'] = (time.perf_counter() - started) * 1000
+            backend['draining'] = draining
+        return ok and not draining
+
+    def check_all(self, initial=False):
+        """Probe every backend in parallel and publish a new snapshot"""
+        backends = list(self.backends.values())
+        results = list(self.executor.map(self.probe, [b['server'] for b in backends]))
+        with self.lock:
+            for backend, ok in zip(backends, results):
+                if self.backends.get(server_key(backend['server'])) is not backend:
+                    continue  # removed while probing
+                backend['breaker'].probe_result(ok)
+                if initial:
+                    backend['healthy'], backend['streak'] = ok, 0
+                elif ok != backend['healthy']:
+                    backend['streak'] += 1
+                    if backend['streak'] >= (self.rise if ok else self.fall) or backend['draining']:
+                        backend['healthy'], backend['streak'] = ok, 0
+                        name = f"{backend['server']['host']}:{backend['server']['port']}"
+                        if ok:
+                            logger.info(f"✅ Server {name} healthy again")
+                        elif backend['draining']:
+                            logger.info(f"🚰 Server {name} draining, out of rotation")
+                        else:
+                            logger.warning(f"❌ Server {name} unhealthy")
+                else:
+                    backend['streak'] = 0
+            self._publish()
+
+    def _publish(self):
+        now = time.time()
+        healthy = tuple(b['server'] for b in self.backends.values()
+                        if b['healthy'] and b['breaker'].allows_traffic(now))
+        if healthy != self.lb.healthy_backends:
+            server_list = [f"{s['host']}:{s['port']}" for s in healthy]
+            logger.info(f"🔄 Healthy servers updated: {server_list}")
+            self.lb.set_healthy(healthy)
+
+    def add_backend(self, server):
+        """Start watching a new backend; it takes traffic as soon as its first probe passes"""
+        with self.lock:
+            self._add_entry(server)
+        self.executor.submit(self._probe_new, server)
+
+    def _probe_new(self, server):
+        ok = self.probe(server)
+        with self.lock:
+            backend = self.backends.get(server_key(server))
+            if backend and backend['server'] is server:
+                backend['healthy'], backend['streak'] = ok, 0
+                self._publish()
+
+    def remove_backend(self, server):
+        """Stop probing a backend and take it out of rotation"""
+        with self.lock:
+            self.backends.pop(server_key(server), None)
+            self._publish()
+
+    def mark_draining(self, server):
+        """The backend announced a shutdown (X-Draining response, /server-stats): stop routing there now"""
+        backend = self.backends.get(server_key(server))
+        if not backend or not backend['healthy']:
+            return
+        with self.lock:
+            backend['healthy'], backend['streak'], backend['draining'] = False, 0, True
+            logger.info(f"🚰 Server {server['host']}:{server['port']} draining, out of rotation")
+            self._publish()
+
+    def record_failure(self, server):
+        backend = self.backends.get(server_key(server))
+        if not backend:
+            return
+        with self.lock:
+            if backend['breaker'].record_failure():
+                logger.warning(f"⚡ Circuit open for {server['host']}:{server['port']} "
+                               f"after {backend['breaker'].failures} proxy errors")
+                self._publish()
+
+    def record_success(self, server):
+        backend = self.backends.get(server_key(server))
+        if backend and backend['breaker'].failures:
+            with self.lock:
+                backend['breaker'].record_success()
+
+    def _run(self):
+        while self.running:
+            time.sleep(self.interval)
+            try:
+                self.check_all()
+            except Exception as e:
+                logger.error(f"❌ Health check error: {e}")
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self.executor.shutdown(wait=False)
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        return [
+            {'server': f"{b['server']['host']}:{b['server']['port']}", 'healthy': b['healthy'], 'draining': b['draining'],
+             'circuit': b['breaker'].state, 'circuit_opened': b['breaker'].times_opened,
+             'last_probe_ms': b['last_probe_ms']}
+            for b in list(self.backends.values())
+        ]
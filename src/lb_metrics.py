@@ -0,0 +1,308 @@
+import json
+import time
+import errno
+import socket
+import logging
+import threading
+from typing import Dict, Any
+
+from lb_policies import server_key
+from backend_registry import parse_backend
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+ERROR_KINDS = {errno.ECONNREFUSED: 'refused', errno.ECONNRESET: 'reset', errno.ETIMEDOUT: 'timeout',
+               errno.EPIPE: 'reset', errno.EHOSTUNREACH: 'unreachable'}
+
+
+class Histogram:
+    """Per-bucket counts (the last bucket is +Inf) plus sum and count"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [str(b) for b in self.buckets] + ['+Inf']
+        return {'buckets': dict(zip(labels, self.counts)), 'count': self.count, 'sum': self.total,
+                'avg': self.total / self.count if self.count else None}
+
+
+def error_kind(error) -> str:
+    if isinstance(error, socket.timeout):
+        return 'timeout'
+    return ERROR_KINDS.get(getattr(error, 'errno', None), 'other')
+
+
+class LBMetrics:
+    """Counters and histograms of the load balancer, read by the admin endpoint
+
+    Updated from the proxy engine (or the threaded handlers) under one lock;
+    the hot path only does integer increments and a bucket lookup.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.connections_total = 0
+        self.active_connections = 0
+        self.no_backend = 0
+        self.bytes_forwarded = 0
+        self.backends = {}
+        self.queue_ms = Histogram()
+        self.queue_full = 0
+        self.queue_timeouts = 0
+
+    def _backend(self, server):
+        key = server_key(server)
+        backend = self.backends.get(key)
+        if backend is None:
+            backend = self.backends[key] = {
+                'requests': 0, 'errors': {}, 'connect_ms': Histogram(), 'response_ms': Histogram()
+            }
+        return backend
+
+    def connection_opened(self):
+        with self.lock:
+            self.connections_total += 1
+            self.active_connections += 1
+
+    def connection_closed(self):
+        with self.lock:
+            self.active_connections -= 1
+
+    def no_backend_available(self):
+        with self.lock:
+            self.no_backend += 1
+
+    def queue_time(self, ms):
+        with self.lock:
+            self.queue_ms.observe(ms)
+
+    def queue_rejected(self, reason):
+        """A request got a 503 because the backend queue was 'full' or its wait hit 'timeout'"""
+        with self.lock:
+            if reason == 'full':
+                self.queue_full += 1
+            else:
+                self.queue_timeouts += 1
+
+    def request(self, server):
+        with self.lock:
+            self._backend(server)['requests'] += 1
+
+    def connect_time(self, server, ms):
+        with self.lock:
+            self._backend(server)['connect_ms'].observe(ms)
+
+    def response_time(self, server, ms):
+        with self.lock:
+            self._backend(server)['response_ms'].observe(ms)
+
+    def error(self, server, error):
+        kind = error if isinstance(error, str) else error_kind(error)
+        with self.lock:
+            errors = self._backend(server)['errors']
+            errors[kind] = errors.get(kind, 0) + 1
+
+    def add_bytes(self, count):
+        with self.lock:
+            self.bytes_forwarded += count
+
+    def snapshot(self, lb) -> Dict[str, Any]:
+        engine = lb.engine
+        with self.lock:
+            backends = {
+                f"{host}:{port}": {
+                    'requests': b['requests'],
+                    'outstanding': lb.outstanding.get((host, port), 0),
+                    'errors': dict(b['errors']),
+                    'connect_ms': b['connect_ms'].snapshot(),
+                    'response_ms': b['response_ms'].snapshot()
+                }
+                for (host, port), b in self.backends.items()
+            }
+            stats = {
+                'uptime': time.time() - self.started,
+                'engine': lb.engine_type,
+                'mode': lb.mode,
+                'policy': lb.policy.name,
+                'connections_total': self.connections_total,
+                'active_connections': self.active_connections,
+                'no_backend': self.no_backend,
+                'bytes_forwarded': self.bytes_forwarded + (engine.bytes_forwarded if engine else 0),
+                'queue': {
+                    'max_in_flight': lb.max_in_flight,
+                    'waiting': len(engine.waiting) if engine else lb.queued,
+                    'rejected_full': self.queue_full,
+                    'rejected_timeout': self.queue_timeouts,
+                    'wait_ms': self.queue_ms.snapshot()
+                },
+                'backends': backends
+            }
+        stats['health'] = lb.health.get_stats()
+        stats['retry_budget'] = lb.retry_budget.get_stats()
+        stats['policy_stats'] = lb.policy.get_stats()
+        stats['pools'] = {name: pool.get_stats() for name, pool in lb.pools.items()}
+        stats['tls'] = lb.tls.get_stats() if lb.tls else None
+        stats['pool'] = engine.pool.get_stats() if engine and engine.pool else None
+        stats['cache'] = engine.cache.get_stats() if engine and engine.cache else None
+        return stats
+
+
+def prometheus_text(stats) -> str:
+    """The same snapshot in Prometheus text exposition format"""
+    lines = [
+        f"lb_uptime_seconds {stats['uptime']:.3f}",
+        f"lb_connections_total {stats['connections_total']}",
+        f"lb_active_connections {stats['active_connections']}",
+        f"lb_no_backend_total {stats['no_backend']}",
+        f"lb_bytes_forwarded_total {stats['bytes_forwarded']}",
+        f"lb_queue_waiting {stats['queue']['waiting']}",
+        f'lb_queue_rejected_total{{reason="full"}} {stats["queue"]["rejected_full"]}',
+        f'lb_queue_rejected_total{{reason="timeout"}} {stats["queue"]["rejected_timeout"]}',
+        f"lb_queue_wait_ms_count {stats['queue']['wait_ms']['count']}",
+        f"lb_queue_wait_ms_sum {stats['queue']['wait_ms']['sum']:.3f}",
+    ]
+    if stats['tls']:
+        tls = stats['tls']
+        lines.append(f'lb_tls_handshakes_total{{resumed="true"}} {tls["resumed"]}')
+        lines.append(f'lb_tls_handshakes_total{{resumed="false"}} {tls["handshakes"] - tls["resumed"]}')
+        lines.append(f"lb_tls_handshake_failures_total {tls['failed']}")
+        lines.append(f"lb_tls_handshake_ms_sum {tls['handshake_ms']['sum']:.3f}")
+        lines.append(f"lb_tls_handshake_ms_count {tls['handshake_ms']['count']}")
+    for name, pool in stats['pools'].items():
+        lines.append(f'lb_pool_healthy_backends{{pool="{name}"}} {pool["healthy"]}')
+        lines.append(f'lb_pool_waiting{{pool="{name}"}} {pool["waiting"]}')
+    health = {h['server']: h for h in stats['health']}
+    for name, h in health.items():
+        lines.append(f'lb_backend_healthy{{backend="{name}"}} {int(h["healthy"])}')
+        lines.append(f'lb_backend_circuit_open{{backend="{name}"}} {int(h["circuit"] != "closed")}')
+    for name, b in stats['backends'].items():
+        lines.append(f'lb_backend_requests_total{{backend="{name}"}} {b["requests"]}')
+        lines.append(f'lb_backend_outstanding{{backend="{name}"}} {b["outstanding"]}')
+        for kind, count in b['errors'].items():
+            lines.append(f'lb_backend_errors_total{{backend="{name}",kind="{kind}"}} {count}')
+        for metric in ('connect_ms', 'response_ms'):
+            cumulative = 0
+            for bound, count in b[metric]['buckets'].items():
+                cumulative += count
+                lines.append(f'lb_backend_{metric}_bucket{{backend="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'lb_backend_{metric}_sum{{backend="{name}"}} {b[metric]["sum"]:.3f}')
+            lines.append(f'lb_backend_{metric}_count{{backend="{name}"}} {b[metric]["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+class AdminServer:
+    """Tiny HTTP endpoint on its own port
+
+    GET /stats (JSON), /metrics (Prometheus), /health, /backends;
+    POST /backends {"host", "port"} or {"address": "unix:/path"} adds a
+    backend, DELETE /backends/host:port
+    drains and removes one, POST /reload re-reads --backends-file.
+    """
+
+    def __init__(self, lb, port, host='127.0.0.1'):
+        self.lb = lb
+        self.port = port
+        self.host = host
+        self.sock = None
+
+    def start(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(16)
+        threading.Thread(target=self._serve, daemon=True).start()
+        logger.info(f"📊 Admin endpoint on http://{self.host}:{self.port}/stats")
+
+    def stop(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+
+    def _serve(self):
+        while self.lb.running:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            try:
+                conn.settimeout(2.0)
+                self._handle(conn)
+            except Exception as e:
+                logger.debug(f"📊 Admin request error: {e}")
+            finally:
+                conn.close()
+
+    def _handle(self, conn):
+        data = b""
+        while b"\r\n\r\n" not in data:
+            part = conn.recv(4096)
+            if not part:
+                return
+            data += part
+        head, _, body = data.partition(b"\r\n\r\n")
+        length = 0
+        for line in head.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value)
+        while len(body) < length:
+            part = conn.recv(4096)
+            if not part:
+                break
+            body += part
+        parts = head.split(b"\r\n", 1)[0].split()
+        method = parts[0].decode(errors='replace') if parts else 'GET'
+        path = parts[1].decode(errors='replace').split('?', 1)[0] if len(parts) > 1 else '/'
+        code, body, content_type = self.route(path, method, body)
+        conn.sendall(f"HTTP/1.0 {code}\r\nConnection: close\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+
+    def route(self, path, method='GET', body=b""):
+        if path.startswith('/backends') or path == '/reload':
+            return self.route_config(path, method, body)
+        if path == '/stats':
+            return '200 OK', json.dumps(self.lb.metrics.snapshot(self.lb), indent=2).encode(), 'application/json'
+        if path == '/metrics':
+            return '200 OK', prometheus_text(self.lb.metrics.snapshot(self.lb)).encode(), 'text/plain; version=0.0.4'
+        if path == '/health':
+            return '200 OK', json.dumps(self.lb.health.get_stats()).encode(), 'application/json'
+        return '404 Not Found', b'{"error": "try /stats, /metrics, /health or /backends"}', 'application/json'
+
+    def route_config(self, path, method, body):
+        lb = self.lb
+        try:
+            if path == '/reload' and method == 'POST':
+                lb.reload_backends_file()
+            elif path == '/backends' and method == 'POST':
+                data = json.loads(body or b"{}")
+                if 'address' in data:
+                    lb.add_backend(parse_backend(data['address'], lb.backend_host))
+                else:
+                    lb.add_backend({'host': data.get('host', lb.backend_host), 'port': int(data['port'])})
+            elif path.startswith('/backends/') and method == 'DELETE':
+                server = parse_backend(path[len('/backends/'):], lb.backend_host)
+                if not lb.remove_backend((server['host'], server['port'])):
+                    return '404 Not Found', b'{"error": "unknown backend"}', 'application/json'
+            elif method != 'GET':
+                return '405 Method Not Allowed', b'{"error": "method not allowed"}', 'application/json'
+        except (ValueError, KeyError) as e:
+            return '400 Bad Request', json.dumps({'error': str(e)}).encode(), 'application/json'
+        return '200 OK', json.dumps(lb.get_backends(), indent=2).encode(), 'application/json'
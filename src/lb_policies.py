@@ -0,0 +1,186 @@
+import json
+import math
+import random
+from typing import Dict, Any, List, Tuple, Optional
+from urllib.parse import unquote
+
+from hash_ring import HashRing
+
+
+def server_key(server) -> Tuple[str, int]:
+    return (server['host'], server['port'])
+
+
+class RoundRobinPolicy:
+    """Cycle through the healthy backends, ignoring load"""
+
+    name = 'round_robin'
+    needs_stats = False
+    needs_key = False
+
+    def __init__(self):
+        self.index = 0
+
+    def choose(self, servers: List[Dict], outstanding: Dict, key=None) -> Dict:
+        server = servers[self.index % len(servers)]
+        self.index = (self.index + 1) % len(servers)
+        return server
+
+    def update_stats(self, key, stats):
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class LeastOutstandingPolicy(RoundRobinPolicy):
+    """Backend with the fewest requests in flight through this LB (ties rotate)"""
+
+    name = 'least_outstanding'
+
+    def choose(self, servers, outstanding, key=None):
+        self.index = (self.index + 1) % len(servers)
+        rotated = servers[self.index:] + servers[:self.index]
+        return min(rotated, key=lambda s: outstanding.get(server_key(s), 0))
+
+
+class PowerOfTwoPolicy(RoundRobinPolicy):
+    """Two random backends, take the one with fewer requests in flight
+
+    Nearly as good as least-outstanding but never herds every new request
+    onto the same momentarily idle backend.
+    """
+
+    name = 'p2c'
+
+    def choose(self, servers, outstanding, key=None):
+        if len(servers) == 1:
+            return servers[0]
+        a, b = random.sample(servers, 2)
+        return a if outstanding.get(server_key(a), 0) <= outstanding.get(server_key(b), 0) else b
+
+
+class WeightedStatsPolicy(RoundRobinPolicy):
+    """Smooth weighted round robin, weights from the scraped /server-stats load_score
+
+    weight = 1 / (1 + load_score); a backend that failed its last scrape (or
+    has not been scraped yet) gets the weight of an idle one.
+    """
+
+    name = 'weighted'
+    needs_stats = True
+
+    def __init__(self):
+        super().__init__()
+        self.load_scores = {}
+        self.current = {}
+
+    def update_stats(self, key, stats):
+        if stats is None:
+            self.load_scores.pop(key, None)
+        else:
+            self.load_scores[key] = max(0.0, float(stats.get('load_score', 0)))
+
+    def choose(self, servers, outstanding, key=None):
+        total = 0.0
+        best, best_current = None, None
+        for server in servers:
+            k = server_key(server)
+            weight = 1.0 / (1.0 + self.load_scores.get(k, 0.0))
+            current = self.current.get(k, 0.0) + weight
+            self.current[k] = current
+            total += weight
+            if best is None or current > best_current:
+                best, best_current = server, current
+        self.current[server_key(best)] -= total
+        return best
+
+    def get_stats(self):
+        return {f"{host}:{port}": score for (host, port), score in list(self.load_scores.items())}
+
+
+class ConsistentHashPolicy(RoundRobinPolicy):
+    """Sticky routing: the request key (player_id or room) is hashed onto a ring of backends
+
+    Consistent hashing with bounded loads: a backend is skipped while its
+    outstanding requests reach ceil((1 + balance) * average), and the key
+    walks on to the next backend of the ring. Adding or removing a backend
+    only remaps the keys of that backend. Requests without a key fall back
+    to round robin.
+    """
+
+    name = 'consistent_hash'
+    needs_key = True
+
+    def __init__(self, balance=0.25, vnodes=160):
+        super().__init__()
+        self.balance = balance
+        self.vnodes = vnodes
+        self._members = None
+        self._ring = HashRing(vnodes=vnodes)
+        self._servers = {}
+        self.keyed = 0
+        self.unkeyed = 0
+        self.spilled = 0    # keyed requests moved off their home backend by the load bound
+
+    def _build(self, servers):
+        self._servers = {server_key(s): s for s in servers}
+        self._ring = HashRing(self._servers, self.vnodes)
+        self._members = tuple(self._servers)
+
+    def choose(self, servers, outstanding, key=None):
+        if key is None:
+            self.unkeyed += 1
+            return super().choose(servers, outstanding)
+        if tuple(server_key(s) for s in servers) != self._members:
+            self._build(servers)
+        self.keyed += 1
+
+        total = sum(outstanding.get(k, 0) for k in self._servers) + 1
+        capacity = math.ceil((1 + self.balance) * total / len(self._servers))
+        home = None
+        for candidate in self._ring.walk(key):
+            if outstanding.get(candidate, 0) < capacity:
+                if home is not None:
+                    self.spilled += 1
+                return self._servers[candidate]
+            home = home or candidate
+        return self._servers[home]
+
+    def get_stats(self):
+        return {'keyed': self.keyed, 'unkeyed': self.unkeyed, 'spilled': self.spilled}
+
+
+def extract_hash_key(request_line: bytes, field='player_id', body: bytes = None) -> Optional[str]:
+    """Routing key of a request: ?field= in the request line, else the JSON body field
+
+    Only the first line is needed for GETs; the body is consulted when it is
+    already at hand (HTTP mode). player_username counts as player_id, as in HttpServer.
+    """
+    parts = request_line.split(b" ")
+    if len(parts) >= 2 and b"?" in parts[1]:
+        for param in parts[1].split(b"?", 1)[1].split(b"&"):
+            name, _, value = param.partition(b"=")
+            if value and name.decode(errors='replace') == field:
+                return unquote(value.decode(errors='replace'))
+    if body and body[:1] == b"{":
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return None
+        for name in ((field, 'player_username') if field == 'player_id' else (field,)):
+            if isinstance(data, dict) and data.get(name):
+                return str(data[name])
+    return None
+
+
+POLICIES = {policy.name: policy for policy in (RoundRobinPolicy, LeastOutstandingPolicy, PowerOfTwoPolicy,
+                                                WeightedStatsPolicy, ConsistentHashPolicy)}
+
+
+def create_policy(name, hash_balance=0.25):
+    if name not in POLICIES:
+        raise ValueError(f"Unknown balancing policy '{name}' (choose from {', '.join(POLICIES)})")
+    if name == ConsistentHashPolicy.name:
+        return ConsistentHashPolicy(balance=hash_balance)
+    return POLICIES[name]()
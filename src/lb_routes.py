@@ -0,0 +1,87 @@
+import collections
+from typing import Dict, Any, List, Optional, Tuple
+
+from lb_policies import create_policy, server_key
+from backend_registry import parse_backend
+
+POOL_OPTIONS = {'policy': str, 'max-in-flight': int, 'queue-size': int, 'queue-timeout': float}
+
+
+class RoutePool:
+    """A named group of backends with its own balancing policy and limits (--pool)
+
+    Requests matched by a --route rule go only to these backends, so e.g.
+    POST /answer does not queue behind a flood of /status polls on the
+    default --backends. Has the same attributes get_next_server() reads
+    from the LB for the default backends: healthy_servers, policy,
+    max_in_flight, queue_size, queue_timeout, queued.
+    """
+
+    def __init__(self, name, servers, policy='round_robin', max_in_flight=0, queue_size=64, queue_timeout=0.5,
+                 hash_balance=0.25):
+        self.name = name
+        self.servers = servers
+        self.keys = {server_key(s) for s in servers}
+        self.policy = create_policy(policy, hash_balance=hash_balance)
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.healthy_servers = ()  # published by the health checker
+        self.queued = 0  # threaded engine
+        self.waiting = collections.deque()  # event engine: relays waiting for a slot in this pool
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'backends': [f"{s['host']}:{s['port']}" for s in self.servers],
+            'healthy': len(self.healthy_servers),
+            'policy': self.policy.name,
+            'max_in_flight': self.max_in_flight,
+            'waiting': len(self.waiting) or self.queued,
+            'policy_stats': self.policy.get_stats()
+        }
+
+
+def parse_pool(text, default_host='127.0.0.1', **defaults) -> RoutePool:
+    """'writes=8892,8893;policy=least_outstanding;max-in-flight=8' -> RoutePool
+
+    Options that are not given (policy, max-in-flight, queue-size,
+    queue-timeout) come from defaults, i.e. the LB-wide flags.
+    """
+    name, sep, rest = text.partition('=')
+    name = name.strip()
+    if not sep or not name:
+        raise ValueError(f"Bad pool '{text}' (expected name=backends[;option=value...])")
+    backends, *options = rest.split(';')
+    settings = dict(defaults)
+    for option in options:
+        key, sep, value = option.partition('=')
+        key = key.strip()
+        if not sep or key not in POOL_OPTIONS:
+            raise ValueError(f"Bad pool option '{option}' (choose from {', '.join(POOL_OPTIONS)})")
+        settings[key.replace('-', '_')] = POOL_OPTIONS[key](value.strip())
+    servers = [parse_backend(item, default_host) for item in backends.split(',') if item.strip()]
+    if not servers:
+        raise ValueError(f"Pool '{name}' has no backends")
+    return RoutePool(name, servers, **settings)
+
+
+def parse_route(text) -> Tuple[Optional[bytes], bytes, str]:
+    """'POST /answer=writes' or '/join=writes' -> (method or None for any, path prefix, pool name)"""
+    rule, sep, pool = text.rpartition('=')
+    parts = rule.split()
+    if not sep or not pool.strip() or len(parts) not in (1, 2) or not parts[-1].startswith('/'):
+        raise ValueError(f"Bad route '{text}' (expected [METHOD] /prefix=pool)")
+    method = parts[0].upper().encode() if len(parts) == 2 else None
+    return method, parts[-1].encode(), pool.strip()
+
+
+def match_route(rules: List[Tuple[Optional[bytes], bytes, Any]], request_line) -> Optional[Any]:
+    """Pool of the first rule matching the request line's method and target; None = default backends"""
+    parts = request_line.split(b" ", 2)
+    if len(parts) < 2:
+        return None
+    method, target = parts[0], parts[1]
+    for rule_method, prefix, pool in rules:
+        if target.startswith(prefix) and (rule_method is None or rule_method == method):
+            return pool
+    return None
@@ -0,0 +1,76 @@
+import ssl
+import time
+import threading
+from typing import Dict, Any
+
+from lb_metrics import Histogram
+
+HANDSHAKE_TIMEOUT = 10.0
+
+
+class TlsTerminator:
+    """Server-side TLS for the load balancer: one SSLContext shared by every connection
+
+    Clients that come back resume their session instead of doing a full
+    handshake: TLS 1.3 with session tickets (num_tickets per handshake),
+    TLS 1.2 with tickets or the in-memory session ID cache. Tickets are
+    encrypted with a key that lives in this process, so with --workers a
+    client only resumes on the worker that issued its ticket.
+    """
+
+    def __init__(self, certfile, keyfile, alpn=('http/1.1',), tickets=2):
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.minimum_version = ssl.TLSVersion.TLSv1_2
+        self.context.load_cert_chain(certfile, keyfile)
+        self.context.num_tickets = tickets
+        if alpn:
+            self.context.set_alpn_protocols(list(alpn))
+        self.alpn = list(alpn)
+        self.lock = threading.Lock()
+        self.handshakes = 0
+        self.resumed = 0
+        self.failed = 0
+        self.protocols = {}
+        self.handshake_ms = Histogram()
+
+    def wrap(self, sock):
+        """Non-blocking server socket whose handshake the event loop drives with do_handshake()"""
+        sock.setblocking(False)
+        return self.context.wrap_socket(sock, server_side=True, do_handshake_on_connect=False)
+
+    def accept(self, sock, timeout=HANDSHAKE_TIMEOUT):
+        """Threaded engine: blocking handshake; returns the TLS socket or raises"""
+        started = time.perf_counter()
+        sock.settimeout(timeout)
+        try:
+            tls_sock = self.context.wrap_socket(sock, server_side=True)
+        except OSError:
+            self.handshake_failed()
+            raise
+        self.handshake_done(tls_sock, (time.perf_counter() - started) * 1000)
+        return tls_sock
+
+    def handshake_done(self, tls_sock, ms):
+        protocol = tls_sock.selected_alpn_protocol() or 'none'
+        with self.lock:
+            self.handshakes += 1
+            if tls_sock.session_reused:
+                self.resumed += 1
+            self.protocols[protocol] = self.protocols.get(protocol, 0) + 1
+            self.handshake_ms.observe(ms)
+
+    def handshake_failed(self):
+        with self.lock:
+            self.failed += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'handshakes': self.handshakes,
+                'resumed': self.resumed,
+                'failed': self.failed,
+                'resumption_ratio': self.resumed / self.handshakes if self.handshakes else None,
+                'alpn': dict(self.protocols),
+                'handshake_ms': self.handshake_ms.snapshot(),
+                'session_cache': self.context.session_stats()
+            }
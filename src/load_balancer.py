@@ -3,127 +3,457 @@ import threading
 import time
 import json
 import logging
+import os
+import random
 import signal
 import sys
 from typing import List, Dict, Optional
+from proxy_engine import ProxyEngine, recv_tls
+from lb_policies import POLICIES, create_policy, server_key, extract_hash_key
+from lb_health import HealthChecker, RetryBudget
+from lb_metrics import LBMetrics, AdminServer
+from lb_cache import parse_cache_routes
+from lb_routes import parse_pool, parse_route, match_route
+from lb_tls import TlsTerminator
+from backend_registry import parse_backend, read_backends_file, registered_backends, connect_backend, host_header
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%H:%M:%S')
 logger = logging.getLogger(__name__)
 
 class LoadBalancer:
-    def __init__(self, listen_port=8888, backend_servers=None):
+    def __init__(self, listen_port=8888, backend_servers=None, engine='event', forwarding='auto', mode='tcp',
+                 policy='round_robin', stats_interval=1.0, hash_key='player_id', hash_balance=0.25,
+                 health_options=None, retry_paths=('/status', '/question'), retry_ratio=0.1, retry_min_per_second=10.0,
+                 admin_port=0, admin_host='127.0.0.1', log_sample=0.0, cache_routes=None,
+                 backends_file=None, backend_host='127.0.0.1', registry=None, registry_interval=2.0, drain_timeout=30.0,
+                 backlog=socket.SOMAXCONN, reuse_port=False, max_in_flight=0, queue_size=64, queue_timeout=0.5,
+                 pools=None, routes=None, tls=None, shutdown_timeout=30.0):
         self.listen_port = listen_port
-        self.backend_servers = backend_servers or [
+        self.engine_type = engine  # 'event' (selectors) or 'threaded' (legacy loop)
+        self.forwarding = forwarding  # event engine: 'auto', 'splice' or 'buffer'
+        self.mode = mode  # event engine: 'tcp' (byte relay) or 'http' (per-request routing)
+        self.engine = None
+        self.backend_servers = backend_servers if backend_servers is not None else [
             {'host': '127.0.0.1', 'port': 8889},
             {'host': '127.0.0.1', 'port': 8890},
             {'host': '127.0.0.1', 'port': 8891}
         ]
+
+        # Live reconfiguration: backends per source ('static' = --backends/--backends-file, 'admin', 'registry');
+        # the LB uses their union. Removed backends drain until their in-flight requests finish.
+        self.backends_file = backends_file
+        self.backend_host = backend_host
+        if backends_file:
+            self.backend_servers = read_backends_file(backends_file, backend_host)
+        self.backend_sources = {'static': {server_key(s): s for s in self.backend_servers}}
+        self.draining = {}  # (host, port) -> (server, drain started)
+        self.drain_timeout = drain_timeout
+        self.registry = registry  # Redis client holding self-registered servers, or None
+        self.registry_interval = registry_interval
+        self.config_lock = threading.Lock()
         
-        # Round robin state
-        self.current_server_index = 0
+        # Balancing policy; outstanding = requests in flight per backend (connections in tcp mode)
+        self.policy = create_policy(policy, hash_balance=hash_balance)
+        self.hash_key = hash_key  # consistent_hash: 'player_id' or 'room'
+        self.stats_interval = stats_interval
+        self.outstanding = {}
         self.server_lock = threading.Lock()
+
+        # Per-backend concurrency limit (0 = none); requests beyond it on every backend wait in a
+        # bounded queue for up to queue_timeout, and get a 503 when the queue is full
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.queued = 0  # threaded engine; the event engine keeps its own queue
+        self.slot_freed = threading.Condition()
+
+        # Path-aware routing: --route rules (method, path prefix) send requests to named RoutePools,
+        # each with its own backends, policy and limits; unmatched requests use the backends above
+        self.pools = pools or {}
+        self.route_rules = [(method, prefix, self.pools[name]) for method, prefix, name in (routes or [])]
+        self.pool_of = {key: pool for pool in self.pools.values() for key in pool.keys}
+        self.needs_key = self.policy.needs_key or any(p.policy.needs_key for p in self.pools.values())
+        self.has_limits = bool(max_in_flight or any(p.max_in_flight for p in self.pools.values()))
         
-        # Health check
-        self.healthy_servers = []
-        self.last_health_check = 0
+        # Health: immutable snapshots, replaced as a whole by the background checker
+        self.healthy_servers = ()  # default backends
+        self.healthy_backends = ()  # every backend, pools included
+        self.health = HealthChecker(self, **(health_options or {}))
+
+        # Failover retries: idempotent GETs on these paths, at most once, within the budget
+        self.retry_paths = tuple(p.encode() for p in retry_paths)
+        self.retry_budget = RetryBudget(ratio=retry_ratio, min_per_second=retry_min_per_second)
+
+        # Aggregate metrics on a separate admin port; per-connection logs are DEBUG,
+        # plus a sampled fraction (log_sample) at INFO
+        self.metrics = LBMetrics()
+        self.admin = AdminServer(self, admin_port, admin_host) if admin_port else None
+        self.log_sample = log_sample
+
+        # HTTP mode micro-cache: {target prefix: ttl seconds}, e.g. {'/question': 0.25}
+        self.cache_routes = cache_routes or {}
         
-        # Shutdown control
+        # TLS termination: a TlsTerminator when clients connect over TLS (session resumption, ALPN)
+        self.tls = tls
+        
+        # Listen socket: reuse_port lets several LB processes (--workers) share the port
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        
+        # Shutdown control; drain() (SIGTERM) stops accepting and gives open connections until drain_deadline
         self.running = True
         self.server_socket = None
+        self.shutdown_timeout = shutdown_timeout
+        self.drain_deadline = None
         
         logger.info(f"🔄 Load Balancer initialized on port {listen_port}")
         logger.info(f"📋 Backend servers: {self.backend_servers}")
 
-    def check_server_health(self, server, timeout=2):
-        """Check if backend server is healthy"""
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(timeout)
-                s.connect((server['host'], server['port']))
-                return True
-        except Exception:
-            return False
-
-    def update_healthy_servers(self):
-        """Update list of healthy servers"""
-        current_time = time.time()
-        
-        # Check health every 5 seconds
-        if current_time - self.last_health_check < 5:
-            return
-        
-        self.last_health_check = current_time
-        healthy = []
-        
-        for server in self.backend_servers:
-            if self.check_server_health(server):
-                healthy.append(server)
-                logger.debug(f"✅ Server {server['host']}:{server['port']} healthy")
+    def get_next_server(self, key=None, exclude=None, new_request=True, pool=None):
+        """Pick a healthy backend with the configured policy and count the request against it
+
+        key: sticky routing key, if any. exclude: a backend that just failed this
+        request (retries go elsewhere). pool: the RoutePool a --route rule chose,
+        None for the default backends. With max_in_flight, full backends are
+        skipped (spill-over) and None is returned when all of them are full.
+        Every server returned must be given back with request_finished().
+        """
+        group = pool or self
+        servers = group.healthy_servers
+        if exclude is not None:
+            servers = tuple(s for s in servers if s is not exclude)
+        elif new_request:
+            self.retry_budget.deposit()
+        if not servers:
+            return None
+        policy, limit = group.policy, group.max_in_flight
+        with self.server_lock:
+            if limit:
+                available = [s for s in servers if self.outstanding.get(server_key(s), 0) < limit]
+                if not available:
+                    return None
+                if policy.needs_key:
+                    # Keep the hash ring stable; leave the home backend only when it is full
+                    server = policy.choose(servers, self.outstanding, key)
+                    if self.outstanding.get(server_key(server), 0) >= limit:
+                        server = min(available, key=lambda s: self.outstanding.get(server_key(s), 0))
+                else:
+                    server = policy.choose(available, self.outstanding, key)
             else:
-                logger.warning(f"❌ Server {server['host']}:{server['port']} unhealthy")
-        
-        if healthy != self.healthy_servers:
-            server_list = [f"{s['host']}:{s['port']}" for s in healthy]
-            logger.info(f"🔄 Healthy servers updated: {server_list}")
+                server = policy.choose(servers, self.outstanding, key)
+            k = server_key(server)
+            self.outstanding[k] = self.outstanding.get(k, 0) + 1
+        self.metrics.request(server)
+        logger.debug(f"🎯 {policy.name}: Client → {server['host']}:{server['port']}")
+        return server
+
+    def wait_for_server(self, key=None, pool=None):
+        """Threaded engine: every backend is full, wait in the bounded queue for a slot
+
+        Returns the server, or None when the queue is full, the wait timed out or
+        no backend is healthy any more.
+        """
+        group = pool or self
+        with self.slot_freed:
+            if group.queued >= group.queue_size:
+                self.metrics.queue_rejected('full')
+                return None
+            group.queued += 1
+            started = time.perf_counter()
+            deadline = time.monotonic() + group.queue_timeout
+            try:
+                while self.running and group.healthy_servers:
+                    server = self.get_next_server(key, new_request=False, pool=pool)
+                    if server:
+                        self.metrics.queue_time((time.perf_counter() - started) * 1000)
+                        return server
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.slot_freed.wait(remaining)
+                self.metrics.queue_rejected('timeout')
+                return None
+            finally:
+                group.queued -= 1
+
+    def routing_key(self, first_bytes, body=None):
+        """Sticky routing key from the start of a request (only the first line is needed)"""
+        return extract_hash_key(first_bytes.split(b"\r\n", 1)[0], self.hash_key, body)
+
+    def route_for(self, first_bytes):
+        """The RoutePool a --route rule sends this request to; None for the default backends"""
+        if not self.route_rules:
+            return None
+        return match_route(self.route_rules, first_bytes.split(b"\r\n", 1)[0])
+
+    def set_healthy(self, healthy):
+        """Publish a health snapshot: pool members go to their RoutePool, the rest to the default set"""
+        if self.pools:
+            for pool in self.pools.values():
+                pool.healthy_servers = tuple(s for s in healthy if server_key(s) in pool.keys)
+            self.healthy_servers = tuple(s for s in healthy if server_key(s) not in self.pool_of)
+        else:
             self.healthy_servers = healthy
+        self.healthy_backends = healthy
+
+    def route_log_level(self):
+        """Level for logging one routing decision: INFO when sampled, DEBUG if enabled, else None"""
+        if self.log_sample and random.random() < self.log_sample:
+            return logging.INFO
+        return logging.DEBUG if logger.isEnabledFor(logging.DEBUG) else None
 
-    def get_next_server_round_robin(self):
-        """Get next server using round robin"""
+    def request_finished(self, server):
+        key = server_key(server)
         with self.server_lock:
-            if not self.healthy_servers:
-                return None
-            
-            server = self.healthy_servers[self.current_server_index % len(self.healthy_servers)]
-            self.current_server_index = (self.current_server_index + 1) % len(self.healthy_servers)
-            
-            logger.info(f"🎯 Round Robin: Client → {server['host']}:{server['port']} (index: {self.current_server_index-1})")
-            return server
+            self.outstanding[key] = self.outstanding.get(key, 1) - 1
+        if self.has_limits:
+            if self.engine:
+                self.engine.slot_freed()
+            else:
+                with self.slot_freed:
+                    # Waiters of other pools cannot use this slot, so wake them all
+                    if self.pools:
+                        self.slot_freed.notify_all()
+                    else:
+                        self.slot_freed.notify()
+
+    def is_retryable(self, request_line):
+        """GETs on retry_paths (e.g. /status, /question) are safe to send to a second backend"""
+        parts = request_line.split(b" ")
+        return len(parts) >= 2 and parts[0] == b"GET" and parts[1].startswith(self.retry_paths)
+
+    def retry_target(self, failed_server, key=None, pool=None):
+        """Another healthy backend (of the same pool) for a retry, or None when none is left or the budget is spent"""
+        if not any(s is not failed_server for s in (pool or self).healthy_servers):
+            return None
+        if not self.retry_budget.try_withdraw():
+            logger.warning("💸 Retry budget exhausted, not retrying")
+            return None
+        return self.get_next_server(key, exclude=failed_server, pool=pool)
+
+    def report_failure(self, server, error='other'):
+        """Passive health: a proxy error against server"""
+        self.metrics.error(server, error)
+        self.health.record_failure(server)
+
+    def report_success(self, server):
+        self.health.record_success(server)
+
+    def update_backends(self, source, servers):
+        """Replace the backends of one source; new ones are probed, removed ones start draining"""
+        with self.config_lock:
+            self.backend_sources[source] = {server_key(s): s for s in servers}
+            wanted = {}
+            for by_key in self.backend_sources.values():
+                wanted.update(by_key)
+            current = {server_key(s): s for s in self.backend_servers}
+            self.backend_servers = [current.get(key, server) for key, server in wanted.items()]
+            for key, server in wanted.items():
+                if key not in current:
+                    self.draining.pop(key, None)
+                    logger.info(f"➕ Backend added ({source}): {server['host']}:{server['port']}")
+                    self.health.add_backend(server)
+            for key, server in current.items():
+                if key not in wanted:
+                    logger.info(f"➖ Backend removed ({source}): {server['host']}:{server['port']}, draining")
+                    self.health.remove_backend(server)
+                    self.draining[key] = (server, time.time())
+
+    def add_backend(self, server, source='admin'):
+        self.update_backends(source, list(self.backend_sources.get(source, {}).values()) + [server])
+
+    def remove_backend(self, key):
+        """Remove (host, port) from every source (a file reload or registration may add it back)"""
+        with self.config_lock:
+            sources = [name for name, by_key in self.backend_sources.items() if key in by_key]
+        for name in sources:
+            self.update_backends(name, [s for k, s in self.backend_sources[name].items() if k != key])
+        return bool(sources)
+
+    def reload_backends_file(self):
+        """SIGHUP: re-read --backends-file"""
+        if not self.backends_file:
+            logger.warning("⚠️ Reload requested but no --backends-file was given")
+            return
+        try:
+            servers = read_backends_file(self.backends_file, self.backend_host)
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Cannot reload {self.backends_file}: {e}")
+            return
+        logger.info(f"🔁 Reloaded {self.backends_file}: {len(servers)} backends")
+        self.update_backends('static', servers)
+
+    def finish_draining(self):
+        """Drop draining backends once idle (or after drain_timeout, closing what is left)"""
+        now = time.time()
+        for key, (server, started) in list(self.draining.items()):
+            busy = self.outstanding.get(key, 0)
+            if busy and now - started < self.drain_timeout:
+                continue
+            with self.config_lock:
+                if self.draining.get(key, (None,))[0] is not server:
+                    continue
+                del self.draining[key]
+            with self.server_lock:
+                self.outstanding.pop(key, None)
+            self.policy.update_stats(key, None)
+            if self.engine:
+                self.engine.loop.call_soon_threadsafe(lambda key=key: self.engine.drop_backend(key))
+            if busy:
+                logger.warning(f"⏱️ Drain timeout for {server['host']}:{server['port']}, closing {busy} connections")
+            else:
+                logger.info(f"✅ Backend {server['host']}:{server['port']} drained")
+
+    def control_loop(self):
+        """Background reconfiguration: finish drains, poll the Redis registry"""
+        next_poll = 0.0
+        while self.running:
+            if self.registry is not None and time.time() >= next_poll:
+                next_poll = time.time() + self.registry_interval
+                try:
+                    servers = registered_backends(self.registry)
+                except Exception as e:
+                    # Keep the last known registrations while Redis is unreachable
+                    logger.warning(f"⚠️ Registry poll failed: {e}")
+                else:
+                    if {server_key(s) for s in servers} != set(self.backend_sources.get('registry', {})):
+                        self.update_backends('registry', servers)
+            self.finish_draining()
+            time.sleep(0.5)
+
+    def get_backends(self):
+        """Current backends with their sources, plus the draining ones (admin /backends)"""
+        with self.config_lock:
+            healthy = {server_key(s) for s in self.healthy_backends}
+            return {
+                'backends': [
+                    {'server': f"{s['host']}:{s['port']}", 'healthy': server_key(s) in healthy,
+                     'sources': [name for name, by_key in self.backend_sources.items() if server_key(s) in by_key]}
+                    for s in self.backend_servers
+                ],
+                'draining': [
+                    {'server': f"{s['host']}:{s['port']}", 'outstanding': self.outstanding.get(key, 0),
+                     'seconds': round(time.time() - started, 1)}
+                    for key, (s, started) in self.draining.items()
+                ]
+            }
+
+    def fetch_server_stats(self, server, timeout=1.0):
+        """GET /server-stats from a backend; None when it does not answer"""
+        try:
+            with connect_backend(server, timeout=timeout) as s:
+                s.sendall(f"GET /server-stats HTTP/1.1\r\nHost: {host_header(server)}\r\n\r\n".encode())
+                response = b""
+                while True:
+                    part = s.recv(65536)
+                    if not part:
+                        break
+                    response += part
+            return json.loads(response.split(b"\r\n\r\n", 1)[1])
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def stats_loop(self):
+        """Scrape /server-stats for policies that weigh backends by reported load"""
+        while self.running:
+            for server in list(self.healthy_backends):
+                key = server_key(server)
+                stats = self.fetch_server_stats(server)
+                if stats and stats.get('draining'):
+                    self.health.mark_draining(server)
+                (self.pool_of.get(key) or self).policy.update_stats(key, stats)
+            time.sleep(self.stats_interval)
 
     def proxy_request(self, client_socket, client_address):
-        """Proxy request to backend server"""
+        """Proxy request to backend server (legacy threaded engine; --route pools need the event engine)"""
         backend_socket = None
+        target_server = None
+        self.metrics.connection_opened()
         try:
             # Check if we should continue
             if not self.running:
                 return
                 
-            # Update server health
-            self.update_healthy_servers()
+            if self.tls:
+                client_socket = self.tls.accept(client_socket)
             
             # Get target server
-            target_server = self.get_next_server_round_robin()
+            key = None
+            initial = b""
+            if self.policy.needs_key:
+                # Peek at the first request line without consuming it (through TLS: read it, send it on later)
+                client_socket.settimeout(5)
+                if self.tls:
+                    first = initial = recv_tls(client_socket)
+                else:
+                    first = client_socket.recv(4096, socket.MSG_PEEK)
+                key = self.routing_key(first)
+            target_server = self.get_next_server(key)
+            if not target_server and self.max_in_flight and self.healthy_servers:
+                target_server = self.wait_for_server(key)
+                if not target_server:
+                    try:
+                        client_socket.send(b"HTTP/1.1 503 Service Unavailable\r\n\r\nBackends busy")
+                    except:
+                        pass
+                    return
             if not target_server:
                 logger.error("🚫 No healthy backend servers available")
+                self.metrics.no_backend_available()
                 try:
                     client_socket.send(b"HTTP/1.1 503 Service Unavailable\r\n\r\nNo servers available")
                 except:
                     pass
                 return
             
-            logger.info(f"🔄 Proxying {client_address} → {target_server['host']}:{target_server['port']}")
+            level = self.route_log_level()
+            if level:
+                logger.log(level, f"🔄 Proxying {client_address} → {target_server['host']}:{target_server['port']}")
             
-            # Connect to backend server
-            backend_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            backend_socket.settimeout(5)  # Shorter timeout
-            backend_socket.connect((target_server['host'], target_server['port']))
+            # Connect to backend server (TCP or unix:/path)
+            connect_started = time.perf_counter()
+            try:
+                backend_socket = connect_backend(target_server, timeout=5)
+            except OSError as e:
+                # Nothing reached the backend or the client yet, so one retry elsewhere is safe
+                self.report_failure(target_server, e)
+                retry_server = self.retry_target(target_server, key)
+                if not retry_server:
+                    raise
+                logger.warning(f"🔁 {target_server['host']}:{target_server['port']} failed ({e}), "
+                               f"retrying on {retry_server['host']}:{retry_server['port']}")
+                self.request_finished(target_server)
+                target_server = retry_server
+                connect_started = time.perf_counter()
+                backend_socket = connect_backend(target_server, timeout=5)
+            self.report_success(target_server)
+            self.metrics.connect_time(target_server, (time.perf_counter() - connect_started) * 1000)
+            if initial:
+                backend_socket.sendall(initial)
+                self.metrics.add_bytes(len(initial))
             
             # Set non-blocking mode for graceful shutdown
             client_socket.settimeout(1.0)
             backend_socket.settimeout(1.0)
             
             # Simple data forwarding loop instead of threads
+            # (when the first bytes were already sent, wait for the backend before reading the client again)
+            client_turn = not initial
             while self.running:
                 try:
                     # Forward client data to server
                     try:
-                        data = client_socket.recv(4096)
-                        if not data:
-                            break
-                        backend_socket.send(data)
+                        if client_turn:
+                            data = client_socket.recv(4096)
+                            if not data:
+                                break
+                            backend_socket.send(data)
+                            self.metrics.add_bytes(len(data))
                     except socket.timeout:
                         pass
                     except Exception:
                         break
+                    client_turn = True
                     
                     # Forward server data to client
                     try:
@@ -131,6 +461,7 @@ class LoadBalancer:
                         if not data:
                             break
                         client_socket.send(data)
+                        self.metrics.add_bytes(len(data))
                     except socket.timeout:
                         pass
                     except Exception:
@@ -143,6 +474,9 @@ class LoadBalancer:
         except Exception as e:
             logger.error(f"❌ Proxy error for {client_address}: {e}")
         finally:
+            if target_server:
+                self.request_finished(target_server)
+            self.metrics.connection_closed()
             # Clean up connections
             try:
                 if client_socket:
@@ -155,10 +489,33 @@ class LoadBalancer:
             except:
                 pass
 
+    def drain(self):
+        """Stop accepting and let open connections finish for up to shutdown_timeout; start() then returns"""
+        if self.drain_deadline is not None:
+            return
+        self.drain_deadline = time.monotonic() + self.shutdown_timeout
+        logger.info(f"🚰 Draining: no new connections, up to {self.shutdown_timeout}s for open ones")
+        if self.engine:
+            self.engine.loop.call_soon_threadsafe(self.engine.begin_drain)
+
+    def wait_drained(self):
+        """Threaded engine: wait for the handler threads until the drain deadline"""
+        while self.metrics.active_connections and time.monotonic() < self.drain_deadline:
+            time.sleep(0.05)
+        if self.metrics.active_connections:
+            logger.warning(f"⚠️ Shutdown timeout, closing {self.metrics.active_connections} connection(s)")
+        else:
+            logger.info("✅ Drained, no connections left")
+
     def shutdown(self):
         """Graceful shutdown"""
         logger.info("🛑 Initiating graceful shutdown...")
         self.running = False
+        self.health.stop()
+        if self.admin:
+            self.admin.stop()
+        if self.engine:
+            self.engine.stop()
         
         if self.server_socket:
             try:
@@ -172,21 +529,43 @@ class LoadBalancer:
         """Start load balancer"""
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         
         try:
             self.server_socket.bind(('0.0.0.0', self.listen_port))
-            self.server_socket.listen(10)
+            self.server_socket.listen(self.backlog)
             self.server_socket.settimeout(1.0)  # Non-blocking accept
             
             logger.info(f"🚀 Load Balancer started on 0.0.0.0:{self.listen_port}")
             server_list = [f"{s['host']}:{s['port']}" for s in self.backend_servers]
-            logger.info(f"🎯 Round Robin to: {server_list}")
-            logger.info("💡 Press Ctrl+C to stop")
+            logger.info(f"🎯 {self.policy.name} to: {server_list} (engine: {self.engine_type}, mode: {self.mode})")
+            if self.tls:
+                logger.info(f"🔒 TLS termination (ALPN: {', '.join(self.tls.alpn) or 'off'}, "
+                            f"{self.tls.context.num_tickets} session tickets per handshake)")
+            for pool in self.pools.values():
+                rules = [f"{(m or b'*').decode()} {p.decode()}" for m, p, rp in self.route_rules if rp is pool]
+                logger.info(f"🛣️ Pool {pool.name} ({pool.policy.name}): {pool.get_stats()['backends']} for {rules}")
+            logger.info("💡 Press Ctrl+C (or send SIGTERM) to drain and stop; a second one stops immediately")
             
-            # Initial health check
-            self.update_healthy_servers()
+            # Initial health check, then keep probing in the background
+            self.health.check_all(initial=True)
+            self.health.start()
+            if self.admin:
+                self.admin.start()
+            threading.Thread(target=self.control_loop, daemon=True).start()
+            if self.policy.needs_stats or any(p.policy.needs_stats for p in self.pools.values()):
+                threading.Thread(target=self.stats_loop, daemon=True).start()
             
-            while self.running:
+            if self.engine_type == 'event':
+                self.engine = ProxyEngine(self, self.server_socket, forwarding=self.forwarding, mode=self.mode,
+                                          cache_routes=self.cache_routes)
+                if self.drain_deadline is not None:  # signal arrived during startup
+                    self.engine.loop.call_soon_threadsafe(self.engine.begin_drain)
+                self.engine.run()
+                return
+            
+            while self.running and self.drain_deadline is None:
                 try:
                     client_socket, client_address = self.server_socket.accept()
                     
@@ -208,6 +587,9 @@ class LoadBalancer:
                     if self.running:  # Only log if we're still supposed to be running
                         logger.error(f"❌ Accept error: {e}")
                     break
+            if self.drain_deadline is not None:
+                self.server_socket.close()
+                self.wait_drained()
                     
         except Exception as e:
             logger.error(f"❌ Load Balancer failed to start: {e}")
@@ -215,32 +597,246 @@ class LoadBalancer:
             self.shutdown()
 
 def signal_handler(signum, frame):
-    """Handle Ctrl+C signal"""
+    """Ctrl+C / SIGTERM: drain first (see --shutdown-timeout); a second signal stops right away"""
+    if 'lb' in globals() and lb.drain_deadline is None and lb.shutdown_timeout > 0:
+        logger.info("🛑 Signal received, draining...")
+        lb.drain()
+        return
     logger.info("🛑 Signal received, shutting down...")
     if 'lb' in globals():
         lb.shutdown()
     sys.exit(0)
 
+def reload_handler(signum, frame):
+    """SIGHUP: re-read --backends-file off the signal handler"""
+    if 'lb' in globals():
+        threading.Thread(target=lb.reload_backends_file, daemon=True).start()
+
+def run_workers(count, build):
+    """Fork count LB processes sharing the listen port via SO_REUSEPORT; the kernel spreads connections
+
+    Every worker runs its own health checks (they converge independently) and its
+    own admin port (--admin-port + worker). Workers that die are restarted.
+    """
+    children = {}
+    stopping = False
+
+    def spawn(worker):
+        pid = os.fork()
+        if pid == 0:
+            global lb
+            for handler in logging.getLogger().handlers:
+                handler.setFormatter(logging.Formatter(f'%(asctime)s [%(levelname)s] [w{worker}] %(message)s',
+                                                       datefmt='%H:%M:%S'))
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, signal_handler)
+            signal.signal(signal.SIGHUP, reload_handler)
+            try:
+                lb = build(worker)
+                lb.start()
+            finally:
+                os._exit(0)
+        children[pid] = worker
+
+    def forward(signum, frame):
+        nonlocal stopping
+        if signum != signal.SIGHUP:
+            stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGHUP if signum == signal.SIGHUP else signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for worker in range(count):
+        spawn(worker)
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+        signal.signal(signum, forward)
+    logger.info(f"👷 {count} load balancer workers sharing the port (SO_REUSEPORT)")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except InterruptedError:
+            continue
+        except ChildProcessError:
+            break
+        worker = children.pop(pid, None)
+        if worker is None:
+            continue
+        if stopping:
+            logger.info(f"🔚 Worker {worker} exited")
+        else:
+            logger.warning(f"⚠️ Worker {worker} died (status {status}), restarting")
+            time.sleep(1.0)
+            spawn(worker)
+
 def main():
     import argparse
     
-    # Set up signal handler for Ctrl+C
+    # Set up signal handlers for Ctrl+C and SIGTERM (deploys)
     signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, reload_handler)
     
     parser = argparse.ArgumentParser(description='Stroop Color Game Load Balancer')
     parser.add_argument('--port', type=int, default=8888, help='Load balancer listen port (default: 8888)')
-    parser.add_argument('--backends', default='8889,8890,8891', help='Backend server ports (default: 8889,8890,8891)')
+    parser.add_argument('--backends', default='8889,8890,8891',
+                        help='Backend servers: port, host:port or unix:/path (default: 8889,8890,8891)')
     parser.add_argument('--host', default='127.0.0.1', help='Backend server host (default: 127.0.0.1)')
+    parser.add_argument('--engine', choices=['event', 'threaded'], default='event',
+                        help='Proxy engine: event (selectors, one thread) or threaded (legacy) (default: event)')
+    parser.add_argument('--forwarding', choices=['auto', 'splice', 'buffer'], default='auto',
+                        help='Event engine data path: splice (Linux zero-copy), buffer (recv_into) or auto (default: auto)')
+    parser.add_argument('--policy', choices=list(POLICIES), default='round_robin',
+                        help='Balancing policy: round_robin, least_outstanding, p2c (power of two choices) '
+                             'or weighted (by scraped /server-stats load_score) (default: round_robin)')
+    parser.add_argument('--hash-key', choices=['player_id', 'room'], default='player_id',
+                        help='Request field consistent_hash routes on (query string or JSON body; in --mode tcp only the '
+                             'query string of the first request on a connection is seen) (default: player_id)')
+    parser.add_argument('--hash-balance', type=float, default=0.25,
+                        help='consistent_hash load bound: a backend takes at most (1 + x) times the average (default: 0.25)')
+    parser.add_argument('--stats-interval', type=float, default=1.0,
+                        help='Seconds between /server-stats scrapes for --policy weighted (default: 1.0)')
+    parser.add_argument('--health-interval', type=float, default=2.0, help='Seconds between active health probes (default: 2.0)')
+    parser.add_argument('--health-timeout', type=float, default=1.0, help='Health probe timeout in seconds (default: 1.0)')
+    parser.add_argument('--health-path', default='/', help='Path probed with GET; 2xx/3xx is healthy (default: /)')
+    parser.add_argument('--health-rise', type=int, default=2, help='Good probes before a backend returns (default: 2)')
+    parser.add_argument('--health-fall', type=int, default=2, help='Failed probes before a backend is removed (default: 2)')
+    parser.add_argument('--breaker-failures', type=int, default=3,
+                        help='Consecutive proxy errors that open a backend circuit breaker (default: 3)')
+    parser.add_argument('--breaker-open', type=float, default=10.0,
+                        help='Seconds a circuit stays open before a probe may close it (default: 10)')
+    parser.add_argument('--retry-paths', default='/status,/question',
+                        help='GET paths retried once on another backend when the first one fails (default: /status,/question)')
+    parser.add_argument('--retry-budget', type=float, default=0.1,
+                        help='Retries allowed per request on average (default: 0.1 = 10%%)')
+    parser.add_argument('--retry-min-per-second', type=float, default=10.0,
+                        help='Retries always allowed per second regardless of traffic (default: 10)')
+    parser.add_argument('--admin-port', type=int, default=0,
+                        help='Serve metrics on this port: /stats (JSON), /metrics (Prometheus), /health (default: off)')
+    parser.add_argument('--admin-host', default='127.0.0.1', help='Admin endpoint bind address (default: 127.0.0.1)')
+    parser.add_argument('--log-sample', type=float, default=0.0,
+                        help='Fraction of routing decisions logged at INFO; the rest only at DEBUG (default: 0)')
+    parser.add_argument('--micro-cache', default='',
+                        help='HTTP mode: cache GET responses per target prefix for a few ms, identical misses coalesced, '
+                             'e.g. "/question=0.25,/status?player_id=heartbeat=0.1" (default: off)')
+    parser.add_argument('--backends-file',
+                        help='Read backends (host:port or port per line) from this file instead of --backends; '
+                             'SIGHUP or POST /reload re-reads it')
+    parser.add_argument('--registry-redis',
+                        help='Redis host:port where servers started with --register list themselves')
+    parser.add_argument('--registry-interval', type=float, default=2.0,
+                        help='Seconds between registry polls (default: 2.0)')
+    parser.add_argument('--drain-timeout', type=float, default=30.0,
+                        help='Seconds a removed backend may keep in-flight connections before they are closed (default: 30)')
+    parser.add_argument('--shutdown-timeout', type=float, default=30.0,
+                        help='Ctrl+C/SIGTERM: stop accepting and let open connections finish for up to this many '
+                             'seconds (default: 30, 0 = stop at once)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='LB processes sharing the port via SO_REUSEPORT; worker i serves --admin-port + i (default: 1)')
+    parser.add_argument('--backlog', type=int, default=socket.SOMAXCONN,
+                        help=f'Listen backlog of the LB socket (default: SOMAXCONN = {socket.SOMAXCONN})')
+    parser.add_argument('--max-in-flight', type=int, default=0,
+                        help='Max requests (connections in tcp mode) per backend; extra ones spill over to other '
+                             'backends, then queue (default: 0 = unlimited)')
+    parser.add_argument('--queue-size', type=int, default=64,
+                        help='Requests that may wait for a free backend slot; beyond that the LB answers 503 (default: 64)')
+    parser.add_argument('--queue-timeout', type=float, default=0.5,
+                        help='Seconds a queued request waits before a 503 (default: 0.5)')
+    parser.add_argument('--pool', action='append', default=[], metavar='NAME=BACKENDS[;OPTION=VALUE...]',
+                        help='Named backend pool for --route, e.g. "writes=8892,8893;policy=least_outstanding;'
+                             'max-in-flight=8" (options: policy, max-in-flight, queue-size, queue-timeout; '
+                             'default: the LB-wide flags); needs --mode http; repeatable')
+    parser.add_argument('--route', action='append', default=[], metavar='[METHOD] PREFIX=POOL',
+                        help='Send matching requests to a --pool, e.g. "POST /answer=writes" or "/join=writes"; '
+                             'first match wins, the rest use --backends; needs --mode http (tcp mode would pin a '
+                             'keep-alive connection to the pool of its first request); repeatable')
+    parser.add_argument('--tls-cert', help='PEM certificate (chain): clients connect to --port over TLS')
+    parser.add_argument('--tls-key', help='PEM private key for --tls-cert (default: in the --tls-cert file)')
+    parser.add_argument('--tls-alpn', default='http/1.1',
+                        help='ALPN protocols offered, in preference order; empty disables ALPN (default: http/1.1)')
+    parser.add_argument('--tls-tickets', type=int, default=2,
+                        help='TLS 1.3 session tickets sent per full handshake, 0 disables resumption by ticket (default: 2)')
+    parser.add_argument('--mode', choices=['tcp', 'http'], default='tcp',
+                        help='tcp: relay connections as-is; http: route every request over pooled keep-alive backends (default: tcp)')
     
     args = parser.parse_args()
+    if args.mode == 'http' and args.engine != 'event':
+        parser.error('--mode http needs --engine event')
+    try:
+        cache_routes = parse_cache_routes(args.micro_cache)
+    except ValueError as e:
+        parser.error(str(e))
+    if cache_routes and args.mode != 'http':
+        parser.error('--micro-cache needs --mode http')
+    if (args.route or args.pool) and args.mode != 'http':
+        parser.error('--route/--pool need --mode http')
+    if args.tls_key and not args.tls_cert:
+        parser.error('--tls-key needs --tls-cert')
+    if args.workers > 1 and not (hasattr(socket, 'SO_REUSEPORT') and hasattr(os, 'fork')):
+        parser.error('--workers needs SO_REUSEPORT and fork (Linux/BSD)')
     
     # Parse backend servers
-    backend_ports = [int(p.strip()) for p in args.backends.split(',')]
-    backend_servers = [{'host': args.host, 'port': port} for port in backend_ports]
+    backend_servers = [parse_backend(item, args.host) for item in args.backends.split(',') if item.strip()]
+    pool_defaults = {'policy': args.policy, 'max_in_flight': args.max_in_flight, 'queue_size': args.queue_size,
+                     'queue_timeout': args.queue_timeout, 'hash_balance': args.hash_balance}
+    
+    def build_pools():
+        pools = {}
+        for spec in args.pool:
+            pool = parse_pool(spec, args.host, **pool_defaults)
+            pools[pool.name] = pool
+        return pools
+    
+    try:
+        pools = build_pools()
+        routes = [parse_route(rule) for rule in args.route]
+    except ValueError as e:
+        parser.error(str(e))
+    for _, _, name in routes:
+        if name not in pools:
+            parser.error(f"--route to unknown pool '{name}'")
+    shared = {server_key(s) for s in backend_servers} & {key for pool in pools.values() for key in pool.keys}
+    if shared:
+        parser.error(f"backends in both --backends and a --pool: {sorted(f'{h}:{p}' for h, p in shared)}")
+    
+    def build(worker=0):
+        tls = None
+        if args.tls_cert:
+            tls = TlsTerminator(args.tls_cert, args.tls_key, tickets=args.tls_tickets,
+                                alpn=[p.strip() for p in args.tls_alpn.split(',') if p.strip()])
+        registry = None
+        if args.registry_redis:
+            import redis
+            registry_node = parse_backend(args.registry_redis)
+            registry = redis.Redis(host=registry_node['host'], port=registry_node['port'], decode_responses=True,
+                                   socket_timeout=1.0, socket_connect_timeout=1.0)
+        return LoadBalancer(listen_port=args.port, backend_servers=list(backend_servers), engine=args.engine,
+                            forwarding=args.forwarding, mode=args.mode, policy=args.policy,
+                            stats_interval=args.stats_interval, hash_key=args.hash_key, hash_balance=args.hash_balance,
+                            health_options={
+                                'interval': args.health_interval, 'timeout': args.health_timeout, 'path': args.health_path,
+                                'rise': args.health_rise, 'fall': args.health_fall,
+                                'breaker_failures': args.breaker_failures, 'breaker_open': args.breaker_open
+                            },
+                            retry_paths=[p.strip() for p in args.retry_paths.split(',') if p.strip()],
+                            retry_ratio=args.retry_budget, retry_min_per_second=args.retry_min_per_second,
+                            admin_port=args.admin_port + worker if args.admin_port else 0, admin_host=args.admin_host,
+                            log_sample=args.log_sample, cache_routes=cache_routes, backends_file=args.backends_file,
+                            backend_host=args.host, registry=registry, registry_interval=args.registry_interval,
+                            drain_timeout=args.drain_timeout, backlog=args.backlog, reuse_port=args.workers > 1,
+                            max_in_flight=args.max_in_flight, queue_size=args.queue_size, queue_timeout=args.queue_timeout,
+                            pools=build_pools(), routes=routes, tls=tls, shutdown_timeout=args.shutdown_timeout)
+    
+    if args.workers > 1:
+        run_workers(args.workers, build)
+        return
     
     # Create and start load balancer
     global lb
-    lb = LoadBalancer(listen_port=args.port, backend_servers=backend_servers)
+    lb = build()
     
     try:
         lb.start()
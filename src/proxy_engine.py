@@ -0,0 +1,1310 @@
+import collections
+import errno
+import heapq
+import logging
+import os
+import selectors
+import socket
+import ssl
+import sys
+import time
+
+from lb_cache import MicroCache, MAX_CACHED_BODY
+from backend_registry import start_connect
+from lb_tls import HANDSHAKE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+RECV_SIZE = 65536
+MAX_BUFFERED = 256 * 1024  # Stop reading a side while the other side has this much pending
+# A non-blocking TLS socket says "try again later" with SSLWantRead/WriteError instead of BlockingIOError
+WOULD_BLOCK = (BlockingIOError, InterruptedError, ssl.SSLWantReadError, ssl.SSLWantWriteError)
+
+# Zero-copy forwarding needs os.splice (Linux, Python 3.10+)
+SPLICE_AVAILABLE = hasattr(os, 'splice') and sys.platform.startswith('linux')
+SPLICE_FLAGS = getattr(os, 'SPLICE_F_MOVE', 0) | getattr(os, 'SPLICE_F_NONBLOCK', 0)
+PIPE_CAPACITY = 65536  # Default Linux pipe buffer
+PIPE_POOL_SIZE = 256
+
+
+class EventLoop:
+    """Minimal selectors-based event loop with timers and thread-safe callbacks"""
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.running = False
+        self._timers = []  # heap of [when, seq, callback]
+        self._seq = 0
+        self._ready = collections.deque()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, self._on_wakeup)
+
+    def register(self, sock, events, callback):
+        self.selector.register(sock, events, callback)
+
+    def modify(self, sock, events, callback):
+        self.selector.modify(sock, events, callback)
+
+    def unregister(self, sock):
+        try:
+            self.selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+
+    def set_events(self, sock, old, new, callback):
+        """Move sock from old to new interest; 0 means unregistered"""
+        if not new:
+            self.unregister(sock)
+        elif not old:
+            self.register(sock, new, callback)
+        else:
+            self.modify(sock, new, callback)
+
+    def call_later(self, delay, callback):
+        """Run callback on the loop after delay seconds; returns a handle for cancel()"""
+        self._seq += 1
+        timer = [time.monotonic() + delay, self._seq, callback]
+        heapq.heappush(self._timers, timer)
+        return timer
+
+    @staticmethod
+    def cancel(timer):
+        if timer:
+            timer[2] = None
+
+    def call_soon_threadsafe(self, callback):
+        self._ready.append(callback)
+        try:
+            self._wake_w.send(b'x')
+        except (BlockingIOError, OSError):
+            pass
+
+    def _on_wakeup(self, mask):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def stop(self):
+        self.running = False
+        self.call_soon_threadsafe(lambda: None)
+
+    def run(self):
+        self.running = True
+        while self.running:
+            timeout = 1.0
+            if self._ready:
+                timeout = 0
+            elif self._timers:
+                timeout = max(0, min(timeout, self._timers[0][0] - time.monotonic()))
+
+            for key, mask in self.selector.select(timeout):
+                try:
+                    key.data(mask)
+                except Exception as e:
+                    logger.error(f"❌ Event handler error: {e}")
+
+            while self._ready:
+                try:
+                    self._ready.popleft()()
+                except Exception as e:
+                    logger.error(f"❌ Callback error: {e}")
+
+            now = time.monotonic()
+            while self._timers and self._timers[0][0] <= now:
+                callback = heapq.heappop(self._timers)[2]
+                if callback:
+                    try:
+                        callback()
+                    except Exception as e:
+                        logger.error(f"❌ Timer callback error: {e}")
+
+    def close(self):
+        self.selector.close()
+        self._wake_r.close()
+        self._wake_w.close()
+
+
+def recv_tls(sock, size=RECV_SIZE):
+    """recv on an SSLSocket plus whatever OpenSSL has already decrypted
+
+    Bytes left inside OpenSSL never make the fd readable again, so a caller
+    that goes back to the selector after a short read would stall on them.
+    """
+    data = sock.recv(size)
+    while data and sock.pending():
+        data += sock.recv(sock.pending())
+    return data
+
+
+class BufferedForwarder:
+    """Moves bytes src → dst through one shared recv_into buffer
+
+    Nothing is allocated per read: data lands in the engine's reusable
+    buffer and is sent straight from a memoryview; only what the destination
+    could not take right away is copied into the per-direction backlog.
+    """
+
+    def __init__(self, engine, src, dst=None):
+        self.engine = engine
+        self.src = src
+        self.dst = dst
+        self.backlog = bytearray()
+        self.eof = False
+        self.shut = False
+
+    @property
+    def pending(self):
+        return len(self.backlog)
+
+    def wants_read(self):
+        return not self.eof and len(self.backlog) < MAX_BUFFERED
+
+    def read(self):
+        """Read once from src and forward what dst accepts; False on a socket error"""
+        view = self.engine.read_view
+        try:
+            n = self.src.recv_into(view)
+        except WOULD_BLOCK:
+            return True
+        except OSError:
+            return False
+        if not n:
+            self.eof = True
+            return True
+        self.engine.bytes_forwarded += n
+        if self.dst is None or self.backlog:
+            self.backlog += view[:n]
+            return self.flush()
+        try:
+            sent = self.dst.send(view[:n])
+        except WOULD_BLOCK:
+            sent = 0
+        except OSError:
+            return False
+        if sent < n:
+            self.backlog += view[sent:n]
+        return True
+
+    def flush(self):
+        if not self.backlog or self.dst is None:
+            return True
+        try:
+            sent = self.dst.send(self.backlog)
+            del self.backlog[:sent]
+        except WOULD_BLOCK:
+            pass
+        except OSError:
+            return False
+        return True
+
+    def close(self):
+        self.backlog = bytearray()
+
+
+class SpliceForwarder(BufferedForwarder):
+    """Moves bytes src → dst with os.splice through a kernel pipe (Linux only)
+
+    The payload never enters user space: splice(src → pipe) on readable,
+    splice(pipe → dst) on writable. The pipe is borrowed from the engine's
+    pool and handed back once empty.
+    """
+
+    def __init__(self, engine, src, dst=None):
+        super().__init__(engine, src, dst)
+        self.pipe_r, self.pipe_w = engine.acquire_pipe()
+        self.in_pipe = 0
+
+    @property
+    def pending(self):
+        return self.in_pipe
+
+    def wants_read(self):
+        return not self.eof and self.in_pipe < PIPE_CAPACITY
+
+    def read(self):
+        try:
+            n = os.splice(self.src.fileno(), self.pipe_w, PIPE_CAPACITY - self.in_pipe, flags=SPLICE_FLAGS)
+        except (BlockingIOError, InterruptedError):
+            return True
+        except OSError:
+            return False
+        if not n:
+            self.eof = True
+            return True
+        self.in_pipe += n
+        self.engine.bytes_forwarded += n
+        return self.flush()
+
+    def flush(self):
+        if not self.in_pipe or self.dst is None:
+            return True
+        try:
+            sent = os.splice(self.pipe_r, self.dst.fileno(), self.in_pipe, flags=SPLICE_FLAGS)
+            self.in_pipe -= sent
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            return False
+        return True
+
+    def close(self):
+        if self.pipe_r is not None:
+            self.engine.release_pipe(self.pipe_r, self.pipe_w, reusable=self.in_pipe == 0)
+            self.pipe_r = self.pipe_w = None
+
+
+class TlsHandshake:
+    """Server-side TLS handshake of one client, driven by the event loop
+
+    Once it completes the TLS socket is handed to a Relay/HttpRelay like a
+    plain accepted socket; a handshake that fails or takes longer than
+    HANDSHAKE_TIMEOUT just closes the connection.
+    """
+
+    def __init__(self, engine, sock, client_address):
+        self.engine = engine
+        self.loop = engine.loop
+        self.client_address = client_address
+        self.server = None
+        self.closed = False
+        self.started = time.perf_counter()
+        self.sock = engine.tls.wrap(sock)
+        self.events = selectors.EVENT_READ
+        self.loop.register(self.sock, self.events, self._on_event)
+        self.timer = self.loop.call_later(HANDSHAKE_TIMEOUT, self._failed)
+
+    def _on_event(self, mask):
+        if self.closed:
+            return
+        try:
+            self.sock.do_handshake()
+        except ssl.SSLWantReadError:
+            self._wait(selectors.EVENT_READ)
+            return
+        except ssl.SSLWantWriteError:
+            self._wait(selectors.EVENT_WRITE)
+            return
+        except OSError as e:
+            logger.debug(f"🔒 TLS handshake with {self.client_address} failed: {e}")
+            self._failed()
+            return
+        self.engine.tls.handshake_done(self.sock, (time.perf_counter() - self.started) * 1000)
+        self._detach()
+        self.engine._handle_client(self.sock, self.client_address)
+
+    def _wait(self, events):
+        if events != self.events:
+            self.loop.modify(self.sock, events, self._on_event)
+            self.events = events
+
+    def _detach(self):
+        self.closed = True
+        self.loop.cancel(self.timer)
+        self.loop.unregister(self.sock)
+        self.engine.connections.discard(self)
+
+    def _failed(self):
+        if not self.closed:
+            self.engine.tls.handshake_failed()
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self._detach()
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class Relay:
+    """Bidirectional byte relay between one client and one backend
+
+    Whichever side is readable is forwarded immediately; a direction is
+    half-closed (shutdown SHUT_WR) once its source hit EOF and its data
+    drained, and the relay closes when both directions are done.
+    """
+
+    def __init__(self, engine, client_sock, client_address):
+        self.engine = engine
+        self.loop = engine.loop
+        self.client = client_sock
+        self.client_address = client_address
+        self.backend = None
+        self.server = None
+        self.key = None
+        self.route_pool = None    # RoutePool chosen by a --route rule, None = default backends
+        self.failed_over = False
+        self.connected = False
+        self.connect_started = None
+        self.queued_at = None     # waiting in the engine queue for a backend slot
+        self.queue_timer = None
+        self.closed = False
+
+        forwarder = SpliceForwarder if engine.use_splice else BufferedForwarder
+        self.upstream = forwarder(engine, client_sock)     # client → backend
+        self.downstream = None                              # backend → client, once the backend socket exists
+        self._forwarder = forwarder
+
+        self.client.setblocking(False)
+        self.loop.register(self.client, selectors.EVENT_READ, self._on_client)
+        self._client_events = selectors.EVENT_READ
+        self._backend_events = 0
+
+    def route(self, server):
+        if not server:
+            if self.engine.enqueue(self):
+                return
+            if (self.route_pool or self.engine.lb).healthy_servers:
+                self.reject(b"Backends busy")
+                return
+            logger.error("🚫 No healthy backend servers available")
+            self.engine.lb.metrics.no_backend_available()
+            self.reject(b"No servers available")
+            return
+        level = self.engine.lb.route_log_level()
+        if level:
+            logger.log(level, f"🔄 Proxying {self.client_address} → {server['host']}:{server['port']}")
+        self.connect(server)
+
+    def reject(self, body):
+        try:
+            self.client.send(b"HTTP/1.1 503 Service Unavailable\r\n\r\n" + body)
+        except OSError:
+            pass
+        self.close()
+
+    def route_on_first_line(self):
+        """Wait for the client's first bytes, then route on its request line (sticky key)"""
+        self.loop.modify(self.client, selectors.EVENT_READ, self._on_first_data)
+
+    def _on_first_data(self, mask):
+        if self.closed:
+            return
+        try:
+            if self.engine.tls:
+                # No MSG_PEEK through TLS: take the bytes, the forwarder sends them once connected
+                first = recv_tls(self.client)
+                self.upstream.backlog += first
+                self.engine.bytes_forwarded += len(first)
+            else:
+                # MSG_PEEK leaves the bytes for the forwarder (splice included)
+                first = self.client.recv(4096, socket.MSG_PEEK)
+        except WOULD_BLOCK:
+            return
+        except OSError:
+            self.close()
+            return
+        if not first:
+            self.close()
+            return
+        self.loop.modify(self.client, selectors.EVENT_READ, self._on_client)
+        lb = self.engine.lb
+        self.key = lb.routing_key(first)
+        self.route(lb.get_next_server(self.key))
+
+    def connect(self, server):
+        """Start a non-blocking connect to the chosen backend"""
+        self.server = server
+        self.connect_started = time.perf_counter()
+        self.backend, error = start_connect(server)
+        self.downstream = self._forwarder(self.engine, self.backend, self.client)
+        if error:
+            self._on_connect_failed(error)
+            return
+        self.loop.register(self.backend, selectors.EVENT_WRITE, self._on_backend)
+        self._backend_events = selectors.EVENT_WRITE
+
+    def _on_connect_failed(self, error):
+        logger.error(f"❌ Proxy error for {self.client_address}: {error}")
+        lb = self.engine.lb
+        lb.report_failure(self.server, error)
+        # The backend never saw a byte and the client data is still buffered: one retry elsewhere is safe
+        retry_server = None if self.failed_over else lb.retry_target(self.server, self.key, self.route_pool)
+        if not retry_server:
+            self.close()
+            return
+        self.failed_over = True
+        logger.warning(f"🔁 Retrying {self.client_address} on {retry_server['host']}:{retry_server['port']}")
+        self.loop.unregister(self.backend)
+        self.backend.close()
+        self.downstream.close()
+        self.backend = self.downstream = None
+        self._backend_events = 0
+        lb.request_finished(self.server)
+        self.connect(retry_server)
+
+    # ------------------------------------------------------------------ events
+
+    def _on_client(self, mask):
+        if self.closed:
+            return
+        ok = True
+        if mask & selectors.EVENT_READ:
+            ok = self.upstream.read()
+        if ok and mask & selectors.EVENT_WRITE:
+            ok = self.downstream.flush()
+        self._after_io(ok)
+
+    def _on_backend(self, mask):
+        if self.closed:
+            return
+        if not self.connected:
+            err = self.backend.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                self._on_connect_failed(OSError(err, errno.errorcode.get(err, 'connect failed')))
+                return
+            self.connected = True
+            self.engine.lb.report_success(self.server)
+            self.engine.lb.metrics.connect_time(self.server, (time.perf_counter() - self.connect_started) * 1000)
+            self.upstream.dst = self.backend
+            self._after_io(self.upstream.flush())
+            return
+        ok = True
+        if mask & selectors.EVENT_READ:
+            ok = self.downstream.read()
+        if ok and mask & selectors.EVENT_WRITE:
+            ok = self.upstream.flush()
+        self._after_io(ok)
+
+    def _after_io(self, ok=True):
+        if self.closed:
+            return
+        if not ok:
+            logger.debug(f"🔄 Relay socket error for {self.client_address}")
+            self.close()
+            return
+        # Propagate half-close once a direction is drained
+        for direction in (self.upstream, self.downstream):
+            if direction and direction.dst is not None and direction.eof and not direction.pending and not direction.shut:
+                if direction.dst is self.client and self.engine.tls:
+                    # SSLSocket.shutdown() drops the TLS layer; the backend is done, so is the client
+                    self.close()
+                    return
+                try:
+                    direction.dst.shutdown(socket.SHUT_WR)
+                except OSError:
+                    pass
+                direction.shut = True
+        if self.upstream.shut and self.downstream.shut:
+            self.close()
+            return
+        if self.downstream and self.downstream.shut and self.upstream.eof:
+            self.close()
+            return
+        self._update_interest()
+
+    def _update_interest(self):
+        client_events = 0
+        if self.upstream.wants_read():
+            client_events |= selectors.EVENT_READ
+        if self.connected and self.downstream.pending:
+            client_events |= selectors.EVENT_WRITE
+        if client_events != self._client_events:
+            self.loop.set_events(self.client, self._client_events, client_events, self._on_client)
+            self._client_events = client_events
+
+        if self.backend is None or not self.connected:
+            return
+        backend_events = 0
+        if self.downstream.wants_read():
+            backend_events |= selectors.EVENT_READ
+        if self.upstream.pending:
+            backend_events |= selectors.EVENT_WRITE
+        if backend_events != self._backend_events:
+            self.loop.set_events(self.backend, self._backend_events, backend_events, self._on_backend)
+            self._backend_events = backend_events
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for sock in (self.client, self.backend):
+            if sock is not None:
+                self.loop.unregister(sock)
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+        for direction in (self.upstream, self.downstream):
+            if direction:
+                direction.close()
+        if self.server:
+            self.engine.lb.request_finished(self.server)
+        self.engine.connection_closed(self)
+
+
+# ---------------------------------------------------------------- L7 (HTTP) mode
+
+MAX_HEAD = 64 * 1024
+POOL_IDLE_TIMEOUT = 30.0  # Pooled backend connections idle this long are closed (servers keep them 60s)
+POOL_MAX_IDLE = 64        # Idle connections kept per backend
+HOP_BY_HOP = (b'connection', b'keep-alive', b'proxy-connection')
+IDEMPOTENT_METHODS = (b'GET', b'HEAD', b'OPTIONS')
+
+
+def parse_http_head(head, connection=None):
+    """Split a request/response head into (start line, [(lowercase name, value)], new head)
+
+    With connection given, new head is the head (blank line included) with its
+    hop-by-hop connection headers replaced by 'Connection: <connection>'.
+    """
+    lines = bytes(head).split(b"\r\n")
+    headers = []
+    kept = [lines[0]]
+    for line in lines[1:]:
+        name, sep, value = line.partition(b":")
+        if not sep:
+            continue
+        name = name.strip().lower()
+        headers.append((name, value.strip()))
+        if name not in HOP_BY_HOP:
+            kept.append(line)
+    new_head = None
+    if connection is not None:
+        kept.append(b"Connection: " + connection)
+        new_head = b"\r\n".join(kept) + b"\r\n\r\n"
+    return lines[0], headers, new_head
+
+
+def header_value(headers, name, default=None):
+    for key, value in headers:
+        if key == name:
+            return value
+    return default
+
+
+def wants_keep_alive(start_line, headers):
+    connection = header_value(headers, b'connection', b'').lower()
+    if start_line.endswith(b'HTTP/1.1'):
+        return b'close' not in connection
+    return b'keep-alive' in connection
+
+
+class BackendConnection:
+    """One persistent connection to a backend; owned by a relay or idle in the pool
+
+    The socket stays registered for its whole life and events go to the
+    current owner, so handing it between relays costs no selector churn.
+    """
+
+    def __init__(self, pool, server):
+        self.pool = pool
+        self.server = server
+        self.key = (server['host'], server['port'])
+        self.owner = None
+        self.events = 0
+        self.requests = 0
+        self.last_used = time.monotonic()
+        self.closed = False
+        self.connected = False
+        self.connect_started = time.perf_counter()
+        self.sock, self.connect_error = start_connect(server)
+
+    def _on_event(self, mask):
+        if self.owner is not None:
+            self.owner._on_backend(mask)
+        else:
+            # An idle connection only turns readable when the backend closes it
+            self.pool.discard(self)
+
+    def set_events(self, events):
+        if events != self.events and not self.closed:
+            self.pool.loop.set_events(self.sock, self.events, events, self._on_event)
+            self.events = events
+
+    def close(self):
+        if not self.closed:
+            self.pool.loop.unregister(self.sock)
+            self.closed = True
+            self.owner = None
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+
+
+class BackendPool:
+    """Idle keep-alive backend connections per backend, reused most-recent first"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.idle = {}  # (host, port) -> [BackendConnection]
+        self.created = 0
+        self.reused = 0
+        self.stale = 0  # reused connections the backend had already closed
+        self.loop.call_later(5.0, self._sweep)
+
+    def acquire(self, server, owner, fresh=False):
+        idle = None if fresh else self.idle.get((server['host'], server['port']))
+        while idle:
+            conn = idle.pop()
+            if not conn.closed:
+                self.reused += 1
+                conn.owner = owner
+                return conn
+        self.created += 1
+        conn = BackendConnection(self, server)
+        conn.owner = owner
+        return conn
+
+    def release(self, conn):
+        conn.owner = None
+        idle = self.idle.setdefault(conn.key, [])
+        if len(idle) >= POOL_MAX_IDLE:
+            conn.close()
+            return
+        conn.last_used = time.monotonic()
+        conn.set_events(selectors.EVENT_READ)
+        idle.append(conn)
+
+    def discard(self, conn):
+        idle = self.idle.get(conn.key, [])
+        if conn in idle:
+            idle.remove(conn)
+        conn.close()
+
+    def _sweep(self):
+        cutoff = time.monotonic() - POOL_IDLE_TIMEOUT
+        for idle in list(self.idle.values()):
+            for conn in [c for c in idle if c.last_used < cutoff]:
+                self.discard(conn)
+        self.loop.call_later(5.0, self._sweep)
+
+    def drop(self, key):
+        """Close the idle connections of a backend that left the configuration"""
+        for conn in list(self.idle.get(key, [])):
+            self.discard(conn)
+        self.idle.pop(key, None)
+
+    def close_all(self):
+        for idle in list(self.idle.values()):
+            for conn in list(idle):
+                self.discard(conn)
+
+    def get_stats(self):
+        return {
+            'created': self.created,
+            'reused': self.reused,
+            'stale': self.stale,
+            'idle': sum(len(idle) for idle in list(self.idle.values()))
+        }
+
+
+class HttpRelay:
+    """HTTP-aware relay: parses each request on a client connection and routes it on its own
+
+    Requests are framed by Content-Length, sent over a pooled keep-alive
+    connection to the backend picked for that request, and the response is
+    streamed back with the Connection header the client asked for. Pipelined
+    requests are answered in order, one exchange at a time.
+    """
+
+    def __init__(self, engine, client_sock, client_address):
+        self.engine = engine
+        self.loop = engine.loop
+        self.pool = engine.pool
+        self.client = client_sock
+        self.client_address = client_address
+        self.inbuf = bytearray()
+        self.outbuf = bytearray()
+        self.client_eof = False
+        self.close_after_flush = False
+        self.closed = False
+
+        # Current exchange
+        self.server = None
+        self.backend = None
+        self.request = None
+        self.to_send = None
+        self.method = None
+        self.request_line = None
+        self.key = None
+        self.keep_alive = False
+        self.backend_keep_alive = False
+        self.head_done = False
+        self.response_buf = bytearray()
+        self.remaining = None  # body bytes still expected; None = until the backend closes
+        self.response_started = False
+        self.retried = False
+        self.failed_over = False
+        self.sent_at = None
+        self.cache_key = None     # this exchange fetches a micro-cache entry
+        self.cache_entry = None   # [head prefix, body] being collected for it
+        self.waiting_for = None   # queued behind an identical fetch in flight
+        self.queued_at = None     # waiting in the engine queue for a backend slot
+        self.queue_timer = None
+        self.route_pool = None    # RoutePool of the current request, None = default backends
+
+        self.client.setblocking(False)
+        self.loop.register(self.client, selectors.EVENT_READ, self._on_client)
+        self._client_events = selectors.EVENT_READ
+
+    # ------------------------------------------------------------------ client side
+
+    def _on_client(self, mask):
+        if self.closed:
+            return
+        if mask & selectors.EVENT_READ:
+            try:
+                data = self.client.recv(RECV_SIZE)
+            except WOULD_BLOCK:
+                data = None
+            except OSError:
+                self.close()
+                return
+            if data == b"":
+                self.client_eof = True
+            elif data:
+                self.inbuf += data
+        if mask & selectors.EVENT_WRITE and not self._flush_client():
+            return
+        self._advance()
+
+    def _advance(self):
+        """Start the next request when idle, close when finished, refresh interest"""
+        # Cache hits need no backend, so several pipelined requests may be answered here
+        while self.backend is None and self.waiting_for is None and self.queued_at is None \
+                and not self.close_after_flush and not self.closed:
+            if not self._start_request():
+                break
+        if self.closed:
+            return
+        idle = self.backend is None and self.waiting_for is None and self.queued_at is None
+        # While the LB drains, a kept-alive connection closes as soon as it has no request in progress
+        done = self.client_eof or (self.engine.draining and not self.inbuf and self.request_line is not None)
+        if not self.outbuf and (self.close_after_flush or (done and idle)):
+            self.close()
+            return
+        self._update_interest()
+
+    def _start_request(self):
+        """Take the next complete request off inbuf; True when it was answered from the micro-cache"""
+        end = self.inbuf.find(b"\r\n\r\n")
+        if end < 0:
+            if len(self.inbuf) > MAX_HEAD:
+                self._reply_error(b"431 Request Header Fields Too Large")
+            return
+        start_line, headers, head = parse_http_head(self.inbuf[:end], b"keep-alive")
+        if header_value(headers, b'transfer-encoding'):
+            self._reply_error(b"501 Not Implemented", b"Chunked request bodies are not supported")
+            return
+        try:
+            length = int(header_value(headers, b'content-length', b'0'))
+        except ValueError:
+            self._reply_error(b"400 Bad Request")
+            return
+        total = end + 4 + length
+        if len(self.inbuf) < total:
+            return
+
+        self.request = head + bytes(self.inbuf[end + 4:total])
+        del self.inbuf[:total]
+        self.method = start_line.split(b" ", 1)[0].upper()
+        self.keep_alive = wants_keep_alive(start_line, headers) and not self.engine.draining
+        self.request_line = start_line
+        self.retried = self.failed_over = False
+
+        lb = self.engine.lb
+        self.route_pool = lb.route_for(start_line)
+        self.key = lb.routing_key(start_line, self.request[len(head):]) \
+            if (self.route_pool or lb).policy.needs_key else None
+
+        cache = self.engine.cache
+        cache_key = cache.key_for(self.method, start_line) if cache else None
+        if cache_key is not None:
+            entry = cache.get(cache_key)
+            if entry is not None:
+                self._serve_cached(entry)
+                return True
+            if not cache.begin_fetch(cache_key, self):
+                self.waiting_for = cache_key
+                return False
+            self.cache_key = cache_key
+        self._route_request()
+        return False
+
+    def _route_request(self):
+        self.route(self.engine.lb.get_next_server(self.key, pool=self.route_pool))
+
+    def route(self, server):
+        lb = self.engine.lb
+        if not server:
+            if self.engine.enqueue(self):
+                return
+            if (self.route_pool or lb).healthy_servers:
+                self.reject(b"Backends busy")
+                return
+            logger.error("🚫 No healthy backend servers available")
+            lb.metrics.no_backend_available()
+            self.reject(b"No servers available")
+            return
+        level = lb.route_log_level()
+        if level:
+            logger.log(level, f"🔄 {self.client_address} {self.request_line.decode(errors='replace')} → {server['host']}:{server['port']}")
+        self.server = server
+        self._send_to(self.pool.acquire(server, self))
+
+    def reject(self, body):
+        if self.cache_key is not None:
+            self._end_fetch(False)
+        self._reply_error(b"503 Service Unavailable", body)
+        self._advance()
+
+    def _serve_cached(self, entry):
+        prefix, body = entry
+        self.request = None
+        self._to_client(prefix + (b"keep-alive" if self.keep_alive else b"close") + b"\r\n\r\n" + body)
+        if not self.keep_alive:
+            self.close_after_flush = True
+
+    def _cache_ready(self, entry):
+        """The fetch this relay waited for finished; without an entry the request goes to a backend itself"""
+        if self.closed:
+            return
+        self.waiting_for = None
+        if entry is not None:
+            self._serve_cached(entry)
+        else:
+            self._route_request()
+        self._advance()
+
+    def _end_fetch(self, ok):
+        cache_key, entry = self.cache_key, self.cache_entry
+        self.cache_key = self.cache_entry = None
+        entry = (entry[0], bytes(entry[1])) if ok and entry is not None else None
+        for waiter in self.engine.cache.end_fetch(cache_key, entry):
+            waiter._cache_ready(entry)
+
+    def _to_client(self, data):
+        if not self.outbuf:
+            try:
+                sent = self.client.send(data)
+            except WOULD_BLOCK:
+                sent = 0
+            except OSError:
+                self.close()
+                return
+            data = data[sent:]
+        if data:
+            self.outbuf += data
+
+    def _flush_client(self):
+        if not self.outbuf:
+            return True
+        try:
+            sent = self.client.send(self.outbuf)
+            del self.outbuf[:sent]
+        except WOULD_BLOCK:
+            pass
+        except OSError:
+            self.close()
+            return False
+        return True
+
+    def _reply_error(self, status, body=b""):
+        self.inbuf.clear()
+        self._to_client(b"HTTP/1.1 " + status + b"\r\nConnection: close\r\nContent-Length: "
+                        + str(len(body)).encode() + b"\r\n\r\n" + body)
+        self.close_after_flush = True
+
+    # ------------------------------------------------------------------ backend side
+
+    def _send_to(self, conn):
+        self.backend = conn
+        conn.requests += 1
+        self.to_send = memoryview(self.request)
+        self.sent_at = time.perf_counter()
+        self.head_done = False
+        self.response_buf = bytearray()
+        self.remaining = None
+        self.response_started = False
+        if conn.connect_error:
+            self._backend_failed(conn.connect_error)
+            return
+        if conn.connected and not self._write_backend():
+            return
+        self._update_interest()
+
+    def _on_backend(self, mask):
+        if self.closed or self.backend is None:
+            return
+        conn = self.backend
+        if not conn.connected:
+            err = conn.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                self._backend_failed(OSError(err, errno.errorcode.get(err, 'connect failed')))
+                return
+            conn.connected = True
+            self.engine.lb.metrics.connect_time(conn.server, (time.perf_counter() - conn.connect_started) * 1000)
+        if self.to_send and not self._write_backend():
+            return
+        if mask & selectors.EVENT_READ and not self._read_backend():
+            return
+        self._advance()
+
+    def _write_backend(self):
+        try:
+            sent = self.backend.sock.send(self.to_send)
+        except (BlockingIOError, InterruptedError):
+            return True
+        except OSError as e:
+            self._backend_failed(e)
+            return False
+        self.engine.bytes_forwarded += sent
+        self.to_send = self.to_send[sent:]
+        return True
+
+    def _read_backend(self):
+        try:
+            data = self.backend.sock.recv(RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return True
+        except OSError as e:
+            self._backend_failed(e)
+            return False
+        if not data:
+            if self.head_done and self.remaining is None:
+                self._finish_exchange(reusable=False)
+                return True
+            self._backend_failed(OSError(errno.ECONNRESET, 'backend closed the connection'))
+            return False
+
+        if not self.head_done:
+            self.response_buf += data
+            end = self.response_buf.find(b"\r\n\r\n")
+            if end < 0:
+                if len(self.response_buf) > MAX_HEAD:
+                    self._backend_failed(OSError(errno.EMSGSIZE, 'response head too large'))
+                    return False
+                return True
+            if self.engine.draining:
+                self.keep_alive = False
+            start_line, headers, head = parse_http_head(self.response_buf[:end], b"keep-alive" if self.keep_alive else b"close")
+            if header_value(headers, b'x-draining') is not None:
+                self.engine.lb.health.mark_draining(self.server)
+            status = start_line.split(b" ", 2)[1] if start_line.count(b" ") else b""
+            length = header_value(headers, b'content-length')
+            if self.method == b'HEAD' or status in (b'204', b'304') or status.startswith(b'1'):
+                self.remaining = 0
+            else:
+                self.remaining = int(length) if length is not None else None
+            if self.remaining is None and self.keep_alive:
+                self.keep_alive = False  # body ends when the backend closes
+                head = head[:-len(b"keep-alive\r\n\r\n")] + b"close\r\n\r\n"
+            self.backend_keep_alive = self.remaining is not None and wants_keep_alive(start_line, headers)
+            if (self.cache_key is not None and status == b'200' and self.remaining is not None
+                    and self.remaining <= MAX_CACHED_BODY):
+                # Cached without its Connection value; every client gets its own
+                self.cache_entry = [parse_http_head(self.response_buf[:end], b"")[2][:-4], bytearray()]
+            data = bytes(self.response_buf[end + 4:])
+            self.response_buf = bytearray()
+            self.head_done = self.response_started = True
+        else:
+            head = b""
+
+        if self.remaining is not None:
+            data = data[:self.remaining]
+            self.remaining -= len(data)
+        if self.cache_entry is not None:
+            self.cache_entry[1] += data
+        # Head and first body bytes leave in one send
+        if head or data:
+            self.engine.bytes_forwarded += len(head) + len(data)
+            self._to_client(head + data)
+        if self.closed:
+            return False
+        if self.remaining == 0:
+            self._finish_exchange(self.backend_keep_alive)
+        return True
+
+    def _finish_exchange(self, reusable):
+        conn, self.backend = self.backend, None
+        if reusable:
+            self.pool.release(conn)
+        else:
+            conn.close()
+        self.request = self.to_send = None
+        self.engine.requests_proxied += 1
+        self.engine.lb.report_success(self.server)
+        self.engine.lb.metrics.response_time(self.server, (time.perf_counter() - self.sent_at) * 1000)
+        self._end_request()
+        if not self.keep_alive:
+            self.close_after_flush = True
+        if self.cache_key is not None:
+            self._end_fetch(True)
+
+    def _end_request(self):
+        if self.server:
+            self.engine.lb.request_finished(self.server)
+            self.server = None
+
+    def _backend_failed(self, error):
+        conn, self.backend = self.backend, None
+        conn.close()
+        # A reused connection may have been closed by the backend while idle. Retry once on a
+        # fresh one when the request cannot have run: not fully sent yet, or idempotent.
+        if (not self.response_started and conn.requests > 1 and not self.retried
+                and (self.to_send or self.method in IDEMPOTENT_METHODS)):
+            self.retried = True
+            self.pool.stale += 1
+            self._send_to(self.pool.acquire(conn.server, self, fresh=True))
+            return
+        logger.error(f"❌ Proxy error for {self.client_address}: {error}")
+        lb = self.engine.lb
+        lb.report_failure(conn.server, error)
+        # Fail over once when nothing reached the client: any request if the connect failed,
+        # otherwise only the idempotent retry paths
+        if (not self.response_started and not self.failed_over
+                and (not conn.connected or lb.is_retryable(self.request_line))):
+            retry_server = lb.retry_target(conn.server, self.key, self.route_pool)
+            if retry_server:
+                self.failed_over = True
+                logger.warning(f"🔁 Retrying {self.request_line.decode(errors='replace')} "
+                               f"on {retry_server['host']}:{retry_server['port']}")
+                self._end_request()
+                self.server = retry_server
+                self._send_to(self.pool.acquire(retry_server, self))
+                return
+        self._end_request()
+        if self.cache_key is not None:
+            self._end_fetch(False)
+        if self.response_started:
+            self.close()
+        else:
+            self._reply_error(b"502 Bad Gateway", b"Backend unavailable")
+            self._advance()
+
+    # ------------------------------------------------------------------ bookkeeping
+
+    def _update_interest(self):
+        client_events = 0
+        if not self.client_eof and len(self.inbuf) < MAX_BUFFERED:
+            client_events |= selectors.EVENT_READ
+        if self.outbuf:
+            client_events |= selectors.EVENT_WRITE
+        if client_events != self._client_events:
+            self.loop.set_events(self.client, self._client_events, client_events, self._on_client)
+            self._client_events = client_events
+
+        if self.backend is None:
+            return
+        backend_events = 0
+        if not self.backend.connected or self.to_send:
+            backend_events |= selectors.EVENT_WRITE
+        if self.backend.connected and len(self.outbuf) < MAX_BUFFERED:
+            backend_events |= selectors.EVENT_READ
+        self.backend.set_events(backend_events)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.loop.unregister(self.client)
+        try:
+            self.client.close()
+        except OSError:
+            pass
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+        self._end_request()
+        if self.cache_key is not None:
+            self._end_fetch(False)
+        self.engine.connection_closed(self)
+
+
+class ProxyEngine:
+    """Single-threaded event-driven TCP proxy used by LoadBalancer
+
+    One selector watches the listening socket and both ends of every proxied
+    connection, so thousands of connections cost no threads at all. In 'tcp'
+    mode each client connection is relayed byte-for-byte to one backend; in
+    'http' mode every request is routed on its own over pooled backend
+    connections.
+    """
+
+    def __init__(self, lb, listen_sock, forwarding='auto', mode='tcp', cache_routes=None):
+        self.lb = lb
+        self.listen_sock = listen_sock
+        self.loop = EventLoop()
+        self.connections = set()
+        self.mode = mode
+        self.pool = BackendPool(self.loop) if mode == 'http' else None
+        self.cache = MicroCache(cache_routes) if mode == 'http' and cache_routes else None
+        self.requests_proxied = 0
+        self.waiting = collections.deque()  # relays waiting for a default backend slot (pools have their own)
+        self.tls = lb.tls  # TlsTerminator when clients speak TLS, else None
+        self.draining = False
+
+        # 'splice' moves data kernel-side through pipes, 'buffer' uses recv_into
+        if forwarding == 'splice' and not SPLICE_AVAILABLE:
+            logger.warning("⚠️ os.splice not available here, using buffered forwarding")
+        if forwarding == 'splice' and self.tls:
+            logger.warning("⚠️ splice cannot see through TLS, using buffered forwarding")
+        self.use_splice = forwarding in ('auto', 'splice') and SPLICE_AVAILABLE and not self.tls
+        self.read_buffer = bytearray(RECV_SIZE)
+        self.read_view = memoryview(self.read_buffer)
+        self._pipes = []
+        self.bytes_forwarded = 0
+        if mode == 'http':
+            logger.info("📦 Mode: HTTP (per-request routing, pooled keep-alive backends)")
+            if self.cache:
+                routes = ', '.join(f"{p.decode()} {ttl * 1000:.0f}ms" for p, ttl in self.cache.routes)
+                logger.info(f"⚡ Micro-cache: {routes}")
+        else:
+            logger.info(f"📦 Forwarding: {'splice (zero-copy)' if self.use_splice else 'recv_into buffer'}")
+
+    def run(self):
+        self.listen_sock.setblocking(False)
+        self.loop.register(self.listen_sock, selectors.EVENT_READ, self._on_accept)
+        try:
+            self.loop.run()
+        finally:
+            for conn in list(self.connections):
+                conn.close()
+            if self.pool:
+                self.pool.close_all()
+            for pipe_r, pipe_w in self._pipes:
+                os.close(pipe_r)
+                os.close(pipe_w)
+            self.loop.unregister(self.listen_sock)
+            self.loop.close()
+
+    def stop(self):
+        self.loop.stop()
+
+    def begin_drain(self):
+        """LB shutdown: take what is already in the accept queue, close the listener, wait for open connections"""
+        if self.draining:
+            return
+        self.draining = True
+        self._on_accept(selectors.EVENT_READ, budget=self.lb.backlog)
+        self.loop.unregister(self.listen_sock)
+        self.listen_sock.close()
+        for conn in list(self.connections):
+            if isinstance(conn, HttpRelay):
+                conn._advance()  # idle kept-alive client connections close now
+        self._check_drained()
+
+    def _check_drained(self):
+        if not self.connections:
+            logger.info("✅ Drained, no connections left")
+            self.loop.stop()
+        elif time.monotonic() >= self.lb.drain_deadline:
+            logger.warning(f"⚠️ Shutdown timeout, closing {len(self.connections)} connection(s)")
+            self.loop.stop()
+        else:
+            self.loop.call_later(0.05, self._check_drained)
+
+    def _on_accept(self, mask, budget=64):
+        for _ in range(budget):
+            try:
+                client_sock, client_address = self.listen_sock.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                if self.lb.running:
+                    logger.error(f"❌ Accept error: {e}")
+                return
+            client_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.tls:
+                self.connections.add(TlsHandshake(self, client_sock, client_address))
+            else:
+                self._handle_client(client_sock, client_address)
+
+    def _handle_client(self, client_sock, client_address):
+        self.lb.metrics.connection_opened()
+        if self.mode == 'http':
+            self.connections.add(HttpRelay(self, client_sock, client_address))
+            return
+
+        relay = Relay(self, client_sock, client_address)
+        self.connections.add(relay)
+        if self.lb.policy.needs_key:
+            relay.route_on_first_line()
+        else:
+            relay.route(self.lb.get_next_server())
+
+    def _queue_of(self, relay):
+        return relay.route_pool.waiting if relay.route_pool else self.waiting
+
+    def enqueue(self, relay):
+        """Every backend of the relay's pool is at max_in_flight: park it in that queue; False when it cannot wait"""
+        group = relay.route_pool or self.lb
+        if not group.max_in_flight or not group.healthy_servers:
+            return False
+        waiting = self._queue_of(relay)
+        if len(waiting) >= group.queue_size:
+            self.lb.metrics.queue_rejected('full')
+            return False
+        relay.queued_at = time.perf_counter()
+        relay.queue_timer = self.loop.call_later(group.queue_timeout, lambda: self._queue_expired(relay))
+        waiting.append(relay)
+        return True
+
+    def _queue_expired(self, relay):
+        try:
+            self._queue_of(relay).remove(relay)
+        except ValueError:
+            return
+        relay.queued_at = relay.queue_timer = None
+        if not relay.closed:
+            self.lb.metrics.queue_rejected('timeout')
+            relay.reject(b"Backends busy")
+
+    def slot_freed(self):
+        """A request finished: hand free backend slots to the oldest queued relays of each pool"""
+        self._serve_queue(self.waiting, None)
+        for pool in self.lb.pools.values():
+            if pool.waiting:
+                self._serve_queue(pool.waiting, pool)
+
+    def _serve_queue(self, waiting, pool):
+        while waiting and self.lb.running:
+            relay = waiting[0]
+            server = None
+            if not relay.closed:
+                server = self.lb.get_next_server(relay.key, new_request=False, pool=pool)
+                if server is None:
+                    return
+            waiting.popleft()
+            self.loop.cancel(relay.queue_timer)
+            queued_ms = (time.perf_counter() - relay.queued_at) * 1000
+            relay.queued_at = relay.queue_timer = None
+            if server:
+                self.lb.metrics.queue_time(queued_ms)
+                relay.route(server)
+
+    def drop_backend(self, key):
+        """A drained backend left the configuration: close its pooled and any remaining connections"""
+        if self.pool:
+            self.pool.drop(key)
+        for conn in list(self.connections):
+            if conn.server is not None and (conn.server['host'], conn.server['port']) == key:
+                conn.close()
+
+    def acquire_pipe(self):
+        if self._pipes:
+            return self._pipes.pop()
+        pipe_r, pipe_w = os.pipe()
+        os.set_blocking(pipe_r, False)
+        os.set_blocking(pipe_w, False)
+        return pipe_r, pipe_w
+
+    def release_pipe(self, pipe_r, pipe_w, reusable=True):
+        """Keep empty pipes for the next connection; a pipe with leftovers is closed"""
+        if reusable and len(self._pipes) < PIPE_POOL_SIZE:
+            self._pipes.append((pipe_r, pipe_w))
+            return
+        os.close(pipe_r)
+        os.close(pipe_w)
+
+    def connection_closed(self, relay):
+        self.connections.discard(relay)
+        self.lb.metrics.connection_closed()
@@ -0,0 +1,101 @@
+import time
+import threading
+from typing import List, Tuple, Dict, Any
+
+import redis
+
+
+class ReplicaRouter:
+    """Routes pure reads to Redis replicas while they are fresh enough
+
+    A monitor thread writes a timestamp probe on the primary and reads it
+    back from every replica; the difference is the replica's lag. Reads go
+    to the primary when no replica is within max_lag seconds, or for
+    pin_window seconds after this server's own writes (read-your-writes).
+    """
+
+    def __init__(self, primary, replicas: List[Tuple[str, int]], probe_key, db=0,
+                 max_lag=0.5, pin_window=None, check_interval=0.25):
+        self.primary = primary
+        self.probe_key = probe_key
+        self.max_lag = max_lag
+        self.pin_window = max_lag if pin_window is None else pin_window
+        self.check_interval = check_interval
+
+        self.replicas = [
+            {'node': f"{host}:{port}", 'lag': None, 'reads': 0,
+             'client': redis.Redis(host=host, port=port, db=db, decode_responses=True, socket_keepalive=True,
+                                   socket_timeout=1.0)}
+            for host, port in replicas
+        ]
+        self._fresh = []  # replicas currently within max_lag
+        self._index = 0
+        self._last_write = 0
+        self.primary_reads = 0
+        self.pinned_reads = 0
+
+        self.running = True
+        self._thread = threading.Thread(target=self._monitor, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self.running = False
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+        self._fresh = []
+        for replica in self.replicas:
+            replica['client'].close()
+
+    def mark_write(self):
+        """Pin reads to the primary for a while after a local write"""
+        self._last_write = time.time()
+
+    def read_client(self):
+        if time.time() - self._last_write < self.pin_window:
+            self.pinned_reads += 1
+            return self.primary
+        fresh = self._fresh
+        if not fresh:
+            self.primary_reads += 1
+            return self.primary
+        self._index = (self._index + 1) % len(fresh)
+        replica = fresh[self._index % len(fresh)]
+        replica['reads'] += 1
+        return replica['client']
+
+    def _monitor(self):
+        while self.running:
+            try:
+                self.primary.set(self.probe_key, repr(time.time()))
+            except Exception as e:
+                print(f"⚠️ Replica probe write failed: {e}")
+            time.sleep(self.check_interval)
+            if not self.running:
+                break
+
+            now = time.time()
+            fresh = []
+            for replica in self.replicas:
+                try:
+                    value = replica['client'].get(self.probe_key)
+                    replica['lag'] = now - float(value) if value else None
+                except Exception:
+                    replica['lag'] = None
+                # The probe itself is check_interval old when read back
+                if replica['lag'] is not None and replica['lag'] - self.check_interval <= self.max_lag:
+                    fresh.append(replica)
+            if len(fresh) != len(self._fresh):
+                print(f"🔁 Fresh read replicas: {[r['node'] for r in fresh]}")
+            self._fresh = fresh
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'max_lag': self.max_lag,
+            'primary_reads': self.primary_reads,
+            'pinned_reads': self.pinned_reads,
+            'replicas': [
+                {'node': r['node'], 'reads': r['reads'], 'fresh': r in self._fresh,
+                 'lag': None if r['lag'] is None else max(0, r['lag'] - self.check_interval)}
+                for r in self.replicas
+            ]
+        }
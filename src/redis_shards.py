@@ -0,0 +1,51 @@
+from typing import List, Tuple
+
+import redis
+
+from hash_ring import HashRing
+
+# Keys of the single-game layout before rooms existed, see RedisGameState._migrate_legacy_keys
+LEGACY_KEYSPACE = "stroopcolor:"
+
+
+def parse_redis_nodes(spec: str, default_host='127.0.0.1') -> List[Tuple[str, int]]:
+    """Parse 'host:port,host:port' (or bare ports) into (host, port) tuples"""
+    nodes = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if ':' in item:
+            host, port = item.rsplit(':', 1)
+            nodes.append((host, int(port)))
+        else:
+            nodes.append((default_host, int(item)))
+    return nodes
+
+
+def room_keyspace(room: str) -> str:
+    """Key prefix of a room; the hash tag keeps all room keys in one cluster slot"""
+    return f"stroopcolor:{{{room}}}:"
+
+
+def create_redis_client(host='127.0.0.1', port=6379, db=0, room='default', cluster=False, shards=None):
+    """Create the Redis client that owns a room
+
+    - cluster: connect to a Redis Cluster through host:port (plus shards as extra startup nodes)
+    - shards: list of standalone (host, port); the room is placed by consistent hashing
+    - otherwise: a single standalone instance
+    Returns (client, description).
+    """
+    if cluster:
+        from redis.cluster import RedisCluster, ClusterNode
+        startup_nodes = [ClusterNode(h, p) for h, p in ([(host, port)] + list(shards or []))]
+        client = RedisCluster(startup_nodes=startup_nodes, decode_responses=True, socket_keepalive=True)
+        return client, f"cluster via {host}:{port}"
+
+    if shards:
+        shard_host, shard_port = HashRing(shards).get_node(room)
+        client = redis.Redis(host=shard_host, port=shard_port, db=db, decode_responses=True, socket_keepalive=True)
+        return client, f"shard {shard_host}:{shard_port} (room '{room}', {len(shards)} shards)"
+
+    client = redis.Redis(host=host, port=port, db=db, decode_responses=True, socket_keepalive=True)
+    return client, f"{host}:{port}"
@@ -0,0 +1,211 @@
+import time
+import random
+import threading
+from typing import Dict, Any, Optional
+
+from game_state import RedisGameState
+
+# Game hash fields shared by the Redis backend and the in-memory fallback
+GAME_FIELDS = [
+    'question_id_counter', 'current_question', 'current_correct_answer', 'game_started',
+    'countdown_started', 'countdown_start_time', 'game_start_time', 'question_start_time',
+    'current_question_number', 'game_finished', 'first_correct_answer', 'timesup_state',
+    'timesup_start_time', 'round_completed_state', 'round_completed_start_time', 'advancing_question'
+]
+CONFIG_FIELDS = ['max_questions', 'question_duration', 'countdown_duration', 'timesup_duration',
+                 'round_completed_duration', 'heartbeat_timeout']
+
+
+class RedisSupervisor:
+    """Keeps HttpServer on Redis when possible and on local state otherwise
+
+    While on Redis it pings the primary and keeps a recent snapshot of the
+    room. After failure_threshold failed checks the server is demoted to an
+    in-memory state seeded from that snapshot, so the game keeps running.
+    While on local state it retries Redis with exponential backoff; once
+    Redis answers, the two states are reconciled and the server is promoted
+    back. HttpServer picks the backend per call from the type of game_state,
+    so switching is a single attribute swap under question_lock.
+    """
+
+    def __init__(self, httpserver, check_interval=1.0, failure_threshold=2, backoff_min=0.5, backoff_max=30.0):
+        self.httpserver = httpserver
+        self.check_interval = check_interval
+        self.failure_threshold = failure_threshold
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+
+        self.redis_state: Optional[RedisGameState] = (
+            httpserver.game_state if isinstance(httpserver.game_state, RedisGameState) else None
+        )
+        self.running = False
+        self._wakeup = threading.Event()
+        self._snapshot = None
+        self._failures = 0
+
+        # Measurements
+        self.outages = 0
+        self.reconnect_attempts = 0
+        self.outage_started = None if self.redis_state else time.time()
+        self.last_failover_seconds = None
+        self.last_recovery_seconds = None
+        self.last_outage_seconds = None
+        self.last_reconcile = None
+
+    @property
+    def on_redis(self):
+        return isinstance(self.httpserver.game_state, RedisGameState)
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+        print(f"🩺 Redis supervisor started (mode: {'redis' if self.on_redis else 'local'})")
+
+    def stop(self):
+        self.running = False
+        self._wakeup.set()
+
+    def report_failure(self):
+        """Called from the request path on Redis errors to check right away"""
+        self._wakeup.set()
+
+    def _run(self):
+        backoff = self.backoff_min
+        while self.running:
+            if self.on_redis:
+                self._wakeup.wait(self.check_interval)
+                self._wakeup.clear()
+                self._check_redis()
+                backoff = self.backoff_min
+            else:
+                # Jitter keeps several servers from reconnecting in lockstep
+                self._wakeup.wait(backoff * random.uniform(0.8, 1.2))
+                self._wakeup.clear()
+                if not self._try_promote():
+                    backoff = min(backoff * 2, self.backoff_max)
+
+    def _check_redis(self):
+        try:
+            self._snapshot = self.redis_state.get_snapshot()
+            if self._failures:
+                self._failures, self.outage_started = 0, None
+            return
+        except Exception as e:
+            self._failures += 1
+            if self._failures == 1:
+                self.outage_started = time.time()
+            print(f"⚠️ Redis check failed ({self._failures}/{self.failure_threshold}): {e}")
+
+        if self._failures >= self.failure_threshold:
+            self._demote()
+
+    def _demote(self):
+        """Switch to an in-memory state seeded from the last Redis snapshot"""
+        local = self._fallback_from_snapshot(self._snapshot)
+        with self.httpserver.question_lock:
+            self.httpserver.game_state = local
+            self.httpserver.answer_stream = False
+        self.redis_state.monitor_enabled = False
+        self.httpserver.stop_answer_scorers()  # paused until Redis is back
+        self.outages += 1
+        self.last_failover_seconds = time.time() - self.outage_started
+        print(f"💾 Redis unavailable, serving local state (failover took {self.last_failover_seconds:.2f}s)")
+
+    def _try_promote(self):
+        self.reconnect_attempts += 1
+        try:
+            if self.redis_state is None:
+                self.redis_state = RedisGameState(**self.httpserver.redis_config)
+            else:
+                self.redis_state.redis_client.ping()
+        except Exception as e:
+            print(f"🔌 Redis still unavailable (attempt {self.reconnect_attempts}): {e}")
+            return False
+
+        reachable_at = time.time()
+        try:
+            with self.httpserver.question_lock:
+                self.last_reconcile = self._reconcile(self.httpserver.game_state)
+                self.httpserver.game_state = self.redis_state
+                self.httpserver.REQUIRED_PLAYERS = self.redis_state.get_required_players()
+                if self.httpserver.scorer_config:
+                    if not self.httpserver.scorers:
+                        self.httpserver._start_answer_scorers()
+                    else:
+                        for scorer in self.httpserver.scorers:
+                            scorer.start()
+                    self.httpserver.answer_stream = True
+        except Exception as e:
+            print(f"❌ Redis reconcile failed, staying on local state: {e}")
+            return False
+
+        self.redis_state.monitor_enabled = True
+        self._failures = 0
+        now = time.time()
+        self.last_recovery_seconds = now - reachable_at
+        self.last_outage_seconds = now - self.outage_started if self.outage_started else None
+        self.outage_started = None
+        print(f"🔗 Promoted back to Redis ({self.last_reconcile} state kept, "
+              f"reconcile {self.last_recovery_seconds * 1000:.0f}ms)")
+        return True
+
+    def _reconcile(self, local) -> str:
+        """Merge the local state into Redis; returns which game state was kept"""
+        remote = self.redis_state.get_snapshot()
+        remote_game = remote['game']
+
+        def progress(game):
+            return (bool(game.get('game_started')) and not game.get('game_finished'),
+                    game.get('question_id_counter') or 0)
+
+        # Players and scores are merged either way
+        players = remote['players'] | local['connected_players']
+        scores = dict(remote['scores'])
+        for player_id, score in local['player_scores'].items():
+            scores[player_id] = max(scores.get(player_id, 0), score)
+
+        if remote_game.get('game_started') and progress(remote_game) >= progress(local):
+            # Other servers kept the game going on Redis
+            self.redis_state.load_snapshot(remote_game, players, scores, remote['answered'])
+            return 'redis'
+
+        game = {k: local[k] for k in GAME_FIELDS}
+        game['advancing_question'] = False
+        self.redis_state.load_snapshot(game, players, scores, local['answered_players'])
+        for question in local.get('question_log', []):
+            self.redis_state.log_question(question)
+        for answer in local.get('answer_log', []):
+            self.redis_state.log_answer(answer)
+        return 'local'
+
+    def _fallback_from_snapshot(self, snapshot) -> Dict[str, Any]:
+        local = self.httpserver.new_fallback_state()
+        if not snapshot:
+            return local
+        now = time.time()
+        for field in GAME_FIELDS:
+            if field in snapshot['game']:
+                local[field] = snapshot['game'][field]
+        local['advancing_question'] = False
+        for field in CONFIG_FIELDS:
+            if field in snapshot['config']:
+                local[field] = snapshot['config'][field]
+        self.httpserver.REQUIRED_PLAYERS = snapshot['config'].get('required_players', self.httpserver.REQUIRED_PLAYERS)
+        local['connected_players'] = set(snapshot['players'])
+        local['player_scores'] = {p: snapshot['scores'].get(p, 0) for p in snapshot['players']}
+        local['answered_players'] = set(snapshot['answered'])
+        # Fresh heartbeats so nobody times out because of the outage
+        local['last_heartbeat'] = {p: now for p in snapshot['players']}
+        return local
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'mode': 'redis' if self.on_redis else 'local',
+            'outages': self.outages,
+            'reconnect_attempts': self.reconnect_attempts,
+            'outage_in_progress': self.outage_started is not None,
+            'last_failover_seconds': self.last_failover_seconds,
+            'last_recovery_seconds': self.last_recovery_seconds,
+            'last_outage_seconds': self.last_outage_seconds,
+            'last_reconcile': self.last_reconcile
+        }
@@ -0,0 +1,196 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    game_id TEXT PRIMARY KEY,
+    server_id TEXT,
+    started_at REAL,
+    finished_at REAL,
+    player_count INTEGER,
+    question_count INTEGER,
+    winner TEXT
+);
+CREATE TABLE IF NOT EXISTS game_scores (
+    game_id TEXT NOT NULL,
+    player_id TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    PRIMARY KEY (game_id, player_id)
+);
+CREATE TABLE IF NOT EXISTS game_questions (
+    game_id TEXT NOT NULL,
+    question_number INTEGER,
+    question_id INTEGER,
+    text TEXT,
+    text_color TEXT,
+    started_at REAL,
+    ended_at REAL,
+    end_reason TEXT
+);
+CREATE TABLE IF NOT EXISTS game_answers (
+    game_id TEXT NOT NULL,
+    question_id INTEGER,
+    player_id TEXT NOT NULL,
+    answer TEXT,
+    correct INTEGER,
+    first_correct INTEGER,
+    time_remaining REAL,
+    answered_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_games_finished_at ON games (finished_at);
+CREATE INDEX IF NOT EXISTS idx_scores_player ON game_scores (player_id, score);
+CREATE INDEX IF NOT EXISTS idx_questions_game ON game_questions (game_id);
+CREATE INDEX IF NOT EXISTS idx_answers_game ON game_answers (game_id);
+CREATE INDEX IF NOT EXISTS idx_answers_player ON game_answers (player_id);
+"""
+
+
+class ResultsArchiver:
+    """Buffers finished-game records and bulk-inserts them into SQLite
+
+    Game servers only append to an in-memory buffer (submit), the writer
+    thread owns the SQLite connection and flushes the buffer in a single
+    transaction every flush_interval seconds or once batch_size records
+    are waiting. The database runs in WAL mode so history queries never
+    block the writer.
+    """
+
+    def __init__(self, db_path='match_results.db', flush_interval=2.0, batch_size=50):
+        self.db_path = os.path.abspath(db_path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffer_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self.running = True
+        self.archived_games = 0
+
+        # Create schema up front so queries work before the first flush
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+        print(f"🗄️ Results archive: {self.db_path}")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, record: Dict[str, Any]):
+        """Queue a finished game; never touches the disk"""
+        with self._buffer_lock:
+            self._buffer.append(record)
+            pending = len(self._buffer)
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _writer_loop(self):
+        conn = self._connect()
+        try:
+            while self.running:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self._flush(conn)
+            self._flush(conn)
+        finally:
+            conn.close()
+
+    def _flush(self, conn):
+        with self._buffer_lock:
+            records, self._buffer = self._buffer, []
+        if not records:
+            return
+
+        games, scores, questions, answers = [], [], [], []
+        for r in records:
+            ranked = sorted(r.get('final_scores', {}).items(), key=lambda x: -x[1])
+            games.append((r['game_id'], r.get('server_id'), r.get('started_at'), r.get('finished_at'),
+                          len(ranked), len(r.get('questions', [])), ranked[0][0] if ranked else None))
+            scores.extend((r['game_id'], player, score, rank) for rank, (player, score) in enumerate(ranked, 1))
+            questions.extend((r['game_id'], q.get('question_number'), q.get('question_id'), q.get('text'),
+                              q.get('text_color'), q.get('started_at'), q.get('ended_at'), q.get('reason'))
+                             for q in r.get('questions', []))
+            answers.extend((r['game_id'], a.get('question_id'), a.get('player_id'), a.get('answer'),
+                            int(bool(a.get('correct'))), int(bool(a.get('first_correct'))),
+                            a.get('time_remaining'), a.get('answered_at'))
+                           for a in r.get('answers', []))
+
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?, ?, ?)", games)
+                conn.executemany("INSERT OR REPLACE INTO game_scores VALUES (?, ?, ?, ?)", scores)
+                conn.executemany("INSERT INTO game_questions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", questions)
+                conn.executemany("INSERT INTO game_answers VALUES (?, ?, ?, ?, ?, ?, ?, ?)", answers)
+            self.archived_games += len(games)
+            print(f"🗄️ Archived {len(games)} game(s), {len(answers)} answer(s)")
+        except sqlite3.Error as e:
+            print(f"❌ Results archive write failed: {e}")
+            # Keep the records for the next flush
+            with self._buffer_lock:
+                self._buffer = records + self._buffer
+
+    def stop(self, timeout=5.0):
+        """Flush whatever is still buffered and stop the writer"""
+        self.running = False
+        self._wakeup.set()
+        self._thread.join(timeout=timeout)
+
+    def get_history(self, limit=20, player_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most recent games (optionally only those a player took part in)"""
+        conn = self._connect()
+        try:
+            if player_id:
+                games = conn.execute(
+                    "SELECT g.* FROM games g JOIN game_scores s ON s.game_id = g.game_id "
+                    "WHERE s.player_id = ? ORDER BY g.finished_at DESC LIMIT ?", (player_id, limit)
+                ).fetchall()
+            else:
+                games = conn.execute("SELECT * FROM games ORDER BY finished_at DESC LIMIT ?", (limit,)).fetchall()
+
+            history = []
+            for g in games:
+                scores = conn.execute(
+                    "SELECT player_id, score FROM game_scores WHERE game_id = ? ORDER BY rank", (g['game_id'],)
+                ).fetchall()
+                game = dict(g)
+                game['final_scores'] = {s['player_id']: s['score'] for s in scores}
+                history.append(game)
+            return history
+        finally:
+            conn.close()
+
+    def get_player_stats(self, player_id: str) -> Dict[str, Any]:
+        """Aggregate stats for one player, served from the player indexes"""
+        conn = self._connect()
+        try:
+            games = conn.execute(
+                "SELECT COUNT(*) AS games_played, SUM(rank = 1) AS wins, "
+                "COALESCE(SUM(score), 0) AS total_score, COALESCE(AVG(score), 0) AS avg_score, "
+                "COALESCE(MAX(score), 0) AS best_score FROM game_scores WHERE player_id = ?", (player_id,)
+            ).fetchone()
+            answers = conn.execute(
+                "SELECT COUNT(*) AS answers, COALESCE(SUM(correct), 0) AS correct_answers, "
+                "COALESCE(SUM(first_correct), 0) AS first_correct, "
+                "COALESCE(AVG(time_remaining), 0) AS avg_time_remaining "
+                "FROM game_answers WHERE player_id = ?", (player_id,)
+            ).fetchone()
+            stats = {'player_id': player_id, **dict(games), **dict(answers)}
+            stats['wins'] = stats['wins'] or 0
+            stats['accuracy'] = stats['correct_answers'] / stats['answers'] if stats['answers'] else 0
+            return stats
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._buffer_lock:
+            buffered = len(self._buffer)
+        return {'db_path': self.db_path, 'archived_games': self.archived_games, 'buffered_games': buffered}
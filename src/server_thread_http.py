@@ -1,6 +1,9 @@
 from socket import *
-import socket, threading, sys, logging, signal, argparse
+import socket, threading, sys, os, stat, time, logging, signal, argparse
 from http import HttpServer
+from redis_shards import parse_redis_nodes
+from redis_supervisor import RedisSupervisor
+from backend_registry import BackendRegistration
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -11,9 +14,28 @@ def parse_arguments():
     parser.add_argument('--redis-port', type=int, default=6379, help='Redis port (default: 6379)')
     parser.add_argument('--required-players', type=int, help='Required players to start game (only for initial setup)')
     parser.add_argument('--server-id', default='server1', help='Server instance ID for logging')
+    parser.add_argument('--answer-stream', action='store_true', help='Write-behind answers via Redis Stream (Redis mode only)')
+    parser.add_argument('--scorer-workers', type=int, default=1, help='Answer stream scorer workers (default: 1)')
+    parser.add_argument('--scorer-batch', type=int, default=100, help='Max answers folded per scorer batch (default: 100)')
+    parser.add_argument('--room', default='default', help='Game room served by this server (default: default)')
+    parser.add_argument('--redis-cluster', action='store_true', help='Treat --redis-host/--redis-port as a Redis Cluster node')
+    parser.add_argument('--redis-shards', help='Standalone Redis instances (host:port,...) to shard rooms across')
+    parser.add_argument('--redis-replicas', help='Read replicas (host:port,...) for display-only reads (/question body, /status scores)')
+    parser.add_argument('--max-replica-lag', type=float, default=0.5, help='Max replica lag in seconds before reads fall back to the primary (default: 0.5)')
+    parser.add_argument('--no-redis-reconnect', action='store_true', help='Do not retry Redis / fail over after startup')
+    parser.add_argument('--redis-check-interval', type=float, default=1.0, help='Redis health check interval in seconds (default: 1.0)')
+    parser.add_argument('--redis-retry-max', type=float, default=30.0, help='Max Redis reconnect backoff in seconds (default: 30)')
+    parser.add_argument('--archive-db', help='SQLite file for finished game results, e.g. match_results.db (default: no archive)')
+    parser.add_argument('--register', action='store_true', help='List this server in the Redis registry read by load_balancer.py --registry-redis')
+    parser.add_argument('--advertise-host', default='127.0.0.1', help='Host the load balancer should use for this server (default: 127.0.0.1)')
+    parser.add_argument('--register-ttl', type=float, default=10.0, help='Seconds a registration lives without refresh (default: 10)')
+    parser.add_argument('--unix-socket', help='Also listen on this Unix domain socket path (load balancer backend unix:PATH)')
+    parser.add_argument('--drain-notice', type=float, default=3.0, help='SIGTERM: seconds to keep accepting while load balancers see draining (default: 3)')
+    parser.add_argument('--drain-timeout', type=float, default=30.0, help='Max seconds to let in-flight requests finish on shutdown (default: 30)')
     return parser.parse_args()
 
 httpserver = None
+KEEP_ALIVE_TIMEOUT = 60  # Idle seconds before a kept-alive connection is closed
 
 # Tambahkan endpoint reset di HttpServer
 if not hasattr(HttpServer, "reset_game"):
@@ -34,19 +56,31 @@ class ProcessTheClient(threading.Thread):
 
     def run(self):
         self.connection.settimeout(1.0)
-        rcv = ""
+        buffer = b""
+        last_activity = time.time()
         try:
             while True:
                 try:
-                    data = self.connection.recv(4096)
-                    if not data: break
-                    rcv += data.decode('utf-8', errors='ignore')
-                    if "\r\n\r\n" in rcv:
-                        logging.info(f"Request from {self.address}: {rcv.splitlines()[0]}")
-                        hasil = httpserver.proses(rcv)
-                        self.connection.sendall(hasil)
-                        break
+                    request, buffer = httpserver.split_request(buffer)
+                    if request is None:
+                        data = self.connection.recv(4096)
+                        if not data: break
+                        buffer += data
+                        last_activity = time.time()
+                        continue
+                    rcv = request.decode('utf-8', errors='ignore')
+                    logging.info(f"Request from {self.address}: {rcv.splitlines()[0]}")
+                    hasil = httpserver.proses(rcv)
+                    # Keep-alive (load balancer HTTP mode): serve the next request on this connection
+                    if httpserver.wants_keep_alive(rcv) and not httpserver.draining:
+                        self.connection.sendall(httpserver.keep_alive_response(hasil))
+                        last_activity = time.time()
+                        continue
+                    self.connection.sendall(hasil)
+                    break
                 except socket.timeout:
+                    if time.time() - last_activity > KEEP_ALIVE_TIMEOUT: break
+                    if httpserver.draining and not buffer: break  # Idle kept-alive connection
                     continue
                 except OSError as e:
                     logging.error(f"OSError with {self.address}: {e}")
@@ -63,63 +97,107 @@ class Server(threading.Thread):
     def __init__(self, port, args):
         super().__init__(daemon=False)
         self.the_clients, self.my_socket = [], socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.clients_lock = threading.Lock()  # Both accept loops (TCP and unix) add to the_clients
+        self.unix_thread = None
         self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.running = True
         self.port = port
         self.args = args
+        self.registration = None
+        self.unix_socket = None
+
+    def listen_unix(self, path):
+        """Second listener on a Unix domain socket for a load balancer on the same host"""
+        if os.path.exists(path):
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                raise OSError(f"{path} exists and is not a socket")
+            os.unlink(path)  # Left behind by a server that did not stop cleanly
+        self.unix_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.unix_socket.bind(path)
+        self.unix_socket.listen(socket.SOMAXCONN)
+        self.unix_socket.settimeout(1.0)
+        self.unix_thread = threading.Thread(target=self.accept_loop, args=(self.unix_socket, f"unix:{path}"), daemon=True)
+        self.unix_thread.start()
+        logging.info(f"🔌 Also listening on unix:{path}")
+
+    def accept_loop(self, listen_socket, name):
+        while self.running:
+            try:
+                connection, _ = listen_socket.accept()
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if self.running: logging.error(f"Socket error on {name}: {e}")
+                break
+            self.start_client(connection, name)
+
+    def start_client(self, connection, address):
+        """Serve one connection on its own thread, tracked (and finished threads pruned) under the lock"""
+        clt = ProcessTheClient(connection, address)
+        with self.clients_lock:
+            self.the_clients = [t for t in self.the_clients if t.is_alive()]
+            self.the_clients.append(clt)
+        clt.start()
+
+    def clients(self):
+        with self.clients_lock:
+            return list(self.the_clients)
 
     def run(self):
         global httpserver
         try:
-            print("🔗 Testing Redis connection...")
-            
-            # Test Redis connection but don't exit on failure
-            redis_available = False
-            try:
-                import redis
-                test_redis = redis.Redis(host=self.args.redis_host, port=self.args.redis_port, decode_responses=True)
-                test_redis.ping()
-                
-                # Test basic operations
-                test_redis.set("test_key", "test_value")
-                result = test_redis.get("test_key")
-                test_redis.delete("test_key")
-                
-                print(f"✅ Redis connection test successful: {result}")
-                redis_available = True
-                
-            except Exception as redis_error:
-                print(f"⚠️ Redis connection failed: {redis_error}")
-                print("🔄 Falling back to in-memory mode...")
-                redis_available = False
+            print("🔗 Connecting to Redis...")
             
-            # Initialize HTTP server with or without Redis
+            # HttpServer falls back to in-memory state by itself when Redis is down;
+            # RedisSupervisor keeps retrying and promotes it back when Redis returns
+            redis_shards = parse_redis_nodes(self.args.redis_shards) if self.args.redis_shards else None
+            httpserver = HttpServer(
+                redis_host=self.args.redis_host,
+                redis_port=self.args.redis_port,
+                required_players=self.args.required_players,
+                answer_stream=self.args.answer_stream,
+                scorer_workers=self.args.scorer_workers,
+                scorer_batch=self.args.scorer_batch,
+                server_id=self.args.server_id,
+                archive_db=self.args.archive_db,
+                room=self.args.room,
+                redis_cluster=self.args.redis_cluster,
+                redis_shards=redis_shards,
+                redis_replicas=parse_redis_nodes(self.args.redis_replicas) if self.args.redis_replicas else None,
+                max_replica_lag=self.args.max_replica_lag
+            )
+            redis_available = hasattr(httpserver.game_state, 'redis_client')
             if redis_available:
-                httpserver = HttpServer(
-                    redis_host=self.args.redis_host,
-                    redis_port=self.args.redis_port,
-                    required_players=self.args.required_players
-                )
                 print(f"🔗 Running with Redis backend")
             else:
-                # Force fallback mode by passing invalid Redis connection
-                httpserver = HttpServer(
-                    redis_host='invalid_host',  # This will trigger fallback
-                    redis_port=9999,            # Invalid port
-                    required_players=self.args.required_players or 2
-                )
                 print(f"💾 Running with in-memory backend")
             
+            if not self.args.no_redis_reconnect:
+                httpserver.supervisor = RedisSupervisor(
+                    httpserver, check_interval=self.args.redis_check_interval,
+                    backoff_max=self.args.redis_retry_max
+                )
+                httpserver.supervisor.start()
+            
             self.my_socket.bind(('0.0.0.0', self.port))
             self.my_socket.listen(5)
             self.my_socket.settimeout(1.0)
+            if self.args.unix_socket:
+                self.listen_unix(self.args.unix_socket)
+            
+            if self.args.register:
+                import redis
+                registry = redis.Redis(host=self.args.redis_host, port=self.args.redis_port, decode_responses=True,
+                                       socket_timeout=1.0, socket_connect_timeout=1.0)
+                self.registration = BackendRegistration(registry, self.args.advertise_host, self.port, ttl=self.args.register_ttl)
+                self.registration.start()
             
             required_players = httpserver.REQUIRED_PLAYERS
             
             logging.info(f"🚀 {self.args.server_id} started on 0.0.0.0:{self.port}")
             
             if redis_available:
-                logging.info(f"🔗 Redis: {self.args.redis_host}:{self.args.redis_port}")
+                logging.info(f"🔗 Redis: {httpserver.game_state.redis_node} (room: {self.args.room})")
                 logging.info(f"🎯 Required players: {required_players} (from Redis)")
             else:
                 logging.info(f"💾 Mode: In-memory fallback")
@@ -138,10 +216,7 @@ class Server(threading.Thread):
                 try:
                     self.connection, self.client_address = self.my_socket.accept()
                     logging.info(f"New connection from {self.client_address}")
-                    clt = ProcessTheClient(self.connection, self.client_address)
-                    clt.start()
-                    self.the_clients.append(clt)
-                    self.the_clients = [t for t in self.the_clients if t.is_alive()]
+                    self.start_client(self.connection, self.client_address)
                 except socket.timeout:
                     continue
                 except OSError as e:
@@ -158,31 +233,75 @@ class Server(threading.Thread):
     def stop(self):
         logging.info("Stopping server...")
         self.running = False
-        for t in self.the_clients: 
+        if self.registration:
+            self.registration.stop()
+        for t in self.clients(): 
             try:
                 t.join(timeout=1.0)
             except:
                 pass
         self.cleanup()
 
+    def drain(self, notice, timeout):
+        """Graceful stop: advertise draining, stop accepting after notice seconds, let open requests finish"""
+        logging.info(f"🚰 Draining: accepting for {notice}s more, then up to {timeout}s for in-flight requests")
+        if httpserver:
+            httpserver.draining = True
+        if self.registration:
+            self.registration.stop()
+        # Load balancers see X-Draining / a 503 health check and stop routing here meanwhile
+        time.sleep(notice)
+        self.running = False
+        self.cleanup()
+        # Both accept loops end within their 1s accept timeout; connections they took are tracked by then
+        for accept_thread in (self.unix_thread, self):
+            if accept_thread and accept_thread is not threading.current_thread() and accept_thread.is_alive():
+                accept_thread.join(timeout=2.0)
+        deadline = time.time() + timeout
+        for t in self.clients():
+            t.join(timeout=max(0.0, deadline - time.time()))
+        left = sum(1 for t in self.clients() if t.is_alive())
+        if left:
+            logging.warning(f"⚠️ Drain timeout, closing {left} connection(s)")
+        else:
+            logging.info("✅ Drained, no requests in flight")
+
     def cleanup(self):
         try:
             if hasattr(self, 'my_socket'):
                 self.my_socket.close()
+            if self.unix_socket:
+                self.unix_socket.close()
+                self.unix_socket = None
+                os.unlink(self.args.unix_socket)
             logging.info("Server socket closed")
         except Exception:
             pass
 
+stopping = False
+
 def signal_handler(sig, frame):
-    print("\n🛑 Received interrupt signal (Ctrl+C)")
+    global server, stopping
+    if stopping:
+        print("\n⏩ Second signal, exiting without waiting for requests")
+        os._exit(1)
+    stopping = True
+    if sig == signal.SIGTERM:
+        print("\n🛑 Received SIGTERM")
+    else:
+        print("\n🛑 Received interrupt signal (Ctrl+C)")
     print("Shutting down server gracefully...")
-    global server
     if server:
-        server.stop()
+        # Deploys send SIGTERM and get the notice period; Ctrl+C stops accepting right away
+        server.drain(server.args.drain_notice if sig == signal.SIGTERM else 0.0, server.args.drain_timeout)
         server.join(timeout=3.0)
     
-    # Cleanup Redis connection
+    # Stop the answer scorers, flush archived results and cleanup Redis connection
     global httpserver
+    if httpserver:
+        httpserver.stop_answer_scorers()
+    if httpserver and httpserver.archiver:
+        httpserver.archiver.stop()
     if httpserver and hasattr(httpserver.game_state, 'cleanup'):
         httpserver.game_state.cleanup()
     
@@ -194,6 +313,7 @@ def main():
     global server
     
     signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
     
     print("🎮 Starting Stroop Color Game Server...")
     print(f"🚀 Server ID: {args.server_id}")
@@ -202,7 +322,7 @@ def main():
         print(f"🎯 Setting required players: {args.required_players}")
     else:
         print("🎯 Using existing Redis config for required players")
-    print("🛑 Press Ctrl+C to stop the server")
+    print("🛑 Press Ctrl+C (or send SIGTERM) to stop the server; a second one exits immediately")
     
     try:
         server = Server(args.port, args)